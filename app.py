@@ -1,8 +1,11 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
 import json
 import os
+import queue
 import sys
 import platform
+import threading
+import time
 
 import asyncio
 from functools import wraps
@@ -21,8 +24,11 @@ def get_config_dir():
 
     On Mac: ~/Library/Application Support/BTCRulesScript/
     On Windows: Same directory as .exe (or source directory)
+    BTC_RULES_CONFIG_DIR overrides both, e.g. to keep a benchmark's files in a temp dir.
     """
-    if getattr(sys, 'frozen', False):
+    if os.environ.get("BTC_RULES_CONFIG_DIR"):
+        config_dir = os.environ["BTC_RULES_CONFIG_DIR"]
+    elif getattr(sys, 'frozen', False):
         # Running as compiled executable
         exe_dir = os.path.dirname(sys.executable)
 
@@ -58,9 +64,21 @@ def _get_config_file_path():
     return os.path.join(CONFIG_DIR, CONFIG_FILE_NAME)
 
 
-def _load_config():
-    """Load all config from JSON file."""
-    config_path = _get_config_file_path()
+# Parsed config.json, reloaded only when the file's mtime changes
+_config_cache = {"data": None, "mtime": None, "checked": 0.0}
+_config_lock = threading.Lock()
+# How often to stat config.json for external edits
+CONFIG_RECHECK_SECONDS = 1.0
+
+
+def _config_mtime(config_path):
+    try:
+        return os.stat(config_path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_config_file(config_path):
     try:
         if os.path.exists(config_path):
             with open(config_path, 'r') as f:
@@ -70,32 +88,70 @@ def _load_config():
     return {}
 
 
+def _load_config():
+    """Return the cached config, re-reading the JSON file if it changed on disk."""
+    now = time.monotonic()
+    with _config_lock:
+        if _config_cache["data"] is not None and now - _config_cache["checked"] < CONFIG_RECHECK_SECONDS:
+            return _config_cache["data"]
+
+        config_path = _get_config_file_path()
+        mtime = _config_mtime(config_path)
+        _config_cache["checked"] = now
+        if _config_cache["data"] is None or mtime != _config_cache["mtime"]:
+            _config_cache["data"] = _read_config_file(config_path)
+            _config_cache["mtime"] = mtime
+        return _config_cache["data"]
+
+
+def reload_config():
+    """Drop the cached config so the next read goes to disk."""
+    with _config_lock:
+        _config_cache["data"] = None
+    return _load_config()
+
+
 def _save_config(config):
-    """Save all config to JSON file."""
+    """Atomically write the config file and update the cache."""
     config_path = _get_config_file_path()
+    tmp_path = config_path + ".tmp"
     try:
-        with open(config_path, 'w') as f:
+        with open(tmp_path, 'w') as f:
             json.dump(config, f, indent=2)
-        return True
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, config_path)
     except Exception as e:
         print(f"[CONFIG] Error saving config: {e}")
         return False
 
+    with _config_lock:
+        _config_cache["data"] = config
+        _config_cache["mtime"] = _config_mtime(config_path)
+        _config_cache["checked"] = time.monotonic()
+    return True
+
 
 def get_credential(key):
-    """Get a credential from the config file."""
+    """Get a credential from the config cache."""
     config = _load_config()
     return config.get(key, "")
 
 
+def set_credentials(values):
+    """Set several credentials with a single write; empty values are removed."""
+    config = dict(_load_config())
+    for key, value in values.items():
+        if value:
+            config[key] = value
+        elif key in config:
+            del config[key]
+    return _save_config(config)
+
+
 def set_credential(key, value):
     """Set a credential in the config file."""
-    config = _load_config()
-    if value:
-        config[key] = value
-    elif key in config:
-        del config[key]
-    return _save_config(config)
+    return set_credentials({key: value})
 
 
 # Get the appropriate directories
@@ -118,6 +174,17 @@ from services.symbol_validator import SymbolValidator
 from services.position_monitor import PositionMonitor
 from services.wallet_manager import WalletManager
 from services.tp_sl_monitor import TPSLMonitor
+from services.market_data import MarketDataCache
+from services.monitor_engine import MonitorEngine
+from services.market_feed import PublicMarketFeed
+from services.account_stream import PrivateAccountStream
+from services.rate_limiter import request_priority, PRIORITY_UI
+from services.live_updates import LiveUpdates
+from services.position_versions import PositionVersions
+from services.clock_sync import ClockSync
+from services.order_executor import OrderExecutor
+from services.metrics import MetricsRegistry, Histogram, CONTENT_TYPE, single
+from services.profiler import Profiler
 
 
 app = Flask(__name__)
@@ -129,25 +196,40 @@ bybit_client = BybitClient(
     api_key=get_credential("api_key"),
     api_secret=get_credential("api_secret"),
     testnet=get_credential("testnet") == "true",
-    demo=get_credential("demo") == "true"
+    demo=get_credential("demo") == "true",
+    # e.g. http://127.0.0.1:5001 to run against `python -m services.bybit_standin`
+    base_url=os.environ.get("BYBIT_BASE_URL") or None,
+    # WebSocket streams only run against a stand-in when given their own endpoint too
+    ws_url=os.environ.get("BYBIT_WS_URL") or None
 )
 
-symbol_validator = SymbolValidator(bybit_client)
+symbol_validator = SymbolValidator(bybit_client, cache_dir=CONFIG_DIR)
 
-position_monitor = PositionMonitor(bybit_client)
-wallet_manager = WalletManager(bybit_client)
-tp_sl_monitor = TPSLMonitor(bybit_client, position_monitor, symbol_validator, config_dir=CONFIG_DIR)
+monitor_engine = MonitorEngine()
+clock_sync = ClockSync(bybit_client, monitor_engine)
+market_data = MarketDataCache(bybit_client)
+account_stream = PrivateAccountStream(bybit_client, monitor_engine)
+position_monitor = PositionMonitor(bybit_client, market_data, account_stream)
+wallet_manager = WalletManager(bybit_client, market_data, account_stream)
+market_feed = PublicMarketFeed(bybit_client, market_data, monitor_engine)
+order_executor = OrderExecutor(bybit_client)
+tp_sl_monitor = TPSLMonitor(bybit_client, position_monitor, symbol_validator, config_dir=CONFIG_DIR,
+                            engine=monitor_engine, feed=market_feed, account_stream=account_stream,
+                            order_executor=order_executor)
 
 
 def async_route(f):
+    """Run an async view on the shared engine loop.
+
+    The coroutine is submitted from the request thread, so it runs in a copy of
+    that thread's context and Flask's request/app globals still resolve. Sharing
+    the loop keeps the Bybit connection pool and caches warm across requests.
+    """
     @wraps(f)
     def wrapper(*args, **kwargs):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(f(*args, **kwargs))
-        finally:
-            loop.close()
+        # Dashboard requests queue behind order placement and monitor polling
+        with request_priority(PRIORITY_UI):
+            return monitor_engine.run(f(*args, **kwargs))
     return wrapper
 
 
@@ -171,23 +253,32 @@ def settings():
 
 
 def reinitialize_services():
-    global bybit_client, symbol_validator, position_monitor, wallet_manager, tp_sl_monitor
-
-    old_entry_prices = wallet_manager.spot_entry_prices.copy() if wallet_manager else {}
+    """Apply saved credentials to the running services without restarting them."""
+    # A tick still fetching from the old servers must not land after the swap,
+    # where its price would become the new baseline
+    monitor_engine.run(tp_sl_monitor.pause_ticks())
+    try:
+        environment_changed = bybit_client.reconfigure(
+            api_key=get_credential("api_key"),
+            api_secret=get_credential("api_secret"),
+            testnet=get_credential("testnet") == "true",
+            demo=get_credential("demo") == "true"
+        )
 
-    # Load credentials from config file
-    bybit_client = BybitClient(
-        api_key=get_credential("api_key"),
-        api_secret=get_credential("api_secret"),
-        testnet=get_credential("testnet") == "true",
-        demo=get_credential("demo") == "true"
-    )
+        # The private stream is tied to the account; reconnect it with the new key
+        account_stream.restart()
 
-    symbol_validator = SymbolValidator(bybit_client)
-    position_monitor = PositionMonitor(bybit_client)
-    wallet_manager = WalletManager(bybit_client)
-    wallet_manager.spot_entry_prices = old_entry_prices
-    tp_sl_monitor = TPSLMonitor(bybit_client, position_monitor, symbol_validator, config_dir=CONFIG_DIR)
+        if environment_changed:
+            # Prices, instruments and the public stream all come from the new servers;
+            # the old stream is fully stopped before the cache is cleared
+            market_feed.stop().result()
+            market_data.clear()
+            symbol_validator.invalidate()
+            clock_sync.resync()
+            market_feed.start()
+            monitor_engine.run(tp_sl_monitor.reset_price_baseline())
+    finally:
+        tp_sl_monitor.resume_ticks()
 
 
 @app.route('/api/save-settings', methods=['POST'])
@@ -200,10 +291,12 @@ def save_settings():
         demo = data.get('demo', False)
 
         # Save credentials to config file
-        set_credential("api_key", api_key)
-        set_credential("api_secret", api_secret)
-        set_credential("testnet", "true" if testnet else "false")
-        set_credential("demo", "true" if demo else "false")
+        set_credentials({
+            "api_key": api_key,
+            "api_secret": api_secret,
+            "testnet": "true" if testnet else "false",
+            "demo": "true" if demo else "false"
+        })
 
         print(f"[SETTINGS] Saved credentials to config file")
 
@@ -218,54 +311,297 @@ def save_settings():
 
 
 
+CREDENTIALS_MISSING_ERROR = "API credentials not configured. Please set your API credentials in settings."
+
+
+async def build_positions_payload(category):
+    if category == "all":
+        futures_positions, spot_positions = await asyncio.gather(
+            position_monitor.monitor_positions_with_prices("linear"),
+            wallet_manager.get_spot_assets_with_prices(),
+            return_exceptions=True
+        )
+
+        if isinstance(futures_positions, Exception):
+            futures_positions = []
+        if isinstance(spot_positions, Exception):
+            spot_positions = []
+
+        futures_symbols = {pos.get("symbol") for pos in (futures_positions or [])}
+        filtered_spot = [pos for pos in (spot_positions or []) if pos.get("symbol") not in futures_symbols]
+
+        positions = (futures_positions or []) + filtered_spot
+
+    elif category == "spot":
+        positions = await wallet_manager.get_spot_assets_with_prices()
+    else:
+        positions = await position_monitor.monitor_positions_with_prices(category)
+
+    monitors = tp_sl_monitor.get_all_monitors()
+    for pos in positions:
+        symbol = pos.get("symbol")
+        if symbol in monitors:
+            pos["monitor"] = monitors[symbol]
+
+    return {
+        "positions": positions,
+        "count": len(positions),
+        "category": category,
+        "timestamp": positions[0]["updated_at"] if positions else None,
+        "active_monitors": len(monitors)
+    }
+
+
+async def stream_positions_payload(category):
+    if not get_credential("api_key") or not get_credential("api_secret"):
+        return {"error": CREDENTIALS_MISSING_ERROR}
+    return await build_positions_payload(category)
+
+
+live_updates = LiveUpdates(
+    monitor_engine,
+    fetch_positions=stream_positions_payload,
+    get_monitors=lambda: tp_sl_monitor.get_all_monitors(),
+    get_btc_price=lambda: position_monitor.get_current_price("BTCUSDT", "linear")
+)
+
+
+def attach_live_updates():
+    market_feed.add_listener(live_updates.on_price)
+    account_stream.add_listener("position", lambda _: live_updates.notify())
+    account_stream.add_listener("wallet", lambda _: live_updates.notify())
+
+
+attach_live_updates()
+
+
+# ============================================================================
+# METRICS - Prometheus text format at /metrics
+# ============================================================================
+
+route_duration = Histogram("flask_request_duration_seconds", "Time to produce a Flask response",
+                           ("method", "route", "status"))
+
+
+@app.before_request
+def start_request_timer():
+    request.environ["metrics.started"] = time.perf_counter()
+
+
+@app.after_request
+def record_request_duration(response):
+    started = request.environ.get("metrics.started")
+    if started is not None:
+        # Route templates, not raw paths, so /api/price/<symbol> stays one series
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        route_duration.observe(time.perf_counter() - started, request.method, route, response.status_code)
+    return response
+
+
+def _hit_ratio(cache):
+    total = cache.hits + cache.misses
+    return single(cache.hits / total if total else None)
+
+
+def _rate_limit_samples(field):
+    return [({"endpoint": endpoint}, budget[field]) for endpoint, budget in bybit_client.rate_limiter.status().items()]
+
+
+def build_metrics_registry():
+    registry = MetricsRegistry()
+    registry.register(bybit_client.request_duration, bybit_client.request_results, route_duration,
+                      tp_sl_monitor.tick_duration, tp_sl_monitor.tick_lag, tp_sl_monitor.store.write_duration)
+
+    registry.gauge("bybit_rate_limit_remaining", "Requests left in the current Bybit rate-limit window",
+                   lambda: _rate_limit_samples("remaining"))
+    registry.gauge("bybit_rate_limit_limit", "Size of the Bybit rate-limit window", lambda: _rate_limit_samples("limit"))
+    registry.gauge("bybit_rate_limit_blocked_seconds", "Seconds an endpoint is still backing off",
+                   lambda: _rate_limit_samples("blocked_for"))
+    registry.counter_func("bybit_rate_limited_total", "Responses Bybit throttled",
+                          lambda: _rate_limit_samples("throttled"))
+    registry.gauge("bybit_rate_limit_queued", "Requests waiting on the rate limiter by priority",
+                   lambda: [({"priority": name}, count) for name, count in bybit_client.rate_limiter.queue_depth().items()])
+    registry.gauge("bybit_clock_offset_ms", "Estimated Bybit minus local clock", lambda: single(clock_sync.offset_ms))
+
+    registry.gauge("btc_monitor_last_tick_lag_seconds", "How late the latest tick started",
+                   lambda: single(tp_sl_monitor.last_tick_lag))
+    registry.gauge("btc_monitor_monitors", "BTC rule monitors, by state",
+                   lambda: [({"state": "stored"}, len(tp_sl_monitor.monitors)),
+                            ({"state": "active"}, len(tp_sl_monitor.active_symbols))])
+    registry.gauge("btc_monitor_pending_rules", "Untriggered BTC rule thresholds",
+                   lambda: single(len(tp_sl_monitor.trigger_index)))
+    registry.gauge("engine_tasks", "Tasks running on the monitor engine loop", lambda: single(monitor_engine.task_count()))
+    registry.gauge("process_threads", "Live Python threads", lambda: single(threading.active_count()))
+    registry.gauge("sse_clients", "Connected /api/stream clients", lambda: single(live_updates.subscriber_count()))
+
+    registry.counter_func("order_batches_total", "Order requests sent by the batch executor",
+                          lambda: single(order_executor.batches))
+    registry.counter_func("orders_total", "Orders sent by the batch executor", lambda: single(order_executor.orders))
+
+    for name, cache in (("price", market_data), ("instrument", symbol_validator)):
+        registry.counter_func(f"{name}_cache_hits_total", f"{name.capitalize()} lookups served from memory",
+                              lambda cache=cache: single(cache.hits))
+        registry.counter_func(f"{name}_cache_misses_total", f"{name.capitalize()} lookups that went to Bybit",
+                              lambda cache=cache: single(cache.misses))
+        registry.gauge(f"{name}_cache_hit_ratio", f"Share of {name} lookups served from memory",
+                       lambda cache=cache: _hit_ratio(cache))
+
+    for name, stream in (("market_feed", market_feed), ("account_stream", account_stream)):
+        registry.gauge(f"{name}_live", "1 while the WebSocket is connected and current",
+                       lambda stream=stream: single(int(stream.is_live())))
+        registry.counter_func(f"{name}_reconnects_total", "WebSocket reconnects",
+                              lambda stream=stream: single(stream.reconnects))
+        registry.counter_func(f"{name}_messages_total", "WebSocket messages handled",
+                              lambda stream=stream: single(stream.messages))
+    return registry
+
+
+metrics_registry = build_metrics_registry()
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(metrics_registry.render(), content_type=CONTENT_TYPE)
+
+
+# ============================================================================
+# PROFILING - opt in with BTC_RULES_PROFILING=1; answers localhost only
+# ============================================================================
+
+profiler = Profiler(enabled=os.environ.get("BTC_RULES_PROFILING") == "1",
+                    loop_getter=lambda: monitor_engine.loop)
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+
+
+def _profiling_allowed():
+    # remote_addr is the socket peer; forwarding headers are deliberately not trusted
+    return profiler.enabled and request.remote_addr in LOCAL_ADDRESSES
+
+
+def profiled(f):
+    """Profile this request when it carries an ``X-Profile`` header.
+
+    The engine thread and the request thread are sampled while the view runs;
+    the response gets an ``X-Profile-Id`` to fetch the collapsed stacks from
+    /debug/profile/<id>.
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled or "X-Profile" not in request.headers or not _profiling_allowed():
+            return f(*args, **kwargs)
+
+        with profiler.profile_request(request.path, [threading.get_ident(), monitor_engine.thread_ident]) as profile:
+            response = app.make_response(f(*args, **kwargs))
+        response.headers["X-Profile-Id"] = profile["id"]
+        return response
+    return wrapper
+
+
+def _collapsed_response(text, filename):
+    response = Response(text, content_type="text/plain; charset=utf-8")
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@app.route('/debug/profile')
+def capture_profile():
+    """Sample all threads and engine tasks for ?seconds= (default 5) and return collapsed stacks."""
+    if not _profiling_allowed():
+        return jsonify({"error": "Not found"}), 404
+
+    seconds = request.args.get('seconds', 5.0, type=float)
+    interval = max(request.args.get('interval', 0.005, type=float), 0.001)
+    sampler = profiler.capture(seconds, interval, tasks=request.args.get('tasks', '1') != '0')
+    if sampler is None:
+        return jsonify({"error": "A profile is already being captured"}), 409
+
+    response = _collapsed_response(sampler.collapsed(), f"profile-{int(sampler.started_at)}.collapsed")
+    response.headers["X-Profile-Samples"] = str(sampler.samples)
+    return response
+
+
+@app.route('/debug/profiles')
+def list_profiles():
+    if not _profiling_allowed():
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({"profiles": profiler.list()})
+
+
+@app.route('/debug/profile/<profile_id>')
+def get_profile(profile_id):
+    if not _profiling_allowed():
+        return jsonify({"error": "Not found"}), 404
+    profile = profiler.get(profile_id)
+    if profile is None:
+        return jsonify({"error": "Unknown profile"}), 404
+    return _collapsed_response(profile["collapsed"], f"request-{profile_id}.collapsed")
+
+
+position_versions = PositionVersions()
+
+
 @app.route('/api/positions')
+@profiled
 @async_route
 async def get_positions():
+    """Positions with conditional (If-None-Match) and delta (?since=<version>) modes."""
     try:
         if not get_credential("api_key") or not get_credential("api_secret"):
-            return jsonify({
-                "error": "API credentials not configured. Please set your API credentials in settings."
-            }), 400
+            return jsonify({"error": CREDENTIALS_MISSING_ERROR}), 400
 
         category = request.args.get('category', 'linear')
+        payload = await build_positions_payload(category)
+        monitors = tp_sl_monitor.get_all_monitors()
+        version = position_versions.record(category, payload["positions"], monitors)
+        etag = position_versions.etag(category)
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        since = request.args.get('since', type=int)
+        delta = None
+        if since is not None:
+            delta = position_versions.delta(category, since, payload["positions"], monitors)
+
+        if delta is not None:
+            del payload["positions"]
+            payload.update(delta)
+            payload["full"] = False
+            payload["since"] = since
+        else:
+            payload["full"] = True
+        payload["version"] = version
 
-        if category == "all":
-            futures_positions, spot_positions = await asyncio.gather(
-                position_monitor.monitor_positions_with_prices("linear"),
-                wallet_manager.get_spot_assets_with_prices(),
-                return_exceptions=True
-            )
-
-            if isinstance(futures_positions, Exception):
-                futures_positions = []
-            if isinstance(spot_positions, Exception):
-                spot_positions = []
-
-            futures_symbols = {pos.get("symbol") for pos in (futures_positions or [])}
-            filtered_spot = [pos for pos in (spot_positions or []) if pos.get("symbol") not in futures_symbols]
+        response = jsonify(payload)
+        response.set_etag(etag)
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            positions = (futures_positions or []) + filtered_spot
 
-        elif category == "spot":
-            positions = await wallet_manager.get_spot_assets_with_prices()
-        else:
-            positions = await position_monitor.monitor_positions_with_prices(category)
+@app.route('/api/stream')
+def stream_updates():
+    """Server-Sent Events: positions (full, then deltas), monitors and btc."""
+    category = request.args.get('category', 'linear')
+    subscriber = live_updates.subscribe(category)
 
-        monitors = tp_sl_monitor.get_all_monitors()
-        for pos in positions:
-            symbol = pos.get("symbol")
-            if symbol in monitors:
-                pos["monitor"] = monitors[symbol]
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        finally:
+            live_updates.unsubscribe(category, subscriber)
 
-        return jsonify({
-            "positions": positions,
-            "count": len(positions),
-            "category": category,
-            "timestamp": positions[0]["updated_at"] if positions else None,
-            "active_monitors": len(monitors)
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.route('/api/price/<symbol>')
@@ -297,13 +633,50 @@ async def get_price(symbol):
 @app.route('/api/symbols')
 @async_route
 async def get_symbols():
+    """All USDT symbols, or ranked matches with ?q=<text>&limit=<n>&category=<linear|spot>."""
     try:
-        symbols = await symbol_validator.get_all_usdt_symbols()
-        return jsonify({"symbols": symbols, "count": len(symbols)})
+        query = request.args.get('q')
+        category = request.args.get('category')
+        if category in (None, "", "all"):
+            category = None
+
+        if query is None and category is None:
+            symbols = await symbol_validator.get_all_usdt_symbols()
+            return jsonify({"symbols": symbols, "count": len(symbols)})
+
+        limit = max(1, min(request.args.get('limit', 20, type=int), 1000))
+        results = await symbol_validator.search_symbols(query or "", limit, category)
+        return jsonify({
+            "symbols": [result["symbol"] for result in results],
+            "results": results,
+            "count": len(results),
+            "query": query or ""
+        })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/clock')
+def get_clock():
+    """Current estimate of the Bybit server clock offset and its drift."""
+    return jsonify(clock_sync.status())
+
+
+@app.route('/api/latency')
+def get_latency():
+    """Trigger-to-ack/fill latency per stage over recent rule executions, plus the latest traces."""
+    limit = max(0, min(request.args.get('recent', 20, type=int), 100))
+    summary = tp_sl_monitor.latency.summary()
+    summary["recent"] = tp_sl_monitor.latency.recent(limit)
+    return jsonify(summary)
+
+
+@app.route('/api/latency/reset', methods=['POST'])
+def reset_latency():
+    tp_sl_monitor.latency.reset()
+    return jsonify({"success": True})
+
+
 @app.route('/api/validate-symbol', methods=['POST'])
 @async_route
 async def validate_symbol():
@@ -338,6 +711,7 @@ async def set_tp_sl():
         )
 
         print(f"[DEBUG] BTC rules set successfully: {monitor}")
+        live_updates.notify()
 
         return jsonify({"success": True, "monitor": monitor})
     except Exception as e:
@@ -348,16 +722,19 @@ async def set_tp_sl():
 
 
 @app.route('/api/tp-sl/remove/<symbol>', methods=['DELETE'])
-def remove_tp_sl(symbol):
+@async_route
+async def remove_tp_sl(symbol):
     try:
         tp_sl_monitor.remove_monitor(symbol)
+        live_updates.notify()
         return jsonify({"success": True, "message": f"Monitor removed for {symbol}"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/tp-sl/monitors')
-def get_monitors():
+@async_route
+async def get_monitors():
     try:
         monitors = tp_sl_monitor.get_all_monitors()
         return jsonify({"monitors": monitors, "count": len(monitors)})
@@ -366,7 +743,8 @@ def get_monitors():
 
 
 @app.route('/api/tp-sl/monitor/<symbol>')
-def get_monitor(symbol):
+@async_route
+async def get_monitor(symbol):
     try:
         monitor = tp_sl_monitor.get_monitor(symbol)
         if not monitor:
@@ -388,15 +766,10 @@ async def close_position():
             return jsonify({"success": False, "error": "Symbol is required"}), 400
 
         if category == "spot":
-            wallet_response = await bybit_client.get_private(
-                "/v5/account/wallet-balance",
-                params={"accountType": "UNIFIED"}
-            )
-
-            if wallet_response.get("retCode") != 0:
-                return jsonify({"success": False, "error": wallet_response.get("retMsg", "Failed to get wallet")}), 400
+            coins = await wallet_manager.get_wallet_coins()
 
-            coins = wallet_response.get("result", {}).get("list", [{}])[0].get("coin", [])
+            if coins is None:
+                return jsonify({"success": False, "error": "Failed to get wallet"}), 400
 
             base_coin = symbol.replace("USDT", "").replace("USDC", "").replace("USD", "")
 
@@ -409,40 +782,47 @@ async def close_position():
             if not coin_balance:
                 return jsonify({"success": False, "error": f"No {base_coin} balance found"}), 404
 
-            available_balance = float(coin_balance.get("walletBalance", 0))
+            available_balance = float(coin_balance.get("walletBalance", 0) or 0)
 
             if available_balance == 0:
                 return jsonify({"success": False, "error": "Balance is 0"}), 400
 
-            rounded_qty = await tp_sl_monitor._round_quantity(symbol, available_balance)
-            print(f"[CLOSE SPOT] {symbol}: balance={available_balance}, rounded={rounded_qty}")
-
-            response = await bybit_client.post_private(
-                "/v5/order/create",
-                data={
-                    "category": "spot",
-                    "symbol": symbol,
-                    "side": "Sell",
-                    "orderType": "Market",
-                    "qty": rounded_qty
-                }
-            )
-
-            if response.get("retCode") == 0:
+            quantities = tp_sl_monitor.split_quantity(symbol, available_balance, "spot")
+            print(f"[CLOSE SPOT] {symbol}: balance={available_balance}, orders={quantities}")
+            if quantities is None:
+                return jsonify({"success": False, "error": f"No instrument data for {symbol} yet; try again shortly"}), 503
+            if not quantities:
+                return jsonify({"success": False, "error": "Balance is below the minimum order quantity"}), 400
+
+            # Balances above the market order cap are sold in several orders
+            results = await order_executor.place_many([{
+                "category": "spot",
+                "symbol": symbol,
+                "side": "Sell",
+                "orderType": "Market",
+                "qty": qty
+            } for qty in quantities])
+
+            errors = [result.get("retMsg", "Unknown error") for result in results if result.get("retCode") != 0]
+            if not errors:
                 return jsonify({"success": True, "message": f"Sold {available_balance} {base_coin}"})
             else:
-                return jsonify({"success": False, "error": response.get("retMsg", "Unknown error")}), 400
+                return jsonify({"success": False, "error": "; ".join(errors)}), 400
 
         else:
-            pos_response = await bybit_client.get_private(
-                "/v5/position/list",
-                params={"category": category, "symbol": symbol}
-            )
+            if account_stream.is_live() and category == "linear":
+                position = account_stream.get_position(category, symbol)
+                positions = [position] if position else []
+            else:
+                pos_response = await bybit_client.get_private(
+                    "/v5/position/list",
+                    params={"category": category, "symbol": symbol}
+                )
 
-            if pos_response.get("retCode") != 0:
-                return jsonify({"success": False, "error": pos_response.get("retMsg", "Failed to get position")}), 400
+                if pos_response.get("retCode") != 0:
+                    return jsonify({"success": False, "error": pos_response.get("retMsg", "Failed to get position")}), 400
 
-            positions = pos_response.get("result", {}).get("list", [])
+                positions = pos_response.get("result", {}).get("list", [])
             if not positions or len(positions) == 0:
                 return jsonify({"success": False, "error": "No position found"}), 404
 
@@ -453,27 +833,116 @@ async def close_position():
             if position_size == 0:
                 return jsonify({"success": False, "error": "Position size is 0"}), 400
 
-            rounded_qty = await tp_sl_monitor._round_quantity(symbol, position_size)
-            print(f"[CLOSE FUTURES] {symbol}: size={position_size}, rounded={rounded_qty}")
+            quantities = tp_sl_monitor.split_quantity(symbol, position_size, category)
+            print(f"[CLOSE FUTURES] {symbol}: size={position_size}, orders={quantities}")
+            if quantities is None:
+                return jsonify({"success": False, "error": f"No instrument data for {symbol} yet; try again shortly"}), 503
+            if not quantities:
+                return jsonify({"success": False, "error": "Position size is below the minimum order quantity"}), 400
 
             close_side = "Sell" if position_side == "Buy" else "Buy"
 
-            response = await bybit_client.post_private(
-                "/v5/order/create",
-                data={
-                    "category": category,
+            # Positions above the market order cap are closed in several orders
+            results = await order_executor.place_many([{
+                "category": category,
+                "symbol": symbol,
+                "side": close_side,
+                "orderType": "Market",
+                "qty": qty,
+                "reduceOnly": True
+            } for qty in quantities])
+
+            errors = [result.get("retMsg", "Unknown error") for result in results if result.get("retCode") != 0]
+            if not errors:
+                return jsonify({"success": True, "message": f"Position closed for {symbol}"})
+            else:
+                return jsonify({"success": False, "error": "; ".join(errors)}), 400
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/close-all', methods=['POST'])
+@async_route
+async def close_all_positions():
+    """Market-close every open position, or only `symbols`, in batched orders."""
+    try:
+        if not get_credential("api_key") or not get_credential("api_secret"):
+            return jsonify({"success": False, "error": CREDENTIALS_MISSING_ERROR}), 400
+
+        data = request.json or {}
+        category = data.get('category', 'linear')
+        only = set(data.get('symbols') or [])
+
+        orders = []
+        skipped = []
+        # Positions with no instrument data to round their size to
+        unrounded = []
+
+        if category in ("linear", "all"):
+            for position in await position_monitor.get_positions("linear"):
+                symbol = position.get("symbol")
+                if only and symbol not in only:
+                    continue
+
+                quantities = tp_sl_monitor.split_quantity(symbol, float(position.get("size", 0) or 0), "linear")
+                if quantities is None:
+                    unrounded.append(symbol)
+                    continue
+                if not quantities:
+                    skipped.append(symbol)
+                    continue
+
+                order = {
+                    "category": "linear",
                     "symbol": symbol,
-                    "side": close_side,
+                    "side": "Sell" if position.get("side") == "Buy" else "Buy",
                     "orderType": "Market",
-                    "qty": rounded_qty,
                     "reduceOnly": True
                 }
-            )
+                # Hedge-mode positions must name their side of the book
+                position_idx = int(position.get("positionIdx", 0) or 0)
+                if position_idx:
+                    order["positionIdx"] = position_idx
+                orders.extend(dict(order, qty=qty) for qty in quantities)
+
+        if category in ("spot", "all"):
+            for coin in await wallet_manager.get_wallet_coins() or []:
+                symbol = f"{coin.get('coin')}USDT"
+                if coin.get("coin") in ("USDT", "USDC") or (only and symbol not in only):
+                    continue
+                # Coins without a USDT spot market cannot be sold here
+                if symbol_validator.get_quantization(symbol, "spot") is None:
+                    continue
+
+                quantities = tp_sl_monitor.split_quantity(symbol, float(coin.get("walletBalance", 0) or 0), "spot")
+                if not quantities:
+                    skipped.append(symbol)
+                    continue
+
+                orders.extend({
+                    "category": "spot",
+                    "symbol": symbol,
+                    "side": "Sell",
+                    "orderType": "Market",
+                    "qty": qty
+                } for qty in quantities)
 
-            if response.get("retCode") == 0:
-                return jsonify({"success": True, "message": f"Position closed for {symbol}"})
+        results = await order_executor.place_many(orders)
+
+        closed = []
+        failed = [{"symbol": symbol, "category": "linear", "error": "No instrument data yet"} for symbol in unrounded]
+        for order, result in zip(orders, results):
+            if result.get("retCode") == 0:
+                closed.append({"symbol": order["symbol"], "category": order["category"], "qty": order["qty"],
+                               "order_id": result.get("result", {}).get("orderId")})
             else:
-                return jsonify({"success": False, "error": response.get("retMsg", "Unknown error")}), 400
+                failed.append({"symbol": order["symbol"], "category": order["category"],
+                               "error": result.get("retMsg", "Unknown error")})
+
+        print(f"[CLOSE ALL] {len(closed)} closed, {len(failed)} failed, {len(skipped)} below minimum")
+        live_updates.notify()
+        return jsonify({"success": not failed, "closed": closed, "failed": failed, "skipped": skipped})
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -484,14 +953,15 @@ if __name__ == '__main__':
     import threading
 
     async def startup():
+        clock_sync.start()
         await symbol_validator.initialize()
+        market_feed.start()
+        account_stream.start()
         tp_sl_monitor.start_all_monitors()
         print("\n[OK] Symbol cache initialized")
         print("[OK] BTC rule monitors started")
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(startup())
+    monitor_engine.run(startup())
 
     print("\n" + "=" * 80)
     print(" " * 27 + "BTC Rules Script")
@@ -508,4 +978,8 @@ if __name__ == '__main__':
 
     threading.Thread(target=open_browser, daemon=True).start()
 
-    app.run(debug=False, host='127.0.0.1', port=5000, threaded=True)
\ No newline at end of file
+    try:
+        app.run(debug=False, host='127.0.0.1', port=5000, threaded=True)
+    finally:
+        monitor_engine.run(bybit_client.aclose())
+        monitor_engine.stop()
\ No newline at end of file
@@ -0,0 +1,405 @@
+"""Benchmarks against the offline Bybit stand-in, emitted as JSON.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --quick --only rule_evaluation,client_overhead
+    python -m benchmarks.run --output new.json --baseline old.json --tolerance 0.2
+
+Metrics ending in ``_ms``, ``_us`` or ``_bytes`` are lower-is-better; with
+``--baseline`` any of them that grew by more than ``--tolerance`` is
+reported and the exit status is 1.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List
+
+import httpx
+
+from services.bybit_client import BybitClient
+from services.bybit_standin import BybitStandin
+from services.market_data import MarketDataCache
+from services.monitor_engine import MonitorEngine
+from services.position_monitor import PositionMonitor
+from services.symbol_validator import SymbolValidator
+from services.tp_sl_monitor import TPSLMonitor
+
+BTC = 60000.0
+
+
+def percentiles(samples: List[float], scale: float = 1000.0, unit: str = "ms") -> Dict[str, float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    def pick(q):
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * scale, 3)
+
+    return {
+        f"p50_{unit}": pick(0.50),
+        f"p95_{unit}": pick(0.95),
+        f"max_{unit}": round(ordered[-1] * scale, 3),
+        f"mean_{unit}": round(sum(ordered) / len(ordered) * scale, 3)
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the services' console logging while a benchmark runs."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+class Harness:
+    """A stand-in plus the service stack wired to it, as app.py wires them."""
+
+    def __init__(self, symbols: int = 0, positions: int = 0, tick_interval: float = 2.0, latency: float = 0.0):
+        self.standin = BybitStandin(latency=latency).start()
+        for i in range(symbols):
+            self.standin.add_instrument(f"S{i:04d}USDT", "linear", price=10.0 + i % 50, qty_step="0.1",
+                                        tick_size="0.001")
+        for i in range(min(positions, symbols)):
+            self.standin.add_position(f"S{i:04d}USDT", "Buy", 100.0)
+
+        self.config_dir = tempfile.mkdtemp(prefix="bench-")
+        self.engine = MonitorEngine("bench-engine")
+        self.engine.start()
+        self.client = BybitClient(self.standin.api_key, self.standin.api_secret, base_url=self.standin.url)
+        self.market_data = MarketDataCache(self.client)
+        self.position_monitor = PositionMonitor(self.client, self.market_data)
+        self.symbol_validator = SymbolValidator(self.client, cache_dir=self.config_dir)
+        self.tp_sl_monitor = TPSLMonitor(self.client, self.position_monitor, self.symbol_validator,
+                                         config_dir=self.config_dir, engine=self.engine,
+                                         tick_interval=tick_interval)
+        self.engine.run(self.symbol_validator.initialize())
+
+    def add_monitors(self, count: int, btc_trigger: float):
+        async def add():
+            for i in range(count):
+                await self.tp_sl_monitor.set_monitor(f"S{i:04d}USDT", "linear", "Buy", 100.0,
+                                                     [{"type": "full_close", "btc_price": btc_trigger}])
+        self.engine.run(add())
+
+    def close(self):
+        self.tp_sl_monitor.stop_all_monitors()
+        self.tp_sl_monitor.store.close()
+        self.engine.run(self.client.aclose())
+        self.engine.stop()
+        self.standin.stop()
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+
+def bench_rule_evaluation(quick: bool) -> Dict:
+    """Rule-evaluation cost per tick with prices already in hand (no I/O)."""
+    results = {}
+    ticks = 20 if quick else 100
+    for count in (10, 100, 1000):
+        harness = Harness(symbols=count)
+        try:
+            # Triggers far away, so every tick evaluates without placing orders
+            harness.add_monitors(count, btc_trigger=BTC * 2)
+            monitor = harness.tp_sl_monitor
+            symbols = list(monitor.monitors)
+            monitor.active_symbols.update(symbols)
+            prices = {"linear": {symbol: 10.0 for symbol in symbols}}
+
+            async def run_ticks():
+                samples = []
+                for i in range(ticks):
+                    btc = BTC + (i % 10)
+                    started = time.perf_counter()
+                    crossed = monitor._crossed_rules(symbols, btc)
+                    monitor._last_tick_btc = btc
+                    await asyncio.gather(*[
+                        monitor._evaluate_monitor(symbol, btc, prices["linear"][symbol], crossed.get(symbol, []))
+                        for symbol in symbols
+                    ])
+                    samples.append(time.perf_counter() - started)
+                return samples
+
+            samples = harness.engine.run(run_ticks())
+            tick = percentiles(samples)
+            tick["monitors_per_second"] = round(count / (sum(samples) / len(samples)))
+            results[f"symbols_{count}"] = tick
+        finally:
+            harness.close()
+    return results
+
+
+def bench_trigger_to_order(quick: bool) -> Dict:
+    """Time from BTC crossing a shared trigger on the stand-in to each close order arriving there.
+
+    This is the REST polling path (no WebSocket feed), so the ticker cache's
+    ``max_age`` bounds how stale the BTC price a tick sees can be.
+    """
+    count = 20
+    tick_interval = 0.1
+    harness = Harness(symbols=count, positions=count, tick_interval=tick_interval)
+    try:
+        harness.add_monitors(count, btc_trigger=BTC - 500)
+        harness.tp_sl_monitor.start_all_monitors()
+        time.sleep(tick_interval * 3)
+
+        arrivals = []
+        harness.standin.order_listeners.append(lambda order: arrivals.append(order["received_at"]))
+        crossed_at = time.time()
+        harness.standin.set_price("BTCUSDT", BTC - 1000)
+
+        deadline = time.time() + 10
+        while len(arrivals) < count and time.time() < deadline:
+            time.sleep(0.01)
+
+        latencies = [arrival - crossed_at for arrival in arrivals]
+        result = percentiles(latencies)
+        result.update({
+            "orders": len(arrivals),
+            "batch_requests": harness.standin.request_counts["/v5/order/create-batch"],
+            "single_requests": harness.standin.request_counts["/v5/order/create"],
+            "tick_interval_s": tick_interval,
+            "price_max_age_s": harness.market_data.max_age
+        })
+        return result
+    finally:
+        harness.close()
+
+
+def bench_api_positions(quick: bool) -> Dict:
+    """/api/positions through Flask: full, delta (since=) and conditional (304) responses."""
+    standin = BybitStandin().start()
+    config_dir = tempfile.mkdtemp(prefix="bench-app-")
+    # app reads config.json and btc_rules.json at import, so both must point here first
+    os.environ["BTC_RULES_CONFIG_DIR"] = config_dir
+    os.environ["BYBIT_BASE_URL"] = standin.url
+    try:
+        import app as app_module
+
+        app_module.set_credentials({"api_key": standin.api_key, "api_secret": standin.api_secret})
+        app_module.reinitialize_services()
+        client = app_module.app.test_client()
+
+        results = {}
+        requests = 10 if quick else 50
+        total = 0
+        for count in (10, 100, 500):
+            for i in range(total, count):
+                standin.add_instrument(f"P{i:04d}USDT", "linear", price=5.0 + i % 20, qty_step="0.1")
+                standin.add_position(f"P{i:04d}USDT", "Buy", 50.0)
+            total = count
+
+            client.get("/api/positions?category=linear")
+            full, delta, conditional = [], [], []
+            full_bytes = delta_bytes = 0
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = client.get("/api/positions?category=linear")
+                full.append(time.perf_counter() - started)
+                full_bytes = len(response.data)
+                version = response.get_json()["version"]
+                etag = response.headers["ETag"]
+
+                started = time.perf_counter()
+                response = client.get(f"/api/positions?category=linear&since={version}")
+                delta.append(time.perf_counter() - started)
+                delta_bytes = len(response.data)
+
+                started = time.perf_counter()
+                client.get("/api/positions?category=linear", headers={"If-None-Match": etag})
+                conditional.append(time.perf_counter() - started)
+
+            results[f"positions_{count}"] = {
+                "full": dict(percentiles(full), payload_bytes=full_bytes),
+                "delta": dict(percentiles(delta), payload_bytes=delta_bytes),
+                "not_modified": percentiles(conditional)
+            }
+        app_module.monitor_engine.stop()
+        return results
+    finally:
+        os.environ.pop("BTC_RULES_CONFIG_DIR", None)
+        os.environ.pop("BYBIT_BASE_URL", None)
+        standin.stop()
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+
+def bench_client_overhead(quick: bool) -> Dict:
+    """Signing, body serialization and round trips with a pooled vs a fresh connection."""
+    standin = BybitStandin().start()
+    client = BybitClient(standin.api_key, standin.api_secret, base_url=standin.url)
+    body = {"category": "linear", "symbol": "BTCUSDT", "side": "Sell", "orderType": "Market",
+            "qty": "0.001", "reduceOnly": True}
+    number = 2000 if quick else 20000
+    requests = 50 if quick else 300
+
+    def sign():
+        timestamp = client._get_timestamp()
+        client._get_headers(client._generate_signature(timestamp, "category=linear&settleCoin=USDT"), timestamp)
+
+    results = {
+        "sign_us": round(timeit.timeit(sign, number=number) / number * 1e6, 3),
+        "serialize_order_us": round(timeit.timeit(lambda: json.dumps(body), number=number) / number * 1e6, 3),
+    }
+
+    async def round_trips():
+        pooled, fresh, private = [], [], []
+        params = {"category": "linear", "symbol": "BTCUSDT"}
+        await client.get_public("/v5/market/tickers", params)
+        for _ in range(requests):
+            started = time.perf_counter()
+            await client.get_public("/v5/market/tickers", params)
+            pooled.append(time.perf_counter() - started)
+
+            # What every request paid before sessions were pooled
+            started = time.perf_counter()
+            async with httpx.AsyncClient() as session:
+                (await session.get(f"{standin.url}/v5/market/tickers", params=params)).json()
+            fresh.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await client.get_private("/v5/position/list", {"category": "linear", "settleCoin": "USDT"})
+            private.append(time.perf_counter() - started)
+        await client.aclose()
+        return pooled, fresh, private
+
+    try:
+        pooled, fresh, private = asyncio.run(round_trips())
+        results["public_pooled"] = percentiles(pooled)
+        results["public_fresh_connection"] = percentiles(fresh)
+        results["private_signed_pooled"] = percentiles(private)
+        return results
+    finally:
+        standin.stop()
+
+
+def bench_steady_state(quick: bool) -> Dict:
+    """Threads and Python heap while 100 monitors tick against the stand-in."""
+    duration = 3.0 if quick else 15.0
+    threads_before = threading.active_count()
+    tracemalloc.start()
+    harness = Harness(symbols=100, positions=100, tick_interval=0.2)
+    try:
+        harness.add_monitors(100, btc_trigger=BTC * 2)
+        harness.tp_sl_monitor.start_all_monitors()
+        time.sleep(1.0)
+        warm, _ = tracemalloc.get_traced_memory()
+        time.sleep(duration)
+        current, peak = tracemalloc.get_traced_memory()
+
+        result = {
+            "duration_s": duration,
+            "threads": threading.active_count(),
+            "threads_added": threading.active_count() - threads_before,
+            "engine_tasks": harness.engine.task_count(),
+            "heap_bytes": current,
+            "heap_peak_bytes": peak,
+            "heap_growth_bytes": current - warm
+        }
+        try:
+            import resource
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            scale = 1 if sys.platform == "darwin" else 1024
+            result["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        except ImportError:
+            pass
+        return result
+    finally:
+        tracemalloc.stop()
+        harness.close()
+
+
+BENCHMARKS: Dict[str, Callable[[bool], Dict]] = {
+    "rule_evaluation": bench_rule_evaluation,
+    "trigger_to_order": bench_trigger_to_order,
+    "api_positions": bench_api_positions,
+    "client_overhead": bench_client_overhead,
+    "steady_state": bench_steady_state,
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _flatten(value, prefix: str = "") -> Dict[str, float]:
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}.{key}" if prefix else key))
+        return flat
+    return {prefix: value} if isinstance(value, (int, float)) else {}
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Lower-is-better metrics that grew by more than ``tolerance``."""
+    now, before = _flatten(current["results"]), _flatten(baseline["results"])
+    regressions = []
+    for name, value in sorted(now.items()):
+        if not name.endswith(("_ms", "_us", "_bytes")) or name not in before or before[name] <= 0:
+            continue
+        change = value / before[name] - 1
+        if change > tolerance:
+            regressions.append(f"{name}: {before[name]} -> {value} (+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite against the Bybit stand-in.")
+    parser.add_argument("--only", default="", help="comma-separated benchmark names: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for a smoke run")
+    parser.add_argument("--output", default="", help="write JSON here instead of stdout")
+    parser.add_argument("--baseline", default="", help="earlier JSON output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative growth before flagging")
+    args = parser.parse_args()
+
+    names = [name for name in args.only.split(",") if name] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick
+        },
+        "results": {}
+    }
+    for name in names:
+        print(f"[BENCH] {name}...", file=sys.stderr)
+        started = time.perf_counter()
+        with quiet():
+            report["results"][name] = BENCHMARKS[name](args.quick)
+        print(f"[BENCH] {name} done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"[BENCH] regression {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
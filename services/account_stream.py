@@ -0,0 +1,244 @@
+import asyncio
+import collections
+import json
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+
+class PrivateAccountStream:
+    """Authenticated Bybit v5 private stream that keeps account state in memory.
+
+    On every (re)connect the position and wallet state is rebuilt from a REST
+    snapshot, then kept current from the position, execution, order and
+    wallet topics. Readers should check ``is_live()`` and use REST otherwise.
+    """
+
+    TASK_NAME = "account-stream"
+    TOPICS = ["position", "execution", "order", "wallet"]
+
+    def __init__(self, bybit_client, engine, ping_interval: float = 20.0, max_backoff: float = 30.0,
+                 reconcile_interval: float = 300.0, history_size: int = 500):
+        self.bybit_client = bybit_client
+        self.engine = engine
+        self.ping_interval = ping_interval
+        self.max_backoff = max_backoff
+        self.reconcile_interval = reconcile_interval
+
+        self._positions: Dict[Tuple[str, str, int], Dict] = {}
+        self._wallet: Dict[str, Dict] = {}
+        self._orders: "collections.OrderedDict[str, Dict]" = collections.OrderedDict()
+        self._executions = collections.deque(maxlen=history_size)
+        self._history_size = history_size
+        self._lock = threading.Lock()
+
+        self._live = False
+        self._listeners: Dict[str, List[Callable[[Dict], None]]] = {topic: [] for topic in self.TOPICS}
+
+        self.reconnects = 0
+        self.messages = 0
+
+    @property
+    def available(self) -> bool:
+        return websockets is not None and self.bybit_client.ws_private_url is not None
+
+    def start(self):
+        if not self.available:
+            reason = "'websockets' is not installed" if websockets is None else "no WebSocket endpoint configured"
+            print(f"[ACCOUNT STREAM] {reason}, using REST polling only")
+            return
+        if not (self.bybit_client.api_key and self.bybit_client.api_secret):
+            return
+        self.engine.ensure(self.TASK_NAME, self._run)
+
+    def stop(self):
+        self.engine.cancel(self.TASK_NAME)
+        self._live = False
+
+    def restart(self):
+        """Drop all account state and reconnect, e.g. after the credentials changed."""
+        self.stop()
+        with self._lock:
+            self._positions.clear()
+            self._wallet.clear()
+            self._orders.clear()
+            self._executions.clear()
+        self.start()
+
+    def is_live(self) -> bool:
+        return self._live
+
+    def add_listener(self, topic: str, listener: Callable[[Dict], None]):
+        """Register ``listener(item)``, called on the engine loop for each item pushed on ``topic``."""
+        self._listeners[topic].append(listener)
+
+    def get_positions(self, category: str = "linear") -> List[Dict]:
+        with self._lock:
+            return [
+                dict(pos) for (cat, _, _), pos in self._positions.items()
+                if cat == category and float(pos.get("size", 0) or 0) > 0
+            ]
+
+    def get_position(self, category: str, symbol: str) -> Optional[Dict]:
+        with self._lock:
+            for (cat, sym, _), pos in self._positions.items():
+                if cat == category and sym == symbol and float(pos.get("size", 0) or 0) > 0:
+                    return dict(pos)
+        return None
+
+    def get_wallet_coins(self) -> List[Dict]:
+        with self._lock:
+            return [dict(coin) for coin in self._wallet.values()]
+
+    def get_orders(self) -> List[Dict]:
+        with self._lock:
+            return [dict(order) for order in self._orders.values()]
+
+    def get_executions(self) -> List[Dict]:
+        with self._lock:
+            return list(self._executions)
+
+    @staticmethod
+    def _position_key(position: Dict) -> Tuple[str, str, int]:
+        return (position.get("category", "linear"), position.get("symbol"), int(position.get("positionIdx", 0) or 0))
+
+    @staticmethod
+    def _normalize_position(position: Dict) -> Dict:
+        # The stream reports entryPrice where the REST list reports avgPrice
+        if "avgPrice" not in position and "entryPrice" in position:
+            position = dict(position, avgPrice=position["entryPrice"])
+        return position
+
+    async def _load_snapshot(self):
+        positions = {}
+        cursor = ""
+        while True:
+            params = {"category": "linear", "settleCoin": "USDT", "limit": 200}
+            if cursor:
+                params["cursor"] = cursor
+            response = await self.bybit_client.get_private("/v5/position/list", params=params)
+            if response.get("retCode") != 0:
+                raise RuntimeError(f"position snapshot failed: {response.get('retMsg')}")
+            result = response.get("result", {})
+            for pos in result.get("list", []):
+                pos = dict(pos, category="linear")
+                positions[self._position_key(pos)] = pos
+            cursor = result.get("nextPageCursor", "")
+            if not cursor:
+                break
+
+        response = await self.bybit_client.get_private(
+            "/v5/account/wallet-balance",
+            params={"accountType": "UNIFIED"}
+        )
+        if response.get("retCode") != 0:
+            raise RuntimeError(f"wallet snapshot failed: {response.get('retMsg')}")
+        accounts = response.get("result", {}).get("list", [])
+        wallet = {coin.get("coin"): coin for coin in (accounts[0].get("coin", []) if accounts else [])}
+
+        with self._lock:
+            self._positions = positions
+            self._wallet = wallet
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send(json.dumps({"op": "ping"}))
+
+    async def _reconcile(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self._load_snapshot()
+            except Exception as e:
+                print(f"[ACCOUNT STREAM] Reconcile failed: {e}")
+
+    async def _authenticate(self, ws):
+        await ws.send(json.dumps({"op": "auth", "args": self.bybit_client.ws_auth_args()}))
+        while True:
+            message = json.loads(await asyncio.wait_for(ws.recv(), timeout=10))
+            if message.get("op") == "auth":
+                if not message.get("success"):
+                    raise RuntimeError(f"auth rejected: {message.get('ret_msg')}")
+                return
+
+    async def _run(self):
+        backoff = 1.0
+
+        while True:
+            background = []
+            try:
+                url = f"{self.bybit_client.ws_private_url}/v5/private"
+                async with websockets.connect(url, ping_interval=None, open_timeout=10) as ws:
+                    await self._authenticate(ws)
+                    await ws.send(json.dumps({"op": "subscribe", "args": self.TOPICS}))
+
+                    # Snapshot after subscribing so no update falls between the two
+                    await self._load_snapshot()
+                    self._live = True
+                    backoff = 1.0
+                    print("[ACCOUNT STREAM] Connected and reconciled")
+
+                    background = [asyncio.ensure_future(self._ping(ws)),
+                                  asyncio.ensure_future(self._reconcile())]
+                    async for raw in ws:
+                        self._handle_message(raw)
+
+                print("[ACCOUNT STREAM] Stream closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[ACCOUNT STREAM] Stream error: {e}")
+            finally:
+                self._live = False
+                for task in background:
+                    task.cancel()
+
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _handle_message(self, raw):
+        message = json.loads(raw)
+        topic = message.get("topic")
+        if topic not in self._listeners:
+            return
+
+        self.messages += 1
+        items = message.get("data", [])
+
+        with self._lock:
+            if topic == "position":
+                items = [self._normalize_position(pos) for pos in items]
+                for pos in items:
+                    key = self._position_key(pos)
+                    # Updates buffered while the REST snapshot loaded may be older than it
+                    current = self._positions.get(key)
+                    if current and int(current.get("updatedTime", 0) or 0) > int(pos.get("updatedTime", 0) or 0):
+                        continue
+                    self._positions[key] = pos
+            elif topic == "wallet":
+                for account in items:
+                    if account.get("accountType", "UNIFIED") != "UNIFIED":
+                        continue
+                    for coin in account.get("coin", []):
+                        self._wallet[coin.get("coin")] = coin
+            elif topic == "order":
+                for order in items:
+                    self._orders[order.get("orderId")] = order
+                    self._orders.move_to_end(order.get("orderId"))
+                while len(self._orders) > self._history_size:
+                    self._orders.popitem(last=False)
+            elif topic == "execution":
+                self._executions.extend(items)
+
+        for item in items:
+            for listener in self._listeners[topic]:
+                try:
+                    listener(item)
+                except Exception as e:
+                    print(f"[ACCOUNT STREAM] Listener error: {e}")
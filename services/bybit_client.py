@@ -1,27 +1,153 @@
+import asyncio
 import hmac
+import json
 import time
 
 import httpx
 from typing import Dict, Any, Optional
+from urllib.parse import urlencode
+
+from services.metrics import Counter, Histogram
+from services.rate_limiter import (
+    RateLimitScheduler, PRIORITY_ORDER, PRIORITY_POLL, RATE_LIMIT_RET_CODE, current_priority
+)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
 
 
 class BybitClient:
 
-    def __init__(self, api_key: str = "", api_secret: str = "", testnet: bool = False, demo: bool = False):
+    # Endpoints that place or protect orders always run at order priority
+    ORDER_ENDPOINTS = ("/v5/order/", "/v5/position/trading-stop")
+
+    def __init__(self, api_key: str = "", api_secret: str = "", testnet: bool = False, demo: bool = False,
+                 timeout: float = 30.0, connect_timeout: float = 5.0, http2: bool = False,
+                 max_connections: int = 20, max_keepalive_connections: int = 10, keepalive_expiry: float = 30.0,
+                 max_retries: int = 3, base_url: Optional[str] = None, ws_url: Optional[str] = None):
+        # Override the Bybit endpoints, e.g. to point at a local stand-in server.
+        # With only base_url overridden there is no WebSocket endpoint and the
+        # streams stay off, so nothing from the real exchange leaks in
+        self.base_url_override = base_url.rstrip("/") if base_url else None
+        self.ws_url_override = ws_url.rstrip("/") if ws_url else None
+        self.api_key = ""
+        self.api_secret = ""
+        self._set_credentials(api_key, api_secret)
+        self._set_environment(testnet, demo)
+
+        self.recv_window = "20000"
+
+        # Server minus local clock in ms, kept current by ClockSync in the background
+        self.time_offset = 0
+
+        # Connection pool settings shared by every session this client opens
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2 and _http2_available()
+        if http2 and not self.http2:
+            print("[BYBIT CLIENT] HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+
+        # Leave a few pooled connections free for order placement at all times
+        self.rate_limiter = RateLimitScheduler(low_priority_slots=max(max_connections - 4, 1))
+        self.max_retries = max_retries
+
+        # Per-endpoint wire time (rate-limit waits excluded) and outcomes by retCode
+        self.request_duration = Histogram("bybit_request_duration_seconds",
+                                          "Bybit REST round trip time, excluding rate-limit waits",
+                                          ("method", "endpoint"))
+        self.request_results = Counter("bybit_requests_total",
+                                       "Bybit REST responses by retCode (http_<status> or error if none)",
+                                       ("endpoint", "ret_code"))
+
+        # httpx pools are bound to the event loop they were first used on,
+        # so keep one long-lived session per loop
+        self._sessions: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+    def _set_credentials(self, api_key: str, api_secret: str) -> None:
         self.api_key = api_key.strip().strip("'").strip('"')
         self.api_secret = api_secret.strip().strip("'").strip('"')
 
-        if demo:
+    def _set_environment(self, testnet: bool, demo: bool) -> None:
+        self.testnet = testnet
+        self.demo = demo
+
+        if self.base_url_override:
+            self.base_url = self.base_url_override
+        elif demo:
             self.base_url = "https://api-demo.bybit.com"
         elif testnet:
             self.base_url = "https://api-testnet.bybit.com"
         else:
             self.base_url = "https://api.bybit.com"
 
-        self.recv_window = "20000"
+        if self.ws_url_override or self.base_url_override:
+            self.ws_public_url = self.ws_private_url = self.ws_url_override
+            return
 
-        self.time_offset = 0
-        self.last_sync = 0
+        # Demo trading uses mainnet public market data
+        if testnet and not demo:
+            self.ws_public_url = "wss://stream-testnet.bybit.com"
+        else:
+            self.ws_public_url = "wss://stream.bybit.com"
+
+        if demo:
+            self.ws_private_url = "wss://stream-demo.bybit.com"
+        else:
+            self.ws_private_url = self.ws_public_url
+
+    def reconfigure(self, api_key: str, api_secret: str, testnet: bool, demo: bool) -> bool:
+        """Swap credentials and environment in place, keeping the connection pools.
+
+        Returns True when the environment (REST or WebSocket endpoints) changed.
+        """
+        previous = (self.base_url, self.ws_public_url, self.ws_private_url)
+        previous_key = self.api_key
+        self._set_credentials(api_key, api_secret)
+        self._set_environment(testnet, demo)
+
+        environment_changed = previous != (self.base_url, self.ws_public_url, self.ws_private_url)
+        if environment_changed or self.api_key != previous_key:
+            # Rate-limit budgets are per account and environment
+            self.rate_limiter.reset()
+        return environment_changed
+
+    async def __aenter__(self) -> "BybitClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    def _get_session(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.is_closed:
+            self._prune_sessions()
+            session = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2
+            )
+            self._sessions[loop] = session
+        return session
+
+    def _prune_sessions(self) -> None:
+        for loop in [l for l in self._sessions if l.is_closed()]:
+            del self._sessions[loop]
+
+    async def aclose(self) -> None:
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.is_closed:
+            await session.aclose()
+        self._prune_sessions()
 
     def _generate_signature(self, timestamp: str, params: str) -> str:
         param_str = f"{timestamp}{self.api_key}{self.recv_window}{params}"
@@ -31,6 +157,15 @@ class BybitClient:
             digestmod="sha256"
         ).hexdigest()
 
+    def ws_auth_args(self, valid_for_ms: int = 10000) -> list:
+        expires = int(self._get_timestamp()) + valid_for_ms
+        signature = hmac.new(
+            self.api_secret.encode("utf-8"),
+            f"GET/realtime{expires}".encode("utf-8"),
+            digestmod="sha256"
+        ).hexdigest()
+        return [self.api_key, expires, signature]
+
     def _get_headers(self, signature: str, timestamp: str) -> Dict[str, str]:
         return {
             "X-BAPI-API-KEY": self.api_key,
@@ -40,73 +175,108 @@ class BybitClient:
             "Content-Type": "application/json"
         }
 
-    async def _sync_time(self) -> None:
-        try:
-            if time.time() - self.last_sync < 300:
-                return
+    def _get_timestamp(self) -> str:
+        local_time = int(time.time() * 1000)
+        return str(local_time + self.time_offset)
 
+    def _request_timeout(self, timeout: Optional[float]):
+        return self.timeout if timeout is None else timeout
 
-            url = f"{self.base_url}/v5/market/time"
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url)
-                data = response.json()
+    def _default_priority(self, endpoint: str) -> int:
+        priority = current_priority()
+        if endpoint.startswith(self.ORDER_ENDPOINTS):
+            return PRIORITY_ORDER
+        return PRIORITY_POLL if priority is None else priority
 
-                if data.get("retCode") == 0:
-                    server_time = int(data["result"]["timeSecond"]) * 1000
-                    local_time = int(time.time() * 1000)
-                    self.time_offset = server_time - local_time
-                    self.last_sync = time.time()
+    async def _send(self, method: str, endpoint: str, build_request, timeout: Optional[float],
+                    priority: Optional[int], timings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Send a request through the rate-limit scheduler, retrying when Bybit throttles it.
 
-                    print(f"Time synced with Bybit. Offset: {self.time_offset}ms")
-        except Exception as e:
-            print(f"Failed to sync time: {e}")
-            self.time_offset = 0
+        ``build_request`` returns the httpx request kwargs and is called again
+        for each attempt so signed requests get a fresh timestamp. If given,
+        ``timings`` gets the ``signed_at``/``acked_at`` times of the last
+        attempt and the number of ``attempts``.
+        """
+        if priority is None:
+            priority = self._default_priority(endpoint)
 
-    def _get_timestamp(self) -> str:
-        local_time = int(time.time() * 1000)
-        return str(local_time + self.time_offset)
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(endpoint, priority)
+            started = time.perf_counter()
+            try:
+                request = build_request()
+                if timings is not None:
+                    timings["signed_at"] = time.time()
+                response = await self._get_session().request(
+                    method, f"{self.base_url}{endpoint}",
+                    timeout=self._request_timeout(timeout), **request
+                )
+            except Exception:
+                self.request_results.inc(endpoint, "error")
+                raise
+            finally:
+                self.rate_limiter.release(priority)
+            self.request_duration.observe(time.perf_counter() - started, method, endpoint)
 
-    async def get_public(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        url = f"{self.base_url}{endpoint}"
+            if timings is not None:
+                timings["acked_at"] = time.time()
+                timings["attempts"] = attempt + 1
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, params=params or {})
-            response.raise_for_status()
-            return response.json()
+            self.rate_limiter.update(endpoint, response.headers, self.time_offset)
 
-    async def get_private(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        await self._sync_time()
+            throttled = response.status_code in (403, 429)
+            data = None
+            if not throttled and not response.is_error:
+                data = response.json()
+            self.request_results.inc(endpoint, f"http_{response.status_code}" if data is None else data.get("retCode"))
 
-        timestamp = self._get_timestamp()
+            if not throttled:
+                response.raise_for_status()
+                throttled = data.get("retCode") == RATE_LIMIT_RET_CODE
 
-        param_dict = params or {}
-        sorted_keys = sorted(param_dict.keys())
-        query_string = "&".join([f"{k}={param_dict[k]}" for k in sorted_keys])
+            if not throttled:
+                return data
 
-        signature = self._generate_signature(timestamp, query_string)
-        headers = self._get_headers(signature, timestamp)
+            delay = self.rate_limiter.throttle(endpoint)
+            attempt += 1
+            print(f"[BYBIT CLIENT] Rate limited on {endpoint} (attempt {attempt}), backing off {delay:.2f}s")
+            if attempt > self.max_retries:
+                if data is None:
+                    response.raise_for_status()
+                return data
 
-        url = f"{self.base_url}{endpoint}"
+    async def get_public(self, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                         timeout: Optional[float] = None, priority: Optional[int] = None) -> Dict[str, Any]:
+        return await self._send("GET", endpoint, lambda: {"params": params or {}}, timeout, priority)
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, params=params or {}, headers=headers)
-            response.raise_for_status()
-            return response.json()
+    async def get_private(self, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                          timeout: Optional[float] = None, priority: Optional[int] = None) -> Dict[str, Any]:
+        param_dict = params or {}
+        # Sign exactly the query string that is sent
+        query_string = urlencode([(k, param_dict[k]) for k in sorted(param_dict.keys())])
 
-    async def post_private(self, endpoint: str, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        await self._sync_time()
+        def build_request():
+            timestamp = self._get_timestamp()
+            signature = self._generate_signature(timestamp, query_string)
+            return {
+                "params": query_string,
+                "headers": self._get_headers(signature, timestamp)
+            }
 
-        timestamp = self._get_timestamp()
+        return await self._send("GET", endpoint, build_request, timeout, priority)
 
-        import json
+    async def post_private(self, endpoint: str, data: Optional[Dict[str, Any]] = None,
+                           timeout: Optional[float] = None, priority: Optional[int] = None,
+                           timings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         body = json.dumps(data or {})
 
-        signature = self._generate_signature(timestamp, body)
-        headers = self._get_headers(signature, timestamp)
-
-        url = f"{self.base_url}{endpoint}"
+        def build_request():
+            timestamp = self._get_timestamp()
+            signature = self._generate_signature(timestamp, body)
+            return {
+                "content": body,
+                "headers": self._get_headers(signature, timestamp)
+            }
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, content=body, headers=headers)
-            response.raise_for_status()
-            return response.json()
\ No newline at end of file
+        return await self._send("POST", endpoint, build_request, timeout, priority, timings)
@@ -0,0 +1,771 @@
+"""Offline stand-in for the Bybit v5 REST API.
+
+Serves the endpoints this app uses from in-memory state so the client,
+monitors and API routes can be exercised without network access:
+
+    standin = BybitStandin(latency=0.02).start()
+    client = BybitClient(standin.api_key, standin.api_secret, base_url=standin.url)
+
+Prices follow scriptable paths, market orders fill at the current price
+against the simulated positions and balances, and signed requests are
+verified like Bybit does. Latency, server errors and rate limits can be
+injected globally or per endpoint. With ``ws=True`` it also serves the public
+ticker WebSocket (``ws_url``), whose connections can be dropped or frozen
+half-open. Run ``python -m services.bybit_standin`` to serve it standalone.
+"""
+import argparse
+import asyncio
+import bisect
+import collections
+import hmac
+import itertools
+import json
+import random
+import threading
+import time
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+
+class PricePath:
+    """Piecewise-linear price over seconds since the stand-in started."""
+
+    def __init__(self, points: Sequence[Tuple[float, float]], repeat: bool = False, start: float = 0.0):
+        if not points:
+            raise ValueError("a price path needs at least one point")
+        points = sorted(points)
+        self.times = [float(t) for t, _ in points]
+        self.prices = [float(p) for _, p in points]
+        self.repeat = repeat
+        self.start = start
+
+    def price_at(self, elapsed: float) -> float:
+        elapsed -= self.start
+        if self.repeat and self.times[-1] > 0:
+            elapsed %= self.times[-1]
+        i = bisect.bisect_right(self.times, elapsed)
+        if i == 0:
+            return self.prices[0]
+        if i == len(self.times):
+            return self.prices[-1]
+        t0, t1 = self.times[i - 1], self.times[i]
+        p0, p1 = self.prices[i - 1], self.prices[i]
+        return p0 + (p1 - p0) * (elapsed - t0) / (t1 - t0)
+
+
+class Faults:
+    """Latency, error and rate-limit injection for one endpoint (or all)."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, rate_limit: Optional[int] = None, rate_window: float = 1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+
+
+class _QuietHandler(WSGIRequestHandler):
+    # Keep-alive like the real API, and no per-request access log
+    protocol_version = "HTTP/1.1"
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class _Reject(Exception):
+    def __init__(self, ret_code: int, ret_msg: str):
+        super().__init__(ret_msg)
+        self.ret_code = ret_code
+        self.ret_msg = ret_msg
+
+
+class _PublicStream:
+    """Public ``/v5/public/<category>`` WebSocket: ``tickers.<symbol>`` topics and ping/pong.
+
+    Runs its own event loop thread. Subscribed tickers are pushed whenever
+    their price changes, checked every ``interval`` seconds.
+    """
+
+    def __init__(self, standin: "BybitStandin", host: str, port: int, interval: float):
+        if websockets is None:
+            raise RuntimeError("the WebSocket stand-in needs the 'websockets' package")
+        self.standin = standin
+        self.host = host
+        self.port = port
+        self.interval = interval
+        # While frozen nothing is sent, not even pongs, like a half-open socket
+        self.frozen = False
+        self.connections = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._sockets: set = set()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        async def serve():
+            self._server = await websockets.serve(self._handle, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(serve())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="bybit-standin-ws", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self):
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+        self._loop = None
+
+    def drop(self):
+        """Close every connection cleanly, as a server restart would."""
+        async def close_all():
+            for ws in list(self._sockets):
+                await ws.close()
+
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(close_all(), self._loop).result(5)
+
+    async def _send(self, ws, message: Dict):
+        if not self.frozen:
+            await ws.send(json.dumps(message))
+
+    def _push(self, category: str, symbol: str) -> Dict:
+        with self.standin._lock:
+            ticker = self.standin._ticker(category, symbol)
+        return {"topic": f"tickers.{symbol}", "type": "snapshot", "ts": int(self.standin.server_time_ms()),
+                "data": ticker}
+
+    async def _handle(self, ws, path: Optional[str] = None):
+        request_path = path or getattr(getattr(ws, "request", None), "path", None) or getattr(ws, "path", "")
+        category = request_path.rstrip("/").rsplit("/", 1)[-1]
+        if category not in ("linear", "spot"):
+            # Only the public streams are simulated
+            await ws.close(1008, "unsupported stream")
+            return
+        subscribed: Dict[str, Optional[str]] = {}
+        self._sockets.add(ws)
+        self.connections += 1
+
+        async def push_changes():
+            while True:
+                await asyncio.sleep(self.interval)
+                for symbol, last in list(subscribed.items()):
+                    message = self._push(category, symbol)
+                    if message["data"]["lastPrice"] != last:
+                        subscribed[symbol] = message["data"]["lastPrice"]
+                        await self._send(ws, message)
+
+        pusher = asyncio.ensure_future(push_changes())
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                op = message.get("op")
+                if op == "ping":
+                    await self._send(ws, {"success": True, "ret_msg": "pong", "op": "ping"})
+                elif op in ("subscribe", "unsubscribe"):
+                    for topic in message.get("args", []):
+                        kind, _, symbol = topic.partition(".")
+                        if kind != "tickers" or (category, symbol) not in self.standin._instruments:
+                            continue
+                        if op == "unsubscribe":
+                            subscribed.pop(symbol, None)
+                            continue
+                        snapshot = self._push(category, symbol)
+                        subscribed[symbol] = snapshot["data"]["lastPrice"]
+                        await self._send(ws, snapshot)
+                    await self._send(ws, {"success": True, "ret_msg": "", "op": op})
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            pusher.cancel()
+            self._sockets.discard(ws)
+
+
+class BybitStandin:
+
+    DEFAULT_PAGE_LIMIT = {"/v5/market/instruments-info": 500, "/v5/position/list": 20}
+    MAX_PAGE_LIMIT = {"/v5/market/instruments-info": 1000, "/v5/position/list": 200}
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, api_key: str = "standin-key",
+                 api_secret: str = "standin-secret", latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, rate_limit: Optional[int] = None, rate_window: float = 1.0,
+                 clock_skew_ms: float = 0.0, seed: Optional[int] = None, ws: bool = False, ws_port: int = 0,
+                 ws_interval: float = 0.05):
+        self.host = host
+        self.port = port
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.clock_skew_ms = clock_skew_ms
+
+        self.faults = Faults(latency, jitter, error_rate, rate_limit=rate_limit, rate_window=rate_window)
+        self.endpoint_faults: Dict[str, Faults] = {}
+        self._random = random.Random(seed)
+
+        self._lock = threading.RLock()
+        self._started_at = time.time()
+        # (category, symbol) -> instrument / price source
+        self._instruments: Dict[Tuple[str, str], Dict] = {}
+        self._paths: Dict[Tuple[str, str], PricePath] = {}
+        # (symbol, positionIdx) -> position
+        self._positions: Dict[Tuple[str, int], Dict] = {}
+        self._balances: Dict[str, Decimal] = {"USDT": Decimal("10000")}
+        self._order_ids = itertools.count(1)
+        # endpoint -> (window start, count)
+        self._windows: Dict[str, Tuple[float, int]] = {}
+
+        self.orders: List[Dict] = []
+        self.trading_stops: List[Dict] = []
+        self.request_counts: collections.Counter = collections.Counter()
+        # Called with each accepted order (outside the lock), e.g. to time trigger-to-order latency
+        self.order_listeners: List[Callable[[Dict], None]] = []
+
+        self.app = Flask("bybit_standin")
+        self._routes()
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self.stream = _PublicStream(self, host, ws_port, ws_interval) if ws else None
+
+        for category in ("linear", "spot"):
+            self.add_instrument("BTCUSDT", category, price=60000, qty_step="0.001", min_qty="0.001",
+                                max_qty="100", tick_size="0.1")
+            self.add_instrument("ETHUSDT", category, price=3000, qty_step="0.01", min_qty="0.01",
+                                max_qty="1000", tick_size="0.01")
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def ws_url(self) -> Optional[str]:
+        return f"ws://{self.host}:{self.stream.port}" if self.stream else None
+
+    def start(self) -> "BybitStandin":
+        self._server = make_server(self.host, self.port, self.app, threaded=True, request_handler=_QuietHandler)
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bybit-standin", daemon=True)
+        self._thread.start()
+        if self.stream:
+            self.stream.start()
+        return self
+
+    def stop(self):
+        if self.stream:
+            self.stream.stop()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "BybitStandin":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # Scenario setup
+
+    def server_time_ms(self) -> float:
+        return time.time() * 1000 + self.clock_skew_ms
+
+    def elapsed(self) -> float:
+        return time.time() - self._started_at
+
+    def add_instrument(self, symbol: str, category: str = "linear", price: float = 1.0, qty_step: str = "0.1",
+                       min_qty: Optional[str] = None, max_qty: str = "1000000", tick_size: str = "0.0001"):
+        lot = {"minOrderQty": min_qty or qty_step, "maxOrderQty": max_qty}
+        if category == "spot":
+            lot["basePrecision"] = qty_step
+        else:
+            lot["qtyStep"] = qty_step
+            lot["maxMktOrderQty"] = max_qty
+        with self._lock:
+            self._instruments[(category, symbol)] = {
+                "symbol": symbol,
+                "status": "Trading",
+                "baseCoin": symbol[:-len("USDT")],
+                "quoteCoin": "USDT",
+                "lotSizeFilter": lot,
+                "priceFilter": {"tickSize": tick_size, "minPrice": tick_size, "maxPrice": "10000000"}
+            }
+            self._paths[(category, symbol)] = PricePath([(0, price)])
+
+    def set_price(self, symbol: str, price: float, category: Optional[str] = None):
+        self.set_path(symbol, [(0, price)], category)
+
+    def set_path(self, symbol: str, points: Sequence[Tuple[float, float]], category: Optional[str] = None,
+                 repeat: bool = False, relative: bool = True):
+        """Script ``symbol``'s price; ``points`` are (seconds from now, price) unless ``relative`` is False."""
+        path = PricePath(points, repeat=repeat, start=self.elapsed() if relative else 0.0)
+        with self._lock:
+            for cat in ([category] if category else ("linear", "spot")):
+                if (cat, symbol) in self._instruments:
+                    self._paths[(cat, symbol)] = path
+
+    def price(self, symbol: str, category: str = "linear") -> float:
+        path = self._paths.get((category, symbol))
+        if path is None:
+            raise KeyError(symbol)
+        return path.price_at(self.elapsed())
+
+    def add_position(self, symbol: str, side: str, size: float, avg_price: Optional[float] = None,
+                     leverage: float = 10, position_idx: int = 0):
+        with self._lock:
+            self._positions[(symbol, position_idx)] = {
+                "symbol": symbol,
+                "side": side,
+                "size": Decimal(str(size)),
+                "avgPrice": Decimal(str(avg_price if avg_price is not None else self.price(symbol))),
+                "leverage": str(leverage),
+                "positionIdx": position_idx,
+                "takeProfit": "",
+                "stopLoss": "",
+                "createdTime": str(int(time.time() * 1000)),
+                "updatedTime": str(int(time.time() * 1000))
+            }
+
+    def set_balance(self, coin: str, amount: float):
+        with self._lock:
+            self._balances[coin] = Decimal(str(amount))
+
+    def position(self, symbol: str, position_idx: int = 0) -> Optional[Dict]:
+        with self._lock:
+            position = self._positions.get((symbol, position_idx))
+            return dict(position) if position else None
+
+    def balance(self, coin: str) -> Decimal:
+        with self._lock:
+            return self._balances.get(coin, Decimal(0))
+
+    def inject(self, endpoint: Optional[str] = None, **faults):
+        """Set faults (latency, jitter, error_rate, error_status, rate_limit, rate_window) globally or per endpoint."""
+        target = self.faults if endpoint is None else self.endpoint_faults.setdefault(endpoint, Faults())
+        for name, value in faults.items():
+            if not hasattr(target, name):
+                raise TypeError(f"unknown fault {name!r}")
+            setattr(target, name, value)
+
+    def reset_faults(self):
+        self.faults = Faults()
+        self.endpoint_faults.clear()
+
+    # ------------------------------------------------------------------
+    # HTTP plumbing
+
+    def _routes(self):
+        public = {
+            "/v5/market/time": self._market_time,
+            "/v5/market/tickers": self._tickers,
+            "/v5/market/instruments-info": self._instruments_info,
+        }
+        private_get = {
+            "/v5/position/list": self._position_list,
+            "/v5/account/wallet-balance": self._wallet_balance,
+        }
+        private_post = {
+            "/v5/order/create": self._order_create,
+            "/v5/order/create-batch": self._order_create_batch,
+            "/v5/position/trading-stop": self._trading_stop,
+        }
+
+        for path, handler in public.items():
+            self.app.add_url_rule(path, path, self._wrap(path, handler, signed=False), methods=["GET"])
+        for path, handler in private_get.items():
+            self.app.add_url_rule(path, path, self._wrap(path, handler, signed=True), methods=["GET"])
+        for path, handler in private_post.items():
+            self.app.add_url_rule(path, path, self._wrap(path, handler, signed=True), methods=["POST"])
+
+    def _wrap(self, path: str, handler: Callable[[Dict], Dict], signed: bool):
+        def view():
+            with self._lock:
+                self.request_counts[path] += 1
+            faults = self.endpoint_faults.get(path, self.faults)
+
+            delay = faults.latency + (self._random.uniform(0, faults.jitter) if faults.jitter else 0.0)
+            if delay:
+                time.sleep(delay)
+
+            headers, limited = self._rate_limit(path, faults)
+            if limited and not signed:
+                # Public IP limits come back as HTTP 403
+                return Response("access too frequent", status=403, headers=headers)
+
+            if faults.error_rate and self._random.random() < faults.error_rate:
+                return Response("Service Unavailable", status=faults.error_status, headers=headers)
+
+            try:
+                if limited:
+                    raise _Reject(10006, "Too many visits!")
+                if signed:
+                    self._authenticate()
+                    params = request.args.to_dict() if request.method == "GET" else json.loads(
+                        request.get_data(as_text=True) or "{}")
+                else:
+                    params = request.args.to_dict()
+                body = {"retCode": 0, "retMsg": "OK", "result": handler(params), "retExtInfo": {}}
+            except _Reject as e:
+                body = {"retCode": e.ret_code, "retMsg": e.ret_msg, "result": {}, "retExtInfo": {}}
+
+            if "_ext" in body["result"]:
+                body["retExtInfo"] = body["result"].pop("_ext")
+            body["time"] = int(self.server_time_ms())
+            return Response(json.dumps(body), mimetype="application/json", headers=headers)
+
+        return view
+
+    def _rate_limit(self, path: str, faults: Faults) -> Tuple[Dict[str, str], bool]:
+        if not faults.rate_limit:
+            return {}, False
+        now = time.time()
+        with self._lock:
+            start, count = self._windows.get(path, (now, 0))
+            if now - start >= faults.rate_window:
+                start, count = now, 0
+            count += 1
+            self._windows[path] = (start, count)
+
+        reset_ms = int((start + faults.rate_window) * 1000 + self.clock_skew_ms)
+        headers = {
+            "X-Bapi-Limit": str(faults.rate_limit),
+            "X-Bapi-Limit-Status": str(max(faults.rate_limit - count, 0)),
+            "X-Bapi-Limit-Reset-Timestamp": str(reset_ms)
+        }
+        return headers, count > faults.rate_limit
+
+    def _authenticate(self):
+        key = request.headers.get("X-BAPI-API-KEY", "")
+        timestamp = request.headers.get("X-BAPI-TIMESTAMP", "")
+        signature = request.headers.get("X-BAPI-SIGN", "")
+        recv_window = request.headers.get("X-BAPI-RECV-WINDOW", "5000")
+
+        if key != self.api_key:
+            raise _Reject(10003, "API key is invalid.")
+        try:
+            ts = int(timestamp)
+        except ValueError:
+            raise _Reject(10002, "invalid request, please check your timestamp")
+
+        # Bybit: server_time - recv_window <= timestamp < server_time + 1000
+        now = self.server_time_ms()
+        if not (now - int(recv_window) <= ts < now + 1000):
+            raise _Reject(10002, "invalid request, please check your server timestamp or recv_window param")
+
+        payload = request.query_string.decode() if request.method == "GET" else request.get_data(as_text=True)
+        expected = hmac.new(self.api_secret.encode(), f"{timestamp}{key}{recv_window}{payload}".encode(),
+                            digestmod="sha256").hexdigest()
+        if not hmac.compare_digest(expected, signature):
+            raise _Reject(10004, "error sign! origin_string[%s]" % f"{timestamp}{key}{recv_window}{payload}")
+
+    def _page(self, path: str, items: List[Dict], params: Dict) -> Dict:
+        limit = min(int(params.get("limit") or self.DEFAULT_PAGE_LIMIT[path]), self.MAX_PAGE_LIMIT[path])
+        start = int(params.get("cursor") or 0)
+        end = start + limit
+        return {"list": items[start:end], "nextPageCursor": str(end) if end < len(items) else ""}
+
+    # ------------------------------------------------------------------
+    # Market endpoints
+
+    def _market_time(self, params: Dict) -> Dict:
+        now = self.server_time_ms()
+        return {"timeSecond": str(int(now // 1000)), "timeNano": str(int(now * 1_000_000))}
+
+    def _ticker(self, category: str, symbol: str) -> Dict:
+        instrument = self._instruments[(category, symbol)]
+        tick = Decimal(instrument["priceFilter"]["tickSize"])
+        price = Decimal(str(self.price(symbol, category))).quantize(tick)
+        ticker = {
+            "symbol": symbol,
+            "lastPrice": str(price),
+            "bid1Price": str(price - tick),
+            "ask1Price": str(price + tick),
+            "prevPrice24h": str(price),
+            "price24hPcnt": "0",
+            "volume24h": "0",
+            "turnover24h": "0"
+        }
+        if category == "linear":
+            ticker["markPrice"] = str(price)
+            ticker["indexPrice"] = str(price)
+        return ticker
+
+    def _tickers(self, params: Dict) -> Dict:
+        category = params.get("category", "")
+        symbol = params.get("symbol")
+        with self._lock:
+            if symbol:
+                if (category, symbol) not in self._instruments:
+                    raise _Reject(10001, "Not supported symbols")
+                symbols = [symbol]
+            else:
+                symbols = [s for (c, s) in self._instruments if c == category]
+            return {"category": category, "list": [self._ticker(category, s) for s in symbols]}
+
+    def _instruments_info(self, params: Dict) -> Dict:
+        category = params.get("category", "")
+        with self._lock:
+            items = [dict(info) for (c, _), info in self._instruments.items() if c == category]
+        if params.get("symbol"):
+            items = [item for item in items if item["symbol"] == params["symbol"]]
+        page = self._page("/v5/market/instruments-info", items, params)
+        page["category"] = category
+        return page
+
+    # ------------------------------------------------------------------
+    # Account endpoints
+
+    def _position_view(self, position: Dict) -> Dict:
+        mark = Decimal(str(self.price(position["symbol"], "linear")))
+        size, avg = position["size"], position["avgPrice"]
+        direction = 1 if position["side"] == "Buy" else -1
+        return dict(
+            position,
+            size=str(size),
+            avgPrice=str(avg),
+            markPrice=str(mark),
+            positionValue=str(size * avg),
+            unrealisedPnl=str((mark - avg) * size * direction),
+            liqPrice="",
+            category="linear"
+        )
+
+    def _position_list(self, params: Dict) -> Dict:
+        if params.get("category") != "linear":
+            raise _Reject(10001, "category only support linear or option or inverse")
+        symbol = params.get("symbol")
+        if not symbol and not params.get("settleCoin"):
+            raise _Reject(10001, "symbol or settleCoin is required")
+        with self._lock:
+            items = [self._position_view(p) for p in self._positions.values()
+                     if p["size"] > 0 and (not symbol or p["symbol"] == symbol)]
+        return self._page("/v5/position/list", items, params)
+
+    def _wallet_balance(self, params: Dict) -> Dict:
+        if params.get("accountType") != "UNIFIED":
+            raise _Reject(10001, "accountType only support UNIFIED")
+        coins = []
+        total = Decimal(0)
+        with self._lock:
+            for coin, amount in self._balances.items():
+                if coin in ("USDT", "USDC"):
+                    price = Decimal(1)
+                elif ("spot", f"{coin}USDT") in self._instruments:
+                    price = Decimal(str(self.price(f"{coin}USDT", "spot")))
+                else:
+                    price = Decimal(0)
+                value = amount * price
+                total += value
+                coins.append({"coin": coin, "walletBalance": str(amount), "equity": str(amount),
+                              "usdValue": str(value), "locked": "0"})
+        return {"list": [{"accountType": "UNIFIED", "totalEquity": str(total), "coin": coins}]}
+
+    # ------------------------------------------------------------------
+    # Trading endpoints
+
+    def _check_qty(self, category: str, symbol: str, qty: str) -> Decimal:
+        instrument = self._instruments.get((category, symbol))
+        if instrument is None:
+            raise _Reject(10001, "symbol invalid")
+        lot = instrument["lotSizeFilter"]
+        step = Decimal(lot.get("qtyStep") or lot["basePrecision"])
+        try:
+            value = Decimal(str(qty))
+        except Exception:
+            raise _Reject(10001, "Qty invalid")
+        if value % step != 0:
+            raise _Reject(170137 if category == "spot" else 10001, "Order quantity has too many decimals.")
+        if value < Decimal(lot["minOrderQty"]):
+            raise _Reject(170136 if category == "spot" else 10001, "Order quantity below the lower limit.")
+        if value > Decimal(lot.get("maxMktOrderQty") or lot["maxOrderQty"]):
+            raise _Reject(170137 if category == "spot" else 10001, "Order quantity exceeded the upper limit.")
+        return value
+
+    def _fill_linear(self, order: Dict, qty: Decimal, price: Decimal) -> Decimal:
+        symbol = order["symbol"]
+        key = (symbol, int(order.get("positionIdx", 0) or 0))
+        position = self._positions.get(key)
+        side = order["side"]
+
+        if position is None or position["size"] == 0:
+            if order.get("reduceOnly"):
+                raise _Reject(110017, "current position is zero, cannot fix reduce-only order qty")
+            self.add_position(symbol, side, float(qty), float(price), position_idx=key[1])
+            return qty
+
+        if position["side"] == side:
+            if order.get("reduceOnly"):
+                raise _Reject(110017, "reduce-only order has same side with current position")
+            total = position["size"] + qty
+            position["avgPrice"] = (position["avgPrice"] * position["size"] + price * qty) / total
+            position["size"] = total
+        else:
+            # Reduce-only orders are trimmed to the position size
+            filled = min(qty, position["size"]) if order.get("reduceOnly") else qty
+            position["size"] -= filled
+            if position["size"] < 0:
+                position["size"] = -position["size"]
+                position["side"] = side
+                position["avgPrice"] = price
+            qty = filled
+        position["updatedTime"] = str(int(time.time() * 1000))
+        return qty
+
+    def _fill_spot(self, order: Dict, qty: Decimal, price: Decimal) -> Decimal:
+        base = order["symbol"][:-len("USDT")]
+        if order["side"] == "Sell":
+            if self._balances.get(base, Decimal(0)) < qty:
+                raise _Reject(170131, "Insufficient balance.")
+            self._balances[base] -= qty
+            self._balances["USDT"] = self._balances.get("USDT", Decimal(0)) + qty * price
+        else:
+            # Market buys are sized in the quote coin unless marketUnit says otherwise
+            if order.get("marketUnit") != "baseCoin":
+                qty = qty / price
+            cost = qty * price
+            if self._balances.get("USDT", Decimal(0)) < cost:
+                raise _Reject(170131, "Insufficient balance.")
+            self._balances["USDT"] -= cost
+            self._balances[base] = self._balances.get(base, Decimal(0)) + qty
+        return qty
+
+    def _place(self, order: Dict) -> Dict:
+        category = order.get("category")
+        symbol = order.get("symbol", "")
+        if category not in ("linear", "spot"):
+            raise _Reject(10001, "category invalid")
+        if order.get("side") not in ("Buy", "Sell"):
+            raise _Reject(10001, "side invalid")
+        if order.get("orderType", "Market") != "Market":
+            raise _Reject(10001, "the stand-in only fills Market orders")
+
+        with self._lock:
+            qty = self._check_qty(category, symbol, order.get("qty", "0"))
+            price = Decimal(str(self.price(symbol, category)))
+            if category == "linear":
+                filled = self._fill_linear(order, qty, price)
+            else:
+                filled = self._fill_spot(order, qty, price)
+
+            record = {
+                "orderId": f"standin-{next(self._order_ids)}",
+                "orderLinkId": order.get("orderLinkId", ""),
+                "category": category,
+                "symbol": symbol,
+                "side": order["side"],
+                "qty": str(qty),
+                "filledQty": str(filled),
+                "price": str(price),
+                "reduceOnly": bool(order.get("reduceOnly")),
+                "received_at": time.time()
+            }
+            self.orders.append(record)
+
+        for listener in self.order_listeners:
+            listener(record)
+        return record
+
+    def _order_create(self, params: Dict) -> Dict:
+        record = self._place(params)
+        return {"orderId": record["orderId"], "orderLinkId": record["orderLinkId"]}
+
+    def _order_create_batch(self, params: Dict) -> Dict:
+        category = params.get("category")
+        requests = params.get("request") or []
+        limit = 10 if category == "spot" else 20
+        if not requests or len(requests) > limit:
+            raise _Reject(10001, f"batch size must be between 1 and {limit}")
+
+        created, statuses = [], []
+        for order in requests:
+            try:
+                record = self._place(dict(order, category=category))
+                created.append({"category": category, "symbol": record["symbol"], "orderId": record["orderId"],
+                                "orderLinkId": record["orderLinkId"], "createAt": str(int(record["received_at"] * 1000))})
+                statuses.append({"code": 0, "msg": "OK"})
+            except _Reject as e:
+                created.append({"category": category, "symbol": order.get("symbol", ""), "orderId": "",
+                                "orderLinkId": order.get("orderLinkId", ""), "createAt": ""})
+                statuses.append({"code": e.ret_code, "msg": e.ret_msg})
+        return {"list": created, "_ext": {"list": statuses}}
+
+    def _trading_stop(self, params: Dict) -> Dict:
+        symbol = params.get("symbol", "")
+        key = (symbol, int(params.get("positionIdx", 0) or 0))
+        with self._lock:
+            position = self._positions.get(key)
+            if params.get("category") != "linear" or position is None or position["size"] == 0:
+                raise _Reject(10001, "can not set tp/sl/ts for zero position")
+            tick = Decimal(self._instruments[("linear", symbol)]["priceFilter"]["tickSize"])
+            for field in ("takeProfit", "stopLoss"):
+                if field in params:
+                    value = Decimal(str(params[field]))
+                    if value % tick != 0:
+                        raise _Reject(10001, f"{field} price precision invalid")
+                    position[field] = str(params[field])
+            self.trading_stops.append(dict(params, received_at=time.time()))
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve an offline Bybit v5 stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--api-key", default="standin-key")
+    parser.add_argument("--api-secret", default="standin-secret")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 503")
+    parser.add_argument("--rate-limit", type=int, default=None, help="requests per endpoint per second")
+    parser.add_argument("--ws-port", type=int, default=None, help="also serve the public WebSocket on this port")
+    parser.add_argument("--btc-path", default=None,
+                        help='JSON list of [seconds, price] points for BTCUSDT, e.g. "[[0,60000],[60,59000]]"')
+    parser.add_argument("--repeat", action="store_true", help="loop the BTC price path")
+    args = parser.parse_args()
+
+    standin = BybitStandin(args.host, args.port, args.api_key, args.api_secret, latency=args.latency,
+                           jitter=args.jitter, error_rate=args.error_rate, rate_limit=args.rate_limit,
+                           ws=args.ws_port is not None, ws_port=args.ws_port or 0)
+    if args.btc_path:
+        standin.set_path("BTCUSDT", json.loads(args.btc_path), repeat=args.repeat, relative=False)
+
+    standin.start()
+    print(f"[STANDIN] Bybit v5 stand-in on {standin.url} (key={standin.api_key}, secret={standin.api_secret})")
+    if standin.stream:
+        print(f"[STANDIN] Public WebSocket on {standin.ws_url}")
+    try:
+        standin._thread.join()
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import asyncio
+import collections
+import time
+from typing import Dict, Optional, Tuple
+
+
+class ClockSync:
+    """Background estimator of the offset between the local and Bybit clocks.
+
+    Each round takes a few ``/v5/market/time`` samples and keeps the one with
+    the shortest round trip, taking the server time to be at the midpoint of
+    that round trip. The estimate is written to ``bybit_client.time_offset``,
+    which signed requests read without ever waiting on a sync. A failed
+    round keeps the last good estimate and retries sooner.
+    """
+
+    TASK_NAME = "clock-sync"
+
+    def __init__(self, bybit_client, engine, interval: float = 300.0, retry_interval: float = 30.0,
+                 samples: int = 5, sample_spacing: float = 0.2, history_size: int = 20):
+        self.bybit_client = bybit_client
+        self.engine = engine
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.samples = samples
+        self.sample_spacing = sample_spacing
+
+        self.offset_ms: Optional[float] = None
+        self.uncertainty_ms: Optional[float] = None
+        self.last_sync: Optional[float] = None
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        # (local time, offset ms) of recent good estimates, for drift
+        self._history = collections.deque(maxlen=history_size)
+
+        self._wake: Optional[asyncio.Event] = None
+
+    def start(self):
+        self.engine.ensure(self.TASK_NAME, self._run)
+
+    def stop(self):
+        self.engine.cancel(self.TASK_NAME)
+
+    def resync(self):
+        """Run a sync round now, e.g. after switching environment. Safe from any thread."""
+        self._history.clear()
+        loop = self.engine.loop
+        if self._wake is not None and loop is not None:
+            loop.call_soon_threadsafe(self._wake.set)
+
+    @property
+    def drift_ms_per_hour(self) -> Optional[float]:
+        if len(self._history) < 2:
+            return None
+        (first_at, first_offset), (last_at, last_offset) = self._history[0], self._history[-1]
+        if last_at - first_at < 1.0:
+            return None
+        return (last_offset - first_offset) / (last_at - first_at) * 3600
+
+    def status(self) -> Dict:
+        return {
+            "offset_ms": self.offset_ms,
+            "uncertainty_ms": self.uncertainty_ms,
+            "drift_ms_per_hour": self.drift_ms_per_hour,
+            "last_sync_age": time.time() - self.last_sync if self.last_sync else None,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
+
+    async def _sample(self) -> Tuple[float, float]:
+        """One (offset ms, round trip ms) measurement."""
+        started = time.time()
+        data = await self.bybit_client.get_public("/v5/market/time", timeout=10.0)
+        finished = time.time()
+
+        if data.get("retCode") != 0:
+            raise RuntimeError(data.get("retMsg", "time request failed"))
+
+        result = data.get("result", {})
+        if result.get("timeNano"):
+            server_ms = int(result["timeNano"]) / 1_000_000
+        elif data.get("time"):
+            server_ms = float(data["time"])
+        else:
+            server_ms = int(result["timeSecond"]) * 1000
+
+        midpoint_ms = (started + finished) / 2 * 1000
+        return server_ms - midpoint_ms, (finished - started) * 1000
+
+    async def sync_once(self) -> bool:
+        measurements = []
+        for i in range(self.samples):
+            if i:
+                await asyncio.sleep(self.sample_spacing)
+            try:
+                measurements.append(await self._sample())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+
+        if not measurements:
+            self.failures += 1
+            print(f"Failed to sync time: {self.last_error}; keeping offset {self.offset_ms}ms")
+            return False
+
+        # The fastest round trip bounds the error best
+        offset_ms, rtt_ms = min(measurements, key=lambda m: m[1])
+        self.offset_ms = offset_ms
+        self.uncertainty_ms = rtt_ms / 2
+        self.last_sync = time.time()
+        self.last_error = None
+        self._history.append((self.last_sync, offset_ms))
+        self.bybit_client.time_offset = int(round(offset_ms))
+
+        print(f"Time synced with Bybit. Offset: {offset_ms:.1f}ms (+/- {self.uncertainty_ms:.1f}ms)")
+        return True
+
+    async def _run(self):
+        self._wake = asyncio.Event()
+        while True:
+            # Cleared first, so a resync() asked for during this round runs another one
+            self._wake.clear()
+            ok = await self.sync_once()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval if ok else self.retry_interval)
+            except asyncio.TimeoutError:
+                pass
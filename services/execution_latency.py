@@ -0,0 +1,275 @@
+import collections
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# (name, from timestamp, to timestamp), in the order an execution passes through them
+STAGES = (
+    ("detect", "observed_at", "detected_at"),   # price seen -> crossing found
+    ("round", "detected_at", "rounded_at"),     # -> quantity rounded
+    ("queue", "rounded_at", "dispatched_at"),   # -> batch window closed
+    ("send", "dispatched_at", "signed_at"),     # -> rate limiter passed and request signed
+    ("ack", "signed_at", "acked_at"),           # -> exchange answered
+    ("fill", "acked_at", "filled_at"),          # -> last execution pushed on the private stream
+    ("trigger_to_ack", "observed_at", "acked_at"),
+    ("trigger_to_fill", "observed_at", "filled_at"),
+)
+
+
+class ExecutionTrace:
+    """Timestamps (``time.time()`` seconds) of one rule execution, from the
+    price that triggered it to the exchange acknowledging and filling it."""
+
+    def __init__(self, symbol: str, category: str, reason: str, trigger_price: Optional[float],
+                 btc_price: Optional[float], observed_at: Optional[float], detected_at: Optional[float]):
+        self.symbol = symbol
+        self.category = category
+        self.reason = reason
+        self.trigger_price = trigger_price
+        self.btc_price = btc_price
+        self.side: Optional[str] = None
+
+        self.observed_at = observed_at
+        self.detected_at = detected_at
+        self.rounded_at: Optional[float] = None
+        self.dispatched_at: Optional[float] = None
+        self.signed_at: Optional[float] = None
+        self.acked_at: Optional[float] = None
+        self.filled_at: Optional[float] = None
+
+        # Bybit's own clock: response time and order creation / last execution time (ms)
+        self.exchange_time_ms: Optional[int] = None
+        self.created_time_ms: Optional[int] = None
+        self.exec_time_ms: Optional[int] = None
+        # Local minus Bybit clock offset at send time, to line the two clocks up
+        self.time_offset_ms = 0
+
+        self.order_id: Optional[str] = None
+        self.ret_code: Optional[int] = None
+        self.batch_size = 1
+        self.attempts = 0
+
+        self.filled_qty = 0.0
+        self._fill_value = 0.0
+
+    @property
+    def fill_price(self) -> Optional[float]:
+        return self._fill_value / self.filled_qty if self.filled_qty else None
+
+    @property
+    def slippage_bps(self) -> Optional[float]:
+        """Average fill price against the coin price at trigger time; positive is worse."""
+        fill_price = self.fill_price
+        if fill_price is None or not self.trigger_price:
+            return None
+        move = (fill_price - self.trigger_price) / self.trigger_price * 10000
+        # Selling below the trigger price, or buying above it, costs
+        return -move if self.side == "Sell" else move
+
+    def mark_sent(self, timings: Dict, time_offset_ms: int):
+        self.dispatched_at = timings.get("dispatched_at")
+        self.signed_at = timings.get("signed_at")
+        self.acked_at = timings.get("acked_at")
+        self.attempts = timings.get("attempts", 0)
+        self.time_offset_ms = time_offset_ms
+
+    def mark_ack(self, result: Dict):
+        self.ret_code = result.get("retCode")
+        if result.get("time"):
+            self.exchange_time_ms = int(result["time"])
+        order = result.get("result") or {}
+        self.order_id = order.get("orderId") or None
+        if order.get("createAt"):
+            self.created_time_ms = int(order["createAt"])
+
+    def add_execution(self, execution: Dict) -> bool:
+        """Fold in one execution; True once the order has nothing left to fill."""
+        qty = float(execution.get("execQty") or 0)
+        self.filled_qty += qty
+        self._fill_value += qty * float(execution.get("execPrice") or 0)
+        if execution.get("execTime"):
+            self.exec_time_ms = int(execution["execTime"])
+        self.filled_at = time.time()
+        return execution.get("leavesQty") in (None, "", "0")
+
+    def durations_ms(self) -> Dict[str, float]:
+        durations = {}
+        for name, start, end in STAGES:
+            started, finished = getattr(self, start), getattr(self, end)
+            if started is not None and finished is not None:
+                durations[name] = (finished - started) * 1000
+        if self.signed_at is not None and self.exchange_time_ms is not None:
+            # Request signed locally -> answered on Bybit's clock (half a round trip plus matching)
+            durations["exchange"] = self.exchange_time_ms - (self.signed_at * 1000 + self.time_offset_ms)
+        return durations
+
+    def to_dict(self) -> Dict:
+        return {
+            "symbol": self.symbol,
+            "category": self.category,
+            "reason": self.reason,
+            "side": self.side,
+            "order_id": self.order_id,
+            "ret_code": self.ret_code,
+            "batch_size": self.batch_size,
+            "attempts": self.attempts,
+            "btc_price": self.btc_price,
+            "trigger_price": self.trigger_price,
+            "fill_price": self.fill_price,
+            "filled_qty": self.filled_qty,
+            "slippage_bps": self.slippage_bps,
+            "timestamps": {
+                "observed_at": self.observed_at,
+                "detected_at": self.detected_at,
+                "rounded_at": self.rounded_at,
+                "dispatched_at": self.dispatched_at,
+                "signed_at": self.signed_at,
+                "acked_at": self.acked_at,
+                "filled_at": self.filled_at,
+                "exchange_time_ms": self.exchange_time_ms,
+                "created_time_ms": self.created_time_ms,
+                "exec_time_ms": self.exec_time_ms,
+                "time_offset_ms": self.time_offset_ms
+            },
+            "durations_ms": {name: round(value, 3) for name, value in self.durations_ms().items()}
+        }
+
+
+class ExecutionLatency:
+    """Rolling record of rule executions and their per-stage latency.
+
+    Each stage keeps its last ``window`` samples, summarized as percentiles
+    and bucket counts on demand. Fills are matched by order id from the
+    private stream's execution topic; an order not filled within
+    ``fill_timeout`` seconds stops being waited for.
+    """
+
+    def __init__(self, window: int = 1000, recent_size: int = 100, fill_timeout: float = 60.0):
+        self.window = window
+        self.fill_timeout = fill_timeout
+
+        self._samples: Dict[str, collections.deque] = {}
+        self._slippage = collections.deque(maxlen=window)
+        self._recent = collections.deque(maxlen=recent_size)
+        self._awaiting_fill: "collections.OrderedDict[str, ExecutionTrace]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.failures = 0
+
+    def start(self, symbol: str, category: str, reason: str, trigger_price: Optional[float] = None,
+              btc_price: Optional[float] = None, observed_at: Optional[float] = None,
+              detected_at: Optional[float] = None) -> ExecutionTrace:
+        detected_at = detected_at or time.time()
+        return ExecutionTrace(symbol, category, reason, trigger_price, btc_price,
+                              observed_at or detected_at, detected_at)
+
+    def finish(self, trace: ExecutionTrace):
+        """Record an acknowledged (or rejected) request and start waiting for its fill."""
+        with self._lock:
+            self.executions += 1
+            if trace.ret_code != 0:
+                self.failures += 1
+            self._add_samples(trace, exclude=("fill", "trigger_to_fill"))
+            self._recent.append(trace)
+
+            if trace.ret_code == 0 and trace.order_id and trace.side:
+                self._awaiting_fill[trace.order_id] = trace
+                self._expire_fills()
+
+    def on_execution(self, execution: Dict):
+        """Private stream ``execution`` listener."""
+        order_id = execution.get("orderId")
+        with self._lock:
+            trace = self._awaiting_fill.get(order_id)
+            if trace is None or not trace.add_execution(execution):
+                return
+            del self._awaiting_fill[order_id]
+            self._add_samples(trace, include=("fill", "trigger_to_fill"))
+            if trace.slippage_bps is not None:
+                self._slippage.append(trace.slippage_bps)
+
+    def _expire_fills(self):
+        cutoff = time.time() - self.fill_timeout
+        while self._awaiting_fill:
+            order_id, trace = next(iter(self._awaiting_fill.items()))
+            if trace.acked_at is not None and trace.acked_at >= cutoff:
+                break
+            del self._awaiting_fill[order_id]
+
+    def _add_samples(self, trace: ExecutionTrace, include=None, exclude=()):
+        for name, value in trace.durations_ms().items():
+            if name in exclude or (include is not None and name not in include):
+                continue
+            if name not in self._samples:
+                self._samples[name] = collections.deque(maxlen=self.window)
+            self._samples[name].append(value)
+
+    @staticmethod
+    def _summarize(values: List[float]) -> Dict:
+        ordered = sorted(values)
+        if not ordered:
+            return {"count": 0}
+
+        def pick(q):
+            return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 3)
+
+        return {
+            "count": len(ordered),
+            "min": round(ordered[0], 3),
+            "p50": pick(0.50),
+            "p90": pick(0.90),
+            "p99": pick(0.99),
+            "max": round(ordered[-1], 3),
+            "mean": round(sum(ordered) / len(ordered), 3)
+        }
+
+    @staticmethod
+    def _histogram(values: List[float]) -> List[int]:
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for value in values:
+            for i, bound in enumerate(BUCKETS_MS):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return counts
+
+    def summary(self) -> Dict:
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            slippage = list(self._slippage)
+            awaiting = len(self._awaiting_fill)
+
+        order = [name for name, _, _ in STAGES] + ["exchange"]
+        stages = {}
+        for name in sorted(samples, key=lambda n: order.index(n) if n in order else len(order)):
+            stages[name] = dict(self._summarize(samples[name]), histogram=self._histogram(samples[name]))
+
+        return {
+            "executions": self.executions,
+            "failures": self.failures,
+            "awaiting_fill": awaiting,
+            "window": self.window,
+            "buckets_ms": list(BUCKETS_MS),
+            "stages_ms": stages,
+            "slippage_bps": self._summarize(slippage)
+        }
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        with self._lock:
+            traces = list(self._recent)[-limit:] if limit > 0 else []
+        return [trace.to_dict() for trace in reversed(traces)]
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._slippage.clear()
+            self._recent.clear()
+            self._awaiting_fill.clear()
+            self.executions = 0
+            self.failures = 0
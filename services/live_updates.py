@@ -0,0 +1,189 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from services.position_versions import fingerprint
+
+
+class LiveUpdates:
+    """Fan-out of position, monitor and BTC price updates to streaming clients.
+
+    One publisher task on the engine loop builds each subscribed category's
+    positions once per cycle and pushes only what changed to every
+    subscriber queue, so server work does not grow with open browser tabs.
+    Subscribers are plain thread-safe queues read by WSGI threads.
+    """
+
+    TASK_NAME = "live-updates"
+
+    def __init__(self, engine, fetch_positions: Callable[[str], Awaitable[Dict]],
+                 get_monitors: Callable[[], Dict], get_btc_price: Callable[[], Awaitable[Optional[float]]],
+                 interval: float = 2.0, min_interval: float = 0.25, queue_size: int = 100):
+        self.engine = engine
+        self.fetch_positions = fetch_positions
+        self.get_monitors = get_monitors
+        self.get_btc_price = get_btc_price
+        self.interval = interval
+        self.min_interval = min_interval
+        self.queue_size = queue_size
+
+        self._subscribers: Dict[str, Set[queue.Queue]] = {}
+        self._lock = threading.Lock()
+
+        # Last published state per category: symbol -> (fingerprint, position)
+        self._positions: Dict[str, Dict[str, Tuple[str, Dict]]] = {}
+        self._monitors_fingerprint: Optional[str] = None
+        self._monitors_event: Optional[Dict] = None
+        self._btc_price: Optional[float] = None
+        self._last_btc_publish = 0.0
+
+        self._wake: Optional[asyncio.Event] = None
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def subscribe(self, category: str) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(category, set()).add(subscriber)
+            # New subscribers start from the last full state instead of waiting a cycle
+            known = self._positions.get(category)
+            if known is not None:
+                subscriber.put_nowait(("positions", self._full_event(category, known)))
+            if self._monitors_event is not None:
+                subscriber.put_nowait(("monitors", self._monitors_event))
+            if self._btc_price is not None:
+                subscriber.put_nowait(("btc", {"price": self._btc_price}))
+
+        self.engine.ensure(self.TASK_NAME, self._run)
+        self.notify()
+        return subscriber
+
+    def unsubscribe(self, category: str, subscriber: queue.Queue):
+        with self._lock:
+            subs = self._subscribers.get(category)
+            if subs is not None:
+                subs.discard(subscriber)
+                if not subs:
+                    del self._subscribers[category]
+                    self._positions.pop(category, None)
+
+    def notify(self):
+        """Ask the publisher to refresh now instead of at the end of its interval."""
+        loop = self.engine.loop
+        if self._wake is not None and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake.set)
+
+    def on_price(self, category: str, symbol: str, price: float):
+        """Market feed listener; BTC prints are pushed straight through, rate limited."""
+        if symbol != "BTCUSDT" or category != "linear":
+            return
+        now = time.monotonic()
+        if now - self._last_btc_publish >= self.min_interval:
+            self._publish_btc(price)
+
+    def _publish_btc(self, price: float):
+        if price == self._btc_price:
+            return
+        self._btc_price = price
+        self._last_btc_publish = time.monotonic()
+        self._broadcast(None, "btc", {"price": price})
+
+    def _broadcast(self, category: Optional[str], event: str, data: Dict):
+        with self._lock:
+            if category is None:
+                targets = [sub for subs in self._subscribers.values() for sub in subs]
+            else:
+                targets = list(self._subscribers.get(category, ()))
+
+        for subscriber in targets:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                # A stalled client gets a full resync instead of an ever-growing backlog
+                self._resync(subscriber)
+
+    def _resync(self, subscriber: queue.Queue):
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                break
+        subscriber.put_nowait(("resync", {}))
+
+    def _full_event(self, category: str, known: Dict[str, Tuple[str, Dict]]) -> Dict:
+        return {"full": True, "category": category, "positions": [pos for _, pos in known.values()]}
+
+    async def _refresh_category(self, category: str):
+        payload = await self.fetch_positions(category)
+        if "error" in payload:
+            # Not "error": EventSource hands that name to onerror as if the connection had failed
+            self._broadcast(category, "positions_error", {"error": payload["error"]})
+            return
+
+        current: Dict[str, Tuple[str, Dict]] = {}
+        for pos in payload.get("positions", []):
+            # Serialize now; the monitor dicts inside are mutated by the engine
+            pos = json.loads(json.dumps(pos, default=str))
+            current[pos["symbol"]] = (fingerprint(pos), pos)
+
+        previous = self._positions.get(category)
+        self._positions[category] = current
+
+        if previous is None:
+            self._broadcast(category, "positions", self._full_event(category, current))
+            return
+
+        changed = [pos for symbol, (fp, pos) in current.items()
+                   if symbol not in previous or previous[symbol][0] != fp]
+        removed = [symbol for symbol in previous if symbol not in current]
+        if changed or removed:
+            self._broadcast(category, "positions", {
+                "full": False, "category": category, "changed": changed, "removed": removed
+            })
+
+    def _refresh_monitors(self):
+        monitors = json.loads(json.dumps(self.get_monitors(), default=str))
+        monitors_fingerprint = json.dumps(monitors, sort_keys=True)
+        if monitors_fingerprint != self._monitors_fingerprint:
+            self._monitors_fingerprint = monitors_fingerprint
+            self._monitors_event = {"monitors": monitors, "count": len(monitors)}
+            self._broadcast(None, "monitors", self._monitors_event)
+
+    async def _run(self):
+        self._wake = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        while True:
+            with self._lock:
+                categories = list(self._subscribers.keys())
+
+            if categories:
+                started = loop.time()
+                results = await asyncio.gather(
+                    *[self._refresh_category(category) for category in categories],
+                    return_exceptions=True
+                )
+                for category, result in zip(categories, results):
+                    if isinstance(result, Exception):
+                        print(f"[LIVE UPDATES] Error refreshing {category}: {result}")
+
+                try:
+                    self._refresh_monitors()
+                    price = await self.get_btc_price()
+                    if price:
+                        self._publish_btc(price)
+                except Exception as e:
+                    print(f"[LIVE UPDATES] Error refreshing state: {e}")
+
+                await asyncio.sleep(max(self.min_interval - (loop.time() - started), 0))
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
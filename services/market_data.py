@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class MarketDataCache:
+
+    def __init__(self, bybit_client, max_age: float = 1.0, bulk_threshold: int = 4):
+        self.bybit_client = bybit_client
+        # Seconds a ticker is served from cache before it is fetched again
+        self.max_age = max_age
+        # Below this many symbols, per-symbol requests are cheaper than a full snapshot
+        self.bulk_threshold = bulk_threshold
+
+        self._tickers: Dict[Tuple[str, str], Tuple[float, Dict]] = {}
+        self._snapshots: Dict[str, float] = {}
+        # Tickers kept current by a live WebSocket feed never expire
+        self._streaming: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        # Bumped by clear(); fetches started before it are not cached or returned
+        self._generation = 0
+
+        # In-flight requests, keyed per event loop since futures cannot be
+        # awaited from another loop
+        self._inflight: Dict[Tuple[asyncio.AbstractEventLoop, str, str], asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def _get_cached(self, symbol: str, category: str, max_age: float) -> Optional[Dict]:
+        with self._lock:
+            entry = self._tickers.get((category, symbol))
+            streaming = (category, symbol) in self._streaming
+        if entry and (streaming or time.monotonic() - entry[0] <= max_age):
+            return entry[1]
+        return None
+
+    def _store(self, symbol: str, category: str, ticker: Dict, fetched_at: Optional[float] = None,
+               generation: Optional[int] = None) -> bool:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                # Answered by the servers in use before clear(), e.g. another environment
+                return False
+            self._tickers[(category, symbol)] = (fetched_at or time.monotonic(), ticker)
+            return True
+
+    def put_ticker(self, symbol: str, category: str, ticker: Dict):
+        self._store(symbol, category, ticker)
+
+    def observed_at(self, symbol: str, category: str = "linear") -> Optional[float]:
+        """Wall-clock time the cached ticker for ``symbol`` was received, if any."""
+        with self._lock:
+            entry = self._tickers.get((category, symbol))
+        if entry is None:
+            return None
+        return time.time() - (time.monotonic() - entry[0])
+
+    def set_streaming(self, category: str, symbols: Iterable[str], live: bool):
+        with self._lock:
+            keys = {(category, symbol) for symbol in symbols}
+            if live:
+                self._streaming |= keys
+            else:
+                self._streaming -= keys
+
+    def is_streaming(self, symbol: str, category: str = "linear") -> bool:
+        with self._lock:
+            return (category, symbol) in self._streaming
+
+    async def _fetch_ticker(self, symbol: str, category: str) -> Optional[Dict]:
+        generation = self._generation
+        response = await self.bybit_client.get_public(
+            "/v5/market/tickers",
+            params={"category": category, "symbol": symbol}
+        )
+
+        if response.get("retCode") == 0:
+            result = response.get("result", {}).get("list", [])
+            if result and self._store(symbol, category, result[0], generation=generation):
+                return result[0]
+
+        return None
+
+    async def _single_flight(self, key: Tuple[str, str], fetch):
+        loop_key = (asyncio.get_running_loop(),) + key
+        inflight = self._inflight.get(loop_key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.ensure_future(fetch())
+        self._inflight[loop_key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._inflight.pop(loop_key, None)
+            else:
+                future.add_done_callback(lambda _: self._inflight.pop(loop_key, None))
+
+    async def get_ticker(self, symbol: str, category: str = "linear", max_age: Optional[float] = None) -> Optional[Dict]:
+        ticker = self._get_cached(symbol, category, self.max_age if max_age is None else max_age)
+        if ticker is not None:
+            self.hits += 1
+            return ticker
+
+        return await self._single_flight((category, symbol), lambda: self._fetch_ticker(symbol, category))
+
+    async def _fetch_snapshot(self, category: str) -> Dict[str, Dict]:
+        generation = self._generation
+        response = await self.bybit_client.get_public(
+            "/v5/market/tickers",
+            params={"category": category}
+        )
+
+        if response.get("retCode") != 0:
+            return {}
+
+        fetched_at = time.monotonic()
+        snapshot = {
+            item["symbol"]: item
+            for item in response.get("result", {}).get("list", [])
+            if item.get("symbol")
+        }
+        with self._lock:
+            if generation != self._generation:
+                return {}
+            for symbol, ticker in snapshot.items():
+                self._tickers[(category, symbol)] = (fetched_at, ticker)
+            self._snapshots[category] = fetched_at
+        return snapshot
+
+    async def get_snapshot(self, category: str = "linear", max_age: Optional[float] = None) -> Dict[str, Dict]:
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            fetched_at = self._snapshots.get(category)
+            if fetched_at is not None and time.monotonic() - fetched_at <= max_age:
+                self.hits += 1
+                return {
+                    symbol: entry[1]
+                    for (cat, symbol), entry in self._tickers.items()
+                    if cat == category
+                }
+
+        # Symbol "*" marks the whole-category request in the in-flight table
+        return await self._single_flight((category, "*"), lambda: self._fetch_snapshot(category))
+
+    async def get_prices(self, symbols: List[str], category: str = "linear") -> Dict[str, float]:
+        prices = {}
+        uncached = []
+        for symbol in symbols:
+            ticker = self._get_cached(symbol, category, self.max_age)
+            if ticker:
+                self.hits += 1
+                prices[symbol] = float(ticker.get("lastPrice", 0))
+            else:
+                uncached.append(symbol)
+
+        snapshot = {}
+        if len(uncached) >= self.bulk_threshold:
+            try:
+                snapshot = await self.get_snapshot(category)
+            except Exception as e:
+                print(f"Error fetching {category} ticker snapshot: {e}")
+
+        missing = []
+        for symbol in uncached:
+            ticker = snapshot.get(symbol)
+            if ticker:
+                prices[symbol] = float(ticker.get("lastPrice", 0))
+            else:
+                missing.append(symbol)
+
+        if missing:
+            results = await asyncio.gather(
+                *[self.get_price(symbol, category) for symbol in missing],
+                return_exceptions=True
+            )
+            for symbol, price in zip(missing, results):
+                if price and not isinstance(price, Exception):
+                    prices[symbol] = price
+
+        return prices
+
+    async def get_price(self, symbol: str, category: str = "linear", max_age: Optional[float] = None) -> Optional[float]:
+        ticker = await self.get_ticker(symbol, category, max_age)
+        if ticker:
+            return float(ticker.get("lastPrice", 0))
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._tickers.clear()
+            self._snapshots.clear()
+            self._streaming.clear()
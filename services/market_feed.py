@@ -0,0 +1,231 @@
+import asyncio
+import concurrent.futures
+import json
+import threading
+from typing import Callable, Dict, Iterable, List, Set
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+
+class PublicMarketFeed:
+    """Bybit v5 public WebSocket feed that keeps MarketDataCache tickers current.
+
+    While a category's socket is connected its subscribed symbols are marked as
+    streaming in the cache and served from memory; when it drops they are
+    unmarked and readers fall back to the REST path automatically. A socket
+    that delivers nothing (not even a pong) for ``stale_timeout`` seconds is
+    treated as dropped, so a half-open connection cannot freeze prices.
+    """
+
+    TASK_PREFIX = "market-feed:"
+    # Bybit accepts at most 10 topics per subscribe request on spot
+    SUBSCRIBE_BATCH = 10
+
+    def __init__(self, bybit_client, market_data, engine, ping_interval: float = 20.0,
+                 max_backoff: float = 30.0, stale_timeout: float = 30.0):
+        self.bybit_client = bybit_client
+        self.market_data = market_data
+        self.engine = engine
+        self.ping_interval = ping_interval
+        self.max_backoff = max_backoff
+        # Must exceed ping_interval, since a quiet but healthy socket still answers pings
+        self.stale_timeout = max(stale_timeout, ping_interval * 1.5)
+
+        self._symbols: Dict[str, Set[str]] = {"linear": {"BTCUSDT"}, "spot": set()}
+        self._subscribed: Dict[str, Set[str]] = {"linear": set(), "spot": set()}
+        self._tickers: Dict[str, Dict[str, Dict]] = {"linear": {}, "spot": {}}
+        self._sockets: Dict[str, object] = {}
+        self._listeners: List[Callable[[str, str, float], None]] = []
+        self._lock = threading.Lock()
+        self._started = False
+
+        self.reconnects = 0
+        self.messages = 0
+
+    @property
+    def available(self) -> bool:
+        return websockets is not None and self.bybit_client.ws_public_url is not None
+
+    def start(self):
+        if not self.available:
+            reason = "'websockets' is not installed" if websockets is None else "no WebSocket endpoint configured"
+            print(f"[MARKET FEED] {reason}, using REST polling only")
+            return
+
+        self._started = True
+        for category, symbols in self._symbols.items():
+            if symbols:
+                self._ensure_connection(category)
+
+    def stop(self) -> "concurrent.futures.Future":
+        """Cancel the sockets; once the returned future is done no more tickers are stored."""
+        self._started = False
+        return self.engine.cancel_prefix(self.TASK_PREFIX)
+
+    def is_live(self, category: str = "linear") -> bool:
+        return category in self._sockets
+
+    def add_listener(self, listener: Callable[[str, str, float], None]):
+        """Register ``listener(category, symbol, price)``, called on the engine loop for every price update."""
+        self._listeners.append(listener)
+
+    def _ensure_connection(self, category: str):
+        if self._started:
+            self.engine.ensure(f"{self.TASK_PREFIX}{category}", lambda: self._run(category))
+
+    def subscribe(self, category: str, symbols: Iterable[str]):
+        if category not in self._symbols:
+            return
+        with self._lock:
+            self._symbols[category].update(symbols)
+        self._ensure_connection(category)
+        if self.is_live(category):
+            self.engine.submit(self._sync_subscriptions(category))
+
+    def unsubscribe(self, category: str, symbols: Iterable[str]):
+        if category not in self._symbols:
+            return
+        with self._lock:
+            symbols = set(symbols)
+            if category == "linear":
+                symbols.discard("BTCUSDT")
+            self._symbols[category] -= symbols
+        if self.is_live(category):
+            self.engine.submit(self._sync_subscriptions(category))
+
+    def unsubscribe_symbol(self, symbol: str):
+        for category in self._symbols:
+            self.unsubscribe(category, [symbol])
+
+    def _ws_url(self, category: str) -> str:
+        return f"{self.bybit_client.ws_public_url}/v5/public/{category}"
+
+    @staticmethod
+    def _topics(category: str, symbols: Iterable[str]) -> List[str]:
+        topics = []
+        for symbol in sorted(symbols):
+            topics.append(f"tickers.{symbol}")
+            # Trades carry every print, so BTC wicks between ticker pushes are seen
+            if category == "linear" and symbol == "BTCUSDT":
+                topics.append(f"publicTrade.{symbol}")
+        return topics
+
+    async def _send_topics(self, ws, op: str, topics: List[str]):
+        for i in range(0, len(topics), self.SUBSCRIBE_BATCH):
+            await ws.send(json.dumps({"op": op, "args": topics[i:i + self.SUBSCRIBE_BATCH]}))
+
+    async def _sync_subscriptions(self, category: str):
+        ws = self._sockets.get(category)
+        if ws is None:
+            return
+
+        with self._lock:
+            wanted = set(self._symbols[category])
+        added = wanted - self._subscribed[category]
+        removed = self._subscribed[category] - wanted
+        self._subscribed[category] = wanted
+
+        if removed:
+            self.market_data.set_streaming(category, removed, False)
+            await self._send_topics(ws, "unsubscribe", self._topics(category, removed))
+        if added:
+            await self._send_topics(ws, "subscribe", self._topics(category, added))
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send(json.dumps({"op": "ping"}))
+
+    async def _run(self, category: str):
+        backoff = 1.0
+
+        while True:
+            ping_task = None
+            try:
+                async with websockets.connect(self._ws_url(category), ping_interval=None, open_timeout=10) as ws:
+                    print(f"[MARKET FEED] Connected to {category} stream")
+                    self._sockets[category] = ws
+                    self._subscribed[category] = set()
+                    await self._sync_subscriptions(category)
+                    backoff = 1.0
+
+                    ping_task = asyncio.ensure_future(self._ping(ws))
+                    while True:
+                        try:
+                            raw = await asyncio.wait_for(ws.recv(), self.stale_timeout)
+                        except asyncio.TimeoutError:
+                            # Back to REST now; closing a dead socket can take a while
+                            self._mark_down(category)
+                            raise RuntimeError(f"no data for {self.stale_timeout:.0f}s")
+                        self._handle_message(category, raw)
+
+            except asyncio.CancelledError:
+                raise
+            except websockets.ConnectionClosed:
+                print(f"[MARKET FEED] {category} stream closed")
+            except Exception as e:
+                print(f"[MARKET FEED] {category} stream error: {e}")
+            finally:
+                if ping_task is not None:
+                    ping_task.cancel()
+                self._mark_down(category)
+
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _mark_down(self, category: str):
+        self._sockets.pop(category, None)
+        self.market_data.set_streaming(category, self._subscribed[category], False)
+        self._subscribed[category] = set()
+        self._tickers[category] = {}
+
+    def _handle_message(self, category: str, raw):
+        message = json.loads(raw)
+        topic = message.get("topic")
+
+        if not topic:
+            if message.get("op") == "subscribe" and not message.get("success", True):
+                print(f"[MARKET FEED] Subscribe failed on {category}: {message.get('ret_msg')}")
+            return
+
+        self.messages += 1
+        if topic.startswith("tickers."):
+            data = message.get("data", {})
+            symbol = data.get("symbol") or topic.split(".", 1)[1]
+
+            # Linear streams send a snapshot and then deltas with only changed fields
+            if message.get("type") == "delta":
+                ticker = dict(self._tickers[category].get(symbol, {}))
+                ticker.update(data)
+            else:
+                ticker = dict(data)
+            self._tickers[category][symbol] = ticker
+
+            if ticker.get("lastPrice"):
+                self._publish(category, symbol, ticker)
+
+        elif topic.startswith("publicTrade."):
+            trades = message.get("data", [])
+            if not trades:
+                return
+            symbol = trades[-1].get("s") or topic.split(".", 1)[1]
+            ticker = dict(self._tickers[category].get(symbol, {"symbol": symbol}))
+            ticker["lastPrice"] = trades[-1].get("p")
+            self._tickers[category][symbol] = ticker
+            self._publish(category, symbol, ticker)
+
+    def _publish(self, category: str, symbol: str, ticker: Dict):
+        self.market_data.put_ticker(symbol, category, ticker)
+        if symbol in self._subscribed[category]:
+            self.market_data.set_streaming(category, [symbol], True)
+
+        price = float(ticker["lastPrice"])
+        for listener in self._listeners:
+            try:
+                listener(category, symbol, price)
+            except Exception as e:
+                print(f"[MARKET FEED] Listener error: {e}")
@@ -0,0 +1,147 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+class MonitorEngine:
+
+    def __init__(self, name: str = "monitor-engine"):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def thread_ident(self) -> Optional[int]:
+        return self._thread.ident if self._thread is not None else None
+
+    def start(self):
+        if self.is_running:
+            return
+
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run_loop():
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(ready.set)
+            self.loop.run_forever()
+
+            # Let cancelled tasks unwind before the loop is closed
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.close()
+
+        self._thread = threading.Thread(target=run_loop, name=self.name, daemon=True)
+        self._thread.start()
+        ready.wait()
+        print(f"[ENGINE] {self.name} started")
+
+    def stop(self, timeout: float = 5.0):
+        if not self.is_running:
+            return
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._tasks.clear()
+        self._thread = None
+        print(f"[ENGINE] {self.name} stopped")
+
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _call(self, fn, *args) -> concurrent.futures.Future:
+        """Run a plain function on the engine loop and return its result as a future."""
+        result = concurrent.futures.Future()
+
+        def invoke():
+            try:
+                result.set_result(fn(*args))
+            except Exception as e:
+                result.set_exception(e)
+
+        if self._in_loop():
+            invoke()
+        else:
+            self.start()
+            self.loop.call_soon_threadsafe(invoke)
+        return result
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None):
+        """Block the calling thread until ``coro`` finishes on the engine loop."""
+        if self._in_loop():
+            raise RuntimeError("MonitorEngine.run() cannot be called from the engine loop")
+        return self.submit(coro).result(timeout)
+
+    def _schedule(self, name: str, factory: Callable[[], Awaitable]) -> asyncio.Task:
+        self._cancel(name)
+        # Long-lived tasks must not inherit the starting caller's context, e.g. a
+        # request's UI priority would otherwise stick to every request they make
+        task = contextvars.Context().run(self.loop.create_task, factory(), name=name)
+        self._tasks[name] = task
+
+        def forget(done: asyncio.Task):
+            if self._tasks.get(name) is done:
+                del self._tasks[name]
+
+        task.add_done_callback(forget)
+        return task
+
+    def _cancel(self, name: str) -> bool:
+        task = self._tasks.pop(name, None)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def schedule(self, name: str, factory: Callable[[], Awaitable]) -> concurrent.futures.Future:
+        """Start ``factory()`` as the task called ``name``, replacing any task already using it."""
+        return self._call(self._schedule, name, factory)
+
+    def ensure(self, name: str, factory: Callable[[], Awaitable]) -> concurrent.futures.Future:
+        """Start ``factory()`` as ``name`` only if no task by that name is running."""
+        def ensure_task():
+            task = self._tasks.get(name)
+            if task is not None and not task.done():
+                return task
+            return self._schedule(name, factory)
+
+        return self._call(ensure_task)
+
+    def cancel(self, name: str) -> concurrent.futures.Future:
+        return self._call(self._cancel, name)
+
+    def cancel_prefix(self, prefix: str) -> concurrent.futures.Future:
+        def cancel_all():
+            names = [name for name in self._tasks if name.startswith(prefix)]
+            for name in names:
+                self._cancel(name)
+            return len(names)
+
+        return self._call(cancel_all)
+
+    def has_task(self, name: str) -> bool:
+        task = self._tasks.get(name)
+        return task is not None and not task.done()
+
+    def task_names(self) -> List[str]:
+        return [name for name, task in list(self._tasks.items()) if not task.done()]
+
+    def task_count(self) -> int:
+        return len(self.task_names())
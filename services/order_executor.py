@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class OrderExecutor:
+    """Coalesces orders placed close together into /v5/order/create-batch calls.
+
+    Orders submitted within ``batch_window`` of each other (e.g. every monitor
+    reacting to the same BTC tick) are grouped by category and sent in
+    batches of at most ``BATCH_LIMITS[category]``. Each caller gets back the
+    same shape as a single ``/v5/order/create`` response for its own order,
+    so existing ``retCode`` handling keeps working. A lone order goes to
+    ``/v5/order/create`` directly.
+
+    An ``ExecutionTrace`` passed with an order gets the dispatch, signing and
+    acknowledgement times of the request that carried it.
+    """
+
+    BATCH_LIMITS = {"linear": 20, "spot": 10}
+
+    def __init__(self, bybit_client, batch_window: float = 0.005):
+        self.bybit_client = bybit_client
+        self.batch_window = batch_window
+
+        self._pending: List[Tuple[Dict, asyncio.Future, Optional[object]]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.orders = 0
+
+    async def place(self, order: Dict, trace=None) -> Dict:
+        """Queue ``order`` (a /v5/order/create body) and wait for its own result."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((order, future, trace))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+        return await future
+
+    async def place_many(self, orders: List[Dict]) -> List[Dict]:
+        return list(await asyncio.gather(*[self.place(order) for order in orders]))
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_window)
+        pending, self._pending = self._pending, []
+        # Orders placed while this batch is in flight start a window of their own
+        if self._flush_task is asyncio.current_task():
+            self._flush_task = None
+
+        by_category: Dict[str, List[Tuple[Dict, asyncio.Future, Optional[object]]]] = {}
+        for item in pending:
+            by_category.setdefault(item[0]["category"], []).append(item)
+
+        chunks = []
+        for category, items in by_category.items():
+            limit = self.BATCH_LIMITS.get(category, 1)
+            chunks.extend(items[i:i + limit] for i in range(0, len(items), limit))
+
+        await asyncio.gather(*[self._send(chunk) for chunk in chunks])
+
+    async def _send(self, chunk: List[Tuple[Dict, asyncio.Future, Optional[object]]]):
+        timings = {"dispatched_at": time.time()}
+        try:
+            if len(chunk) == 1:
+                order = chunk[0][0]
+                results = [await self.bybit_client.post_private("/v5/order/create", data=order, timings=timings)]
+            else:
+                results = await self._send_batch([order for order, _, _ in chunk], timings)
+        except Exception as e:
+            results = [{"retCode": -1, "retMsg": str(e)}] * len(chunk)
+
+        self.batches += 1
+        self.orders += len(chunk)
+        for (_, future, trace), result in zip(chunk, results):
+            if trace is not None:
+                trace.batch_size = len(chunk)
+                trace.mark_sent(timings, self.bybit_client.time_offset)
+                trace.mark_ack(result)
+            if not future.done():
+                future.set_result(result)
+
+    async def _send_batch(self, orders: List[Dict], timings: Optional[Dict] = None) -> List[Dict]:
+        category = orders[0]["category"]
+        request = [{k: v for k, v in order.items() if k != "category"} for order in orders]
+        response = await self.bybit_client.post_private(
+            "/v5/order/create-batch",
+            data={"category": category, "request": request},
+            timings=timings
+        )
+
+        if response.get("retCode") != 0:
+            # The whole batch was rejected; every order shares the error
+            return [response] * len(orders)
+
+        created = response.get("result", {}).get("list", [])
+        statuses = response.get("retExtInfo", {}).get("list", [])
+
+        # Bybit answers in request order, one entry per order
+        results = []
+        for i in range(len(orders)):
+            status = statuses[i] if i < len(statuses) else {"code": -1, "msg": "No result for order"}
+            results.append({
+                "retCode": status.get("code", -1),
+                "retMsg": status.get("msg", ""),
+                "result": created[i] if i < len(created) else {},
+                "time": response.get("time")
+            })
+        return results
@@ -3,35 +3,53 @@ import asyncio
 
 from datetime import datetime
 
+from services.market_data import MarketDataCache
+
 
 class PositionMonitor:
 
-    def __init__(self, bybit_client):
+    def __init__(self, bybit_client, market_data=None, account_stream=None):
         self.bybit_client = bybit_client
+        self.market_data = market_data or MarketDataCache(bybit_client)
+        self.account_stream = account_stream
         self.positions: Dict[str, Dict] = {}
 
         self.current_prices: Dict[str, float] = {}
         self.price_update_task = None
 
     async def get_positions(self, category: str = "linear") -> List[Dict]:
-        try:
-            response = await self.bybit_client.get_private(
-                "/v5/position/list",
-                params={"category": category, "settleCoin": "USDT"}
-            )
-
-            if response.get("retCode") == 0:
-                positions = response.get("result", {}).get("list", [])
+        if self.account_stream and self.account_stream.is_live() and category == "linear":
+            return [
+                pos for pos in self.account_stream.get_positions(category)
+                if pos.get("symbol", "").endswith("USDT")
+            ]
 
-                open_positions = [
-                    pos for pos in positions
-                    if float(pos.get("size", 0)) > 0
-                ]
-
-                return open_positions
-            else:
-                print(f"Error fetching positions: {response.get('retMsg')}")
-                return []
+        try:
+            positions = []
+            cursor = ""
+            while True:
+                # Bybit returns 20 positions per page unless asked for more
+                params = {"category": category, "settleCoin": "USDT", "limit": 200}
+                if cursor:
+                    params["cursor"] = cursor
+                response = await self.bybit_client.get_private("/v5/position/list", params=params)
+
+                if response.get("retCode") != 0:
+                    print(f"Error fetching positions: {response.get('retMsg')}")
+                    return []
+
+                result = response.get("result", {})
+                positions.extend(result.get("list", []))
+                cursor = result.get("nextPageCursor", "")
+                if not cursor:
+                    break
+
+            open_positions = [
+                pos for pos in positions
+                if float(pos.get("size", 0)) > 0
+            ]
+
+            return open_positions
 
         except Exception as e:
             print(f"Error in get_positions: {e}")
@@ -39,23 +57,14 @@ class PositionMonitor:
 
     async def get_current_price(self, symbol: str, category: str = "linear") -> Optional[float]:
         try:
-            response = await self.bybit_client.get_public(
-                "/v5/market/tickers",
-                params={"category": category, "symbol": symbol}
-            )
-
-            if response.get("retCode") == 0:
-                result = response.get("result", {}).get("list", [])
-                if result:
-                    return float(result[0].get("lastPrice", 0))
-
-            return None
+            return await self.market_data.get_price(symbol, category)
 
         except Exception as e:
             print(f"Error fetching price for {symbol}: {e}")
             return None
 
-    async def enrich_position_with_price(self, position: Dict, category: str = "linear") -> Dict:
+    async def enrich_position_with_price(self, position: Dict, category: str = "linear",
+                                         current_price: Optional[float] = None) -> Dict:
         symbol = position.get("symbol")
         side = position.get("side")
         size = float(position.get("size", 0))
@@ -63,7 +72,8 @@ class PositionMonitor:
 
         leverage = float(position.get("leverage", 1))
 
-        current_price = await self.get_current_price(symbol, category)
+        if current_price is None:
+            current_price = await self.get_current_price(symbol, category)
 
         if not current_price:
             current_price = entry_price
@@ -100,8 +110,11 @@ class PositionMonitor:
         if not positions:
             return []
 
+        prices = await self.market_data.get_prices([pos.get("symbol") for pos in positions], category)
+
         enriched_positions = await asyncio.gather(
-            *[self.enrich_position_with_price(pos, category) for pos in positions]
+            *[self.enrich_position_with_price(pos, category, prices.get(pos.get("symbol"), 0))
+              for pos in positions]
         )
 
         return list(enriched_positions)
@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Fields that change on every refresh without the position changing
+VOLATILE_FIELDS = ("updated_at",)
+
+
+def fingerprint(value: Dict) -> str:
+    stable = {k: v for k, v in value.items() if k not in VOLATILE_FIELDS}
+    return json.dumps(stable, sort_keys=True, default=str)
+
+
+class PositionVersions:
+    """Server-side version counter for /api/positions.
+
+    Every build of the positions payload is recorded here; a position or
+    monitor whose fingerprint differs from the last build gets the next
+    version. Clients can then ask for 304 via the ETag or for only what
+    changed after the version they last saw. The counter starts from the
+    wall clock so versions from a previous process never look current.
+    """
+
+    def __init__(self, max_tombstones: int = 1000):
+        self.max_tombstones = max_tombstones
+        self._lock = threading.Lock()
+        self._version = int(time.time() * 1000)
+        # category -> symbol -> (fingerprint, version changed)
+        self._positions: Dict[str, Dict[str, Tuple[str, int]]] = {}
+        # category -> symbol -> version removed
+        self._removed: Dict[str, Dict[str, int]] = {}
+        # Oldest version a delta can still be computed from, per category
+        self._floor: Dict[str, int] = {}
+        self._category_version: Dict[str, int] = {}
+
+        self._monitors: Dict[str, Tuple[str, int]] = {}
+        self._removed_monitors: Dict[str, int] = {}
+        self._monitors_floor = self._version
+        self._monitors_version = self._version
+
+    def _next(self) -> int:
+        self._version += 1
+        return self._version
+
+    def _apply(self, known: Dict[str, Tuple[str, int]], removed: Dict[str, int],
+               current: Dict[str, Dict]) -> Tuple[bool, int]:
+        changed = False
+        version = None
+        for symbol, value in current.items():
+            fp = fingerprint(value)
+            entry = known.get(symbol)
+            if entry is None or entry[0] != fp:
+                version = version or self._next()
+                known[symbol] = (fp, version)
+                removed.pop(symbol, None)
+                changed = True
+
+        for symbol in [s for s in known if s not in current]:
+            version = version or self._next()
+            del known[symbol]
+            removed[symbol] = version
+            changed = True
+
+        # Forget the oldest tombstones; clients older than that get a full list
+        floor = 0
+        while len(removed) > self.max_tombstones:
+            oldest = min(removed, key=removed.get)
+            floor = max(floor, removed.pop(oldest))
+        return changed, floor
+
+    def record(self, category: str, positions: List[Dict], monitors: Dict[str, Dict]) -> int:
+        """Record a freshly built payload and return the category's version."""
+        with self._lock:
+            known = self._positions.get(category)
+            if known is None:
+                known = self._positions[category] = {}
+                self._removed[category] = {}
+                self._floor[category] = self._version
+
+            changed, floor = self._apply(known, self._removed[category],
+                                         {pos.get("symbol"): pos for pos in positions})
+            if changed:
+                self._category_version[category] = self._version
+            if floor:
+                self._floor[category] = max(self._floor[category], floor)
+
+            changed, floor = self._apply(self._monitors, self._removed_monitors, monitors)
+            if changed:
+                self._monitors_version = self._version
+            if floor:
+                self._monitors_floor = max(self._monitors_floor, floor)
+
+            return self.version(category)
+
+    def version(self, category: str) -> int:
+        return max(self._category_version.get(category, self._floor.get(category, 0)),
+                   self._monitors_version)
+
+    def etag(self, category: str) -> str:
+        return f"{category}-{self.version(category)}"
+
+    def delta(self, category: str, since: int, positions: List[Dict],
+              monitors: Dict[str, Dict]) -> Optional[Dict]:
+        """Changes after `since`, or None if `since` is too old or unknown."""
+        with self._lock:
+            known = self._positions.get(category)
+            if known is None or since < max(self._floor[category], self._monitors_floor):
+                return None
+            if since > self._version:
+                return None
+
+            changed = [pos for pos in positions
+                       if known.get(pos.get("symbol"), ("", since + 1))[1] > since]
+            removed = [symbol for symbol, version in self._removed[category].items()
+                       if version > since]
+            monitors_changed = {symbol: monitors[symbol] for symbol, (_, version) in self._monitors.items()
+                                if version > since and symbol in monitors}
+            monitors_removed = [symbol for symbol, version in self._removed_monitors.items()
+                                if version > since]
+
+        return {
+            "changed": changed,
+            "removed": removed,
+            "monitors": {"changed": monitors_changed, "removed": monitors_removed}
+        }
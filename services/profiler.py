@@ -0,0 +1,189 @@
+import asyncio
+import collections
+import contextlib
+import itertools
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAX_DEPTH = 128
+
+
+def _label(code) -> str:
+    # Collapsed-stack frames are separated by ";", so keep it out of labels
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _frame_stack(frame) -> Tuple[str, ...]:
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+def _coroutine_stack(coro) -> Tuple[str, ...]:
+    """Outermost-first frames of a suspended coroutine chain, read from another thread."""
+    labels = []
+    while coro is not None and len(labels) < MAX_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        labels.append(_label(frame.f_code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return tuple(labels)
+
+
+class StackSampler:
+    """Samples Python stacks of running threads, and the await chains of an
+    event loop's tasks, from a background thread.
+
+    Each sample adds one count per thread (``threads;<name>;...``) and per
+    task (``tasks;<name>;...``), so counts are proportional to wall time.
+    Nothing is traced between samples; the sampled threads only pay for the
+    GIL hand-offs.
+    """
+
+    def __init__(self, interval: float = 0.005, loop: Optional[asyncio.AbstractEventLoop] = None,
+                 thread_ids: Optional[Iterable[int]] = None, task_every: int = 4):
+        self.interval = interval
+        self.loop = loop
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        # Task stacks change only at awaits, so they are read less often
+        self.task_every = task_every
+
+        self.stacks: "collections.Counter[Tuple[str, ...]]" = collections.Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample_threads(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                continue
+            self.stacks[("threads", names.get(ident, str(ident))) + _frame_stack(frame)] += 1
+
+    def _sample_tasks(self):
+        try:
+            tasks = list(asyncio.all_tasks(self.loop))
+        except RuntimeError:
+            return
+        for task in tasks:
+            if task.done():
+                continue
+            self.stacks[("tasks", task.get_name()) + _coroutine_stack(task.get_coro())] += 1
+
+    def _run(self):
+        next_sample = time.perf_counter()
+        while not self._stop.is_set():
+            self._sample_threads()
+            if self.loop is not None and self.task_every and self.samples % self.task_every == 0:
+                self._sample_tasks()
+            self.samples += 1
+
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay < 0:
+                # Fell behind (e.g. GIL contention); resume from now rather than bursting
+                next_sample = time.perf_counter()
+                delay = 0
+            self._stop.wait(delay)
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.duration = time.time() - self.started_at if self.started_at else 0.0
+
+    def run(self, seconds: float):
+        self.start()
+        try:
+            time.sleep(seconds)
+        finally:
+            self.stop()
+
+    def collapsed(self) -> str:
+        """One ``frame;frame;... count`` line per distinct stack, as flamegraph.pl and speedscope read."""
+        lines = [f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+class Profiler:
+    """Opt-in, on-demand sampling profiles of the running app.
+
+    Disabled unless created with ``enabled=True`` (the app reads
+    ``BTC_RULES_PROFILING``); while disabled the only cost is the
+    ``enabled`` check. Per-request profiles are kept in memory, newest
+    ``max_profiles`` only, and fetched by id.
+    """
+
+    def __init__(self, enabled: bool = False, loop_getter=None, max_seconds: float = 60.0,
+                 max_profiles: int = 20):
+        self.enabled = enabled
+        # Called at capture time so a restarted engine's new loop is used
+        self.loop_getter = loop_getter or (lambda: None)
+        self.max_seconds = max_seconds
+
+        self._profiles: "collections.OrderedDict[str, Dict]" = collections.OrderedDict()
+        self._max_profiles = max_profiles
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # One whole-process capture at a time; overlapping samplers would skew each other
+        self._capture_lock = threading.Lock()
+
+    def capture(self, seconds: float, interval: float = 0.005, tasks: bool = True) -> Optional[StackSampler]:
+        """Sample every thread for ``seconds``; None if another capture is running."""
+        if not self._capture_lock.acquire(blocking=False):
+            return None
+        try:
+            sampler = StackSampler(interval, self.loop_getter() if tasks else None)
+            sampler.run(min(max(seconds, interval), self.max_seconds))
+            return sampler
+        finally:
+            self._capture_lock.release()
+
+    @contextlib.contextmanager
+    def profile_request(self, name: str, thread_ids: List[Optional[int]], interval: float = 0.001):
+        """Sample ``thread_ids`` while the block runs; yields the stored profile's record."""
+        sampler = StackSampler(interval, self.loop_getter(), [ident for ident in thread_ids if ident], task_every=1)
+        record = {"id": str(next(self._ids)), "name": name}
+        sampler.start()
+        try:
+            yield record
+        finally:
+            sampler.stop()
+            record.update({
+                "created_at": sampler.started_at,
+                "duration": sampler.duration,
+                "samples": sampler.samples,
+                "collapsed": sampler.collapsed()
+            })
+            with self._lock:
+                self._profiles[record["id"]] = record
+                while len(self._profiles) > self._max_profiles:
+                    self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {key: value for key, value in record.items() if key != "collapsed"}
+                for record in reversed(self._profiles.values())
+            ]
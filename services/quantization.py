@@ -0,0 +1,83 @@
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_UP, InvalidOperation
+from typing import Dict, List, NamedTuple, Optional, Union
+
+ZERO = Decimal(0)
+
+
+def to_decimal(value: Union[str, float, int, Decimal]) -> Decimal:
+    # str() of a float is its shortest round-trip form, so 0.3 stays 0.3
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def format_decimal(value: Decimal) -> str:
+    return format(value, "f")
+
+
+def _filter_decimal(filters: Dict, *keys: str) -> Optional[Decimal]:
+    for key in keys:
+        raw = filters.get(key)
+        if raw not in (None, ""):
+            try:
+                value = Decimal(raw)
+            except InvalidOperation:
+                continue
+            if value > 0:
+                return value
+    return None
+
+
+class Quantization(NamedTuple):
+    """Exact order size and price increments for one instrument."""
+    qty_step: Decimal
+    min_qty: Decimal
+    max_qty: Optional[Decimal]
+    tick_size: Optional[Decimal]
+
+    @classmethod
+    def from_instrument(cls, instrument: Dict) -> Optional["Quantization"]:
+        lot = instrument.get("lotSizeFilter", {})
+        price = instrument.get("priceFilter", {})
+
+        # Spot instruments give the quantity increment as basePrecision
+        qty_step = _filter_decimal(lot, "qtyStep", "basePrecision")
+        if qty_step is None:
+            return None
+        return cls(
+            qty_step=qty_step,
+            min_qty=_filter_decimal(lot, "minOrderQty") or qty_step,
+            # Closes are market orders, which have their own cap on linear
+            max_qty=_filter_decimal(lot, "maxMktOrderQty", "maxOrderQty"),
+            tick_size=_filter_decimal(price, "tickSize")
+        )
+
+    def quantity(self, qty: Union[str, float, Decimal]) -> Decimal:
+        """Floor to the step; zero if below the minimum."""
+        rounded = (to_decimal(qty) / self.qty_step).to_integral_value(ROUND_FLOOR) * self.qty_step
+        if rounded < self.min_qty:
+            return ZERO
+        return rounded
+
+    def split(self, qty: Union[str, float, Decimal]) -> List[Decimal]:
+        """Order sizes of at most the maximum that add up to quantity(qty)."""
+        total = self.quantity(qty)
+        if total <= 0:
+            return []
+        if self.max_qty is None:
+            return [total]
+
+        chunk = (self.max_qty / self.qty_step).to_integral_value(ROUND_FLOOR) * self.qty_step
+        count, rest = divmod(total, chunk)
+        chunks = [chunk] * int(count)
+        if rest >= self.min_qty:
+            chunks.append(rest)
+        elif rest > 0 and chunk - self.min_qty + rest >= self.min_qty:
+            # Too small to send alone; move part of the last full order into it
+            chunks[-1] = chunk - self.min_qty + rest
+            chunks.append(self.min_qty)
+        return chunks
+
+    def price(self, price: Union[str, float, Decimal], rounding: str = ROUND_HALF_UP) -> Decimal:
+        value = to_decimal(price)
+        if self.tick_size is None:
+            return value
+        return (value / self.tick_size).to_integral_value(rounding) * self.tick_size
@@ -0,0 +1,176 @@
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Dict, Optional
+
+PRIORITY_ORDER = 0
+PRIORITY_POLL = 1
+PRIORITY_UI = 2
+
+PRIORITY_NAMES = {PRIORITY_ORDER: "order", PRIORITY_POLL: "poll", PRIORITY_UI: "ui"}
+
+# Bybit retCode for "too many visits"
+RATE_LIMIT_RET_CODE = 10006
+
+_request_priority: contextvars.ContextVar = contextvars.ContextVar("bybit_request_priority", default=None)
+
+
+@contextlib.contextmanager
+def request_priority(priority: int):
+    """Run the enclosed Bybit requests (and tasks spawned inside) at ``priority``."""
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def current_priority() -> Optional[int]:
+    return _request_priority.get()
+
+
+class _Budget:
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+        self.backoff = 0.0
+        self.throttled = 0
+
+
+class RateLimitScheduler:
+    """Per-endpoint request budgets fed by Bybit's X-Bapi-Limit-* headers.
+
+    Requests wait while their endpoint's budget is spent or in backoff, and
+    lower priority requests also wait while higher priority ones are queued
+    or when they already hold ``low_priority_slots`` connections. Order
+    placement may use the last ``reserve`` requests of a budget; polling and
+    UI refresh may not. State is guarded by a thread lock and waiting is done
+    with short sleeps, so one scheduler can serve callers on any event loop.
+    """
+
+    def __init__(self, reserve: int = 2, low_priority_slots: int = 16, poll_interval: float = 0.02,
+                 min_backoff: float = 0.5, max_backoff: float = 10.0):
+        self.reserve = reserve
+        self.low_priority_slots = low_priority_slots
+        self.poll_interval = poll_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self._budgets: Dict[str, _Budget] = {}
+        self._waiting: Dict[int, int] = {PRIORITY_ORDER: 0, PRIORITY_POLL: 0, PRIORITY_UI: 0}
+        self._low_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _budget(self, endpoint: str) -> _Budget:
+        budget = self._budgets.get(endpoint)
+        if budget is None:
+            budget = self._budgets[endpoint] = _Budget()
+        return budget
+
+    def _delay(self, endpoint: str, priority: int, now: float) -> float:
+        budget = self._budget(endpoint)
+        if budget.blocked_until > now:
+            return budget.blocked_until - now
+
+        if budget.remaining is not None and budget.reset_at > now:
+            floor = 0 if priority == PRIORITY_ORDER else self.reserve
+            if budget.remaining <= floor:
+                return budget.reset_at - now
+
+        if priority != PRIORITY_ORDER:
+            if any(self._waiting[p] for p in self._waiting if p < priority):
+                return self.poll_interval
+            if self._low_in_flight >= self.low_priority_slots:
+                return self.poll_interval
+
+        return 0.0
+
+    async def acquire(self, endpoint: str, priority: int):
+        queued = False
+        try:
+            while True:
+                with self._lock:
+                    delay = self._delay(endpoint, priority, time.time())
+                    if delay <= 0:
+                        budget = self._budget(endpoint)
+                        if budget.remaining is not None:
+                            budget.remaining -= 1
+                        if priority != PRIORITY_ORDER:
+                            self._low_in_flight += 1
+                        return
+                    if not queued:
+                        self._waiting[priority] += 1
+                        queued = True
+
+                await asyncio.sleep(min(delay, 1.0))
+        finally:
+            if queued:
+                with self._lock:
+                    self._waiting[priority] -= 1
+
+    def release(self, priority: int):
+        if priority != PRIORITY_ORDER:
+            with self._lock:
+                self._low_in_flight -= 1
+
+    def update(self, endpoint: str, headers, time_offset_ms: int = 0):
+        status = headers.get("X-Bapi-Limit-Status")
+        if status is None:
+            return
+
+        with self._lock:
+            budget = self._budget(endpoint)
+            try:
+                budget.remaining = int(status)
+                limit = headers.get("X-Bapi-Limit")
+                if limit is not None:
+                    budget.limit = int(limit)
+                reset = headers.get("X-Bapi-Limit-Reset-Timestamp")
+                if reset is not None:
+                    # Reset time is in server milliseconds
+                    budget.reset_at = (int(reset) - time_offset_ms) / 1000
+            except ValueError:
+                return
+            budget.backoff = 0.0
+
+    def throttle(self, endpoint: str) -> float:
+        """Record a throttled response and return how long the endpoint is now blocked for."""
+        with self._lock:
+            budget = self._budget(endpoint)
+            now = time.time()
+            budget.throttled += 1
+            budget.backoff = min(max(budget.backoff * 2, self.min_backoff), self.max_backoff)
+            until = now + budget.backoff
+            if budget.reset_at > until:
+                until = min(budget.reset_at, now + self.max_backoff)
+            budget.blocked_until = until
+            budget.remaining = 0 if budget.remaining is not None else None
+            return until - now
+
+    def reset(self):
+        """Forget learned budgets, e.g. after switching account or environment."""
+        with self._lock:
+            self._budgets.clear()
+
+    def status(self) -> Dict[str, Dict]:
+        with self._lock:
+            now = time.time()
+            return {
+                endpoint: {
+                    "limit": budget.limit,
+                    "remaining": budget.remaining,
+                    "reset_in": max(budget.reset_at - now, 0.0) if budget.reset_at else None,
+                    "blocked_for": max(budget.blocked_until - now, 0.0),
+                    "throttled": budget.throttled
+                }
+                for endpoint, budget in self._budgets.items()
+            }
+
+    def queue_depth(self) -> Dict[str, int]:
+        with self._lock:
+            return {PRIORITY_NAMES[p]: count for p, count in self._waiting.items()}
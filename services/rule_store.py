@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from services.metrics import Histogram
+
+
+class RuleStore:
+    """Snapshot plus append-only journal persistence for BTC rule monitors.
+
+    ``btc_rules.json`` holds the last compacted snapshot and ``btc_rules.journal``
+    holds one compact JSON change record per line written since then. Loading
+    replays the journal over the snapshot; a torn last line from a crash is
+    ignored. Snapshots are written to a temp file and swapped in with
+    ``os.replace`` so a crash never leaves a half-written rule book.
+    """
+
+    def __init__(self, snapshot_file: str, compact_every: int = 500, fsync_interval: float = 0.5):
+        self.snapshot_file = snapshot_file
+        self.journal_file = os.path.splitext(snapshot_file)[0] + ".journal"
+        self.compact_every = compact_every
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.RLock()
+        self._journal = None
+        self._journal_records = 0
+        self._fsync_timer = None
+
+        self.last_write_seconds = 0.0
+        self.write_duration = Histogram("btc_rules_write_duration_seconds",
+                                        "Time to write a journal record or compact btc_rules.json", ("op",))
+
+    def load(self) -> Dict[str, Dict]:
+        with self._lock:
+            monitors: Dict[str, Dict] = {}
+            if os.path.exists(self.snapshot_file):
+                with open(self.snapshot_file, 'r') as f:
+                    monitors = json.load(f)
+
+            replayed = 0
+            if os.path.exists(self.journal_file):
+                with open(self.journal_file, 'r') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            print(f"[RULE STORE] Ignoring torn journal record: {line[:80]}")
+                            break
+                        self._apply(monitors, record)
+                        replayed += 1
+
+            self._journal_records = replayed
+            if replayed:
+                print(f"[RULE STORE] Replayed {replayed} journal record(s)")
+            return monitors
+
+    @staticmethod
+    def _apply(monitors: Dict[str, Dict], record: Dict[str, Any]):
+        op = record.get("op")
+        symbol = record.get("symbol")
+
+        if op == "set":
+            monitors[symbol] = record["monitor"]
+        elif op == "remove":
+            monitors.pop(symbol, None)
+        elif op == "update" and symbol in monitors:
+            monitors[symbol].update(record.get("fields", {}))
+        elif op == "trigger" and symbol in monitors:
+            triggered = monitors[symbol].setdefault("triggered_rules", [])
+            if record["rule_id"] not in triggered:
+                triggered.append(record["rule_id"])
+
+    def _open_journal(self):
+        if self._journal is None or self._journal.closed:
+            self._journal = open(self.journal_file, 'a')
+        return self._journal
+
+    def append(self, op: str, symbol: str, **payload):
+        record = {"op": op, "symbol": symbol, "ts": round(time.time(), 3)}
+        record.update(payload)
+        line = json.dumps(record, separators=(",", ":"))
+
+        with self._lock:
+            started = time.perf_counter()
+            journal = self._open_journal()
+            journal.write(line + "\n")
+            journal.flush()
+            self._journal_records += 1
+            self._schedule_fsync()
+            self.last_write_seconds = time.perf_counter() - started
+        self.write_duration.observe(self.last_write_seconds, "append")
+
+    def _schedule_fsync(self):
+        if self._fsync_timer is not None:
+            return
+        self._fsync_timer = threading.Timer(self.fsync_interval, self._fsync)
+        self._fsync_timer.daemon = True
+        self._fsync_timer.start()
+
+    def _fsync(self):
+        with self._lock:
+            self._fsync_timer = None
+            if self._journal is not None and not self._journal.closed:
+                os.fsync(self._journal.fileno())
+
+    def needs_compaction(self) -> bool:
+        return self._journal_records >= self.compact_every
+
+    def compact(self, monitors: Dict[str, Dict]):
+        with self._lock:
+            started = time.perf_counter()
+            tmp_file = f"{self.snapshot_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(monitors, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.snapshot_file)
+
+            # The snapshot now covers every journaled change
+            if self._journal is not None and not self._journal.closed:
+                self._journal.close()
+            self._journal = open(self.journal_file, 'w')
+            self._journal_records = 0
+            self.last_write_seconds = time.perf_counter() - started
+        self.write_duration.observe(self.last_write_seconds, "compact")
+
+    def close(self):
+        with self._lock:
+            if self._fsync_timer is not None:
+                self._fsync_timer.cancel()
+                self._fsync_timer = None
+            if self._journal is not None and not self._journal.closed:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
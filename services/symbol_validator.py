@@ -1,75 +1,217 @@
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set, Tuple
 import asyncio
+import bisect
+import json
+import os
+import time
 
 from datetime import datetime, timedelta
 
+from services.quantization import Quantization, format_decimal
+
 
 class SymbolValidator:
+    """USDT instrument metadata for linear and spot, cached on disk.
+
+    The cache file is loaded at startup so symbols are usable immediately;
+    once it is older than ``cache_duration`` it keeps being served while a
+    background refresh fetches both categories concurrently. Only a cold
+    start with no usable cache waits for the network.
+    """
+
+    CACHE_FILE_NAME = "instruments_cache.json"
+    CATEGORIES = ("linear", "spot")
+    PAGE_LIMIT = 1000
+    # Instrument fields kept in memory and on disk
+    FIELDS = ("symbol", "status", "baseCoin", "quoteCoin", "lotSizeFilter", "priceFilter")
 
-    def __init__(self, bybit_client):
+    def __init__(self, bybit_client, cache_dir: Optional[str] = None,
+                 cache_duration: timedelta = timedelta(hours=1)):
         self.bybit_client = bybit_client
         self.valid_symbols: Set[str] = set()
-        self.instrument_info: Dict[str, Dict] = {}
+        # category -> symbol -> instrument
+        self.instruments: Dict[str, Dict[str, Dict]] = {category: {} for category in self.CATEGORIES}
+        # (category, symbol) -> exact order increments, rebuilt with every refresh
+        self._quantization: Dict[Tuple[str, str], Quantization] = {}
+        # Search index: sorted search keys (symbol without USDT) and their categories
+        self._search_keys: List[str] = []
+        self._key_categories: Dict[str, Tuple[str, ...]] = {}
+        # All keys joined by newlines, so substring search is a few str.find calls
+        self._search_blob = ""
+        self._search_offsets: List[int] = []
         self.last_update: datetime = None
-        self.cache_duration = timedelta(hours=1)
+        self.cache_duration = cache_duration
+        self.cache_file = os.path.join(cache_dir, self.CACHE_FILE_NAME) if cache_dir else None
+
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Bumped by invalidate(); a refresh started under an older generation is discarded
+        self._generation = 0
+        self._refresh_generation: Optional[int] = None
+
+        # Lookups answered from memory vs ones that had to wait for (or found nothing in) a fetch
+        self.hits = 0
+        self.misses = 0
 
     async def initialize(self):
-        await self._refresh_symbols()
+        if not self._load_cache():
+            await self._refresh_symbols()
+        else:
+            self._ensure_fresh_cache_nowait()
 
-    async def _refresh_symbols(self):
+    def invalidate(self):
+        """Mark the cache stale; it is still served until the refresh, started
+        by the next lookup, lands. A refresh already in flight is discarded."""
+        self._generation += 1
+        self.last_update = None
+
+    def _apply(self, instruments: Dict[str, Dict[str, Dict]], fetched_at: datetime):
+        self.instruments = instruments
+        self.valid_symbols = {symbol for by_symbol in instruments.values() for symbol in by_symbol}
+        table = {}
+        for category, by_symbol in instruments.items():
+            for symbol, instrument in by_symbol.items():
+                quantization = Quantization.from_instrument(instrument)
+                if quantization is not None:
+                    table[(category, symbol)] = quantization
+        self._quantization = table
+
+        key_categories: Dict[str, Tuple[str, ...]] = {}
+        for category in self.CATEGORIES:
+            for symbol in instruments.get(category, {}):
+                key = symbol[:-len("USDT")]
+                key_categories[key] = key_categories.get(key, ()) + (category,)
+        self._key_categories = key_categories
+        self._search_keys = sorted(key_categories)
+        self._search_blob = "\n".join(self._search_keys)
+        offsets, position = [], 0
+        for key in self._search_keys:
+            offsets.append(position)
+            position += len(key) + 1
+        self._search_offsets = offsets
+        self.last_update = fetched_at
+
+    def _load_cache(self) -> bool:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return False
         try:
-            all_symbols = set()
-
-
-            response = await self.bybit_client.get_public(
-                "/v5/market/instruments-info",
-                params={"category": "linear"}
-            )
-            if response.get("retCode") == 0:
-                symbols = response.get("result", {}).get("list", [])
-                linear_symbols = {
-                    item["symbol"] for item in symbols
-                    if item["symbol"].endswith("USDT")
-                }
-                all_symbols.update(linear_symbols)
-                for item in symbols:
-                    if item["symbol"].endswith("USDT"):
-                        self.instrument_info[item["symbol"]] = {
-                            "category": "linear",
-                            "lotSizeFilter": item.get("lotSizeFilter", {})
-                        }
-
-                print(f"Loaded {len(linear_symbols)} Linear (USDT Perpetuals) symbols")
-
-            response = await self.bybit_client.get_public(
-                "/v5/market/instruments-info",
-                params={"category": "spot"}
-            )
-            if response.get("retCode") == 0:
-                symbols = response.get("result", {}).get("list", [])
-                spot_symbols = {
-                    item["symbol"] for item in symbols
-                    if item["symbol"].endswith("USDT")
-                }
-                all_symbols.update(spot_symbols)
-                for item in symbols:
-                    if item["symbol"].endswith("USDT"):
-                        self.instrument_info[item["symbol"]] = {
-                            "category": "spot",
-                            "lotSizeFilter": item.get("lotSizeFilter", {})
-                        }
-                print(f"Loaded {len(spot_symbols)} Spot symbols")
-
-            self.valid_symbols = all_symbols
-            self.last_update = datetime.now()
-            print(f"Total: {len(self.valid_symbols)} USDT symbols loaded")
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+
+            # A cache written for another environment (testnet, demo) is not ours
+            if data.get("base_url") != self.bybit_client.base_url:
+                return False
 
+            instruments = {category: data.get("instruments", {}).get(category, {})
+                           for category in self.CATEGORIES}
+            self._apply(instruments, datetime.fromtimestamp(data["fetched_at"]))
+            print(f"Loaded {len(self.valid_symbols)} USDT symbols from instrument cache")
+            return True
         except Exception as e:
-            print(f"Error refreshing symbols: {e}")
+            print(f"Error loading instrument cache: {e}")
+            return False
+
+    def _write_cache(self, data: Dict):
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_file, self.cache_file)
+
+    async def _save_cache(self):
+        if not self.cache_file:
+            return
+        data = {
+            "base_url": self.bybit_client.base_url,
+            "fetched_at": self.last_update.timestamp(),
+            "instruments": self.instruments
+        }
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_cache, data)
+        except Exception as e:
+            print(f"Error saving instrument cache: {e}")
+
+    async def _fetch_category(self, category: str) -> Dict[str, Dict]:
+        instruments: Dict[str, Dict] = {}
+        cursor = ""
+        while True:
+            params = {"category": category, "limit": self.PAGE_LIMIT}
+            if cursor:
+                params["cursor"] = cursor
+
+            response = await self.bybit_client.get_public("/v5/market/instruments-info", params=params)
+            if response.get("retCode") != 0:
+                raise RuntimeError(f"{category} instruments: {response.get('retMsg')}")
+
+            result = response.get("result", {})
+            for item in result.get("list", []):
+                if item["symbol"].endswith("USDT"):
+                    instruments[item["symbol"]] = {field: item[field] for field in self.FIELDS if field in item}
+
+            cursor = result.get("nextPageCursor") or ""
+            if not cursor:
+                return instruments
+
+    def _refresh_running(self) -> bool:
+        return (self._refresh_task is not None and not self._refresh_task.done()
+                and self._refresh_generation == self._generation)
+
+    def _start_refresh(self):
+        self._refresh_generation = self._generation
+        self._refresh_task = asyncio.ensure_future(self._do_refresh(self._generation))
+
+    async def _refresh_symbols(self):
+        # One refresh at a time; concurrent callers wait for the same one
+        if not self._refresh_running():
+            self._start_refresh()
+        await asyncio.shield(self._refresh_task)
+
+    async def _do_refresh(self, generation: int):
+        started = time.time()
+        results = await asyncio.gather(
+            *[self._fetch_category(category) for category in self.CATEGORIES],
+            return_exceptions=True
+        )
+
+        if generation != self._generation:
+            # Fetched from the servers in use before invalidate()
+            print("Discarding instrument refresh started before the cache was invalidated")
+            return
+
+        instruments = dict(self.instruments)
+        failed = False
+        for category, result in zip(self.CATEGORIES, results):
+            if isinstance(result, Exception):
+                # Keep serving what we had for this category
+                print(f"Error refreshing symbols: {result}")
+                failed = True
+                continue
+            instruments[category] = result
+            print(f"Loaded {len(result)} {category.capitalize()} symbols")
+
+        if failed:
+            # Stay stale so the next lookup retries in the background
+            self._apply(instruments, self.last_update)
+            return
+
+        self._apply(instruments, datetime.now())
+        print(f"Total: {len(self.valid_symbols)} USDT symbols loaded in {time.time() - started:.2f}s")
+        await self._save_cache()
+
+    def _is_stale(self) -> bool:
+        return not self.last_update or datetime.now() - self.last_update > self.cache_duration
+
+    def _ensure_fresh_cache_nowait(self):
+        if self._is_stale() and not self._refresh_running():
+            self._start_refresh()
 
     async def _ensure_fresh_cache(self):
-        if not self.last_update or datetime.now() - self.last_update > self.cache_duration:
+        if not self.valid_symbols:
+            # Nothing to serve yet, so this caller has to wait
+            self.misses += 1
             await self._refresh_symbols()
+        else:
+            # Stale-while-revalidate: answer from the cache, refresh in the background
+            self.hits += 1
+            self._ensure_fresh_cache_nowait()
 
     def _format_symbol(self, symbol: str) -> str:
         symbol = symbol.strip().upper()
@@ -103,13 +245,104 @@ class SymbolValidator:
         await self._ensure_fresh_cache()
         return sorted(list(self.valid_symbols))
 
-    async def get_qty_step(self, symbol: str) -> str:
-        await self._ensure_fresh_cache()
+    def get_instrument(self, symbol: str, category: Optional[str] = None) -> Optional[Dict]:
         formatted = self._format_symbol(symbol)
-        info = self.instrument_info.get(formatted, {})
-        lot_size = info.get("lotSizeFilter", {})
-        qty_step = lot_size.get("qtyStep", "1")
-        print(f"[GET QTY STEP] {symbol} -> {formatted}: qtyStep={qty_step}, has_info={formatted in self.instrument_info}, total_cached={len(self.instrument_info)}")
-        if formatted not in self.instrument_info:
-            print(f"[WARNING] {formatted} not found in cache! Using default qtyStep=1")
-        return qty_step
\ No newline at end of file
+        for cat in ([category] if category else self.CATEGORIES):
+            info = self.instruments.get(cat, {}).get(formatted)
+            if info is not None:
+                return info
+        return None
+
+    def _search_key(self, query: str) -> str:
+        key = query.strip().upper().replace("/", "").replace("-", "").replace("_", "")
+        if key.endswith("USDT") and len(key) > len("USDT"):
+            key = key[:-len("USDT")]
+        return key
+
+    def search(self, query: str, limit: int = 20, category: Optional[str] = None) -> List[Dict]:
+        """Rank symbols for ``query``: exact base coin, then prefix, then substring."""
+        key = self._search_key(query)
+        keys = self._search_keys
+        key_categories = self._key_categories
+        matches: List[str] = []
+        seen: Set[str] = set()
+
+        def take(candidates) -> bool:
+            for candidate in candidates:
+                if candidate in seen:
+                    continue
+                if category and category not in key_categories[candidate]:
+                    continue
+                seen.add(candidate)
+                matches.append(candidate)
+                if len(matches) >= limit:
+                    return True
+            return False
+
+        if not key:
+            take(keys)
+        elif not take([key] if key in key_categories else []):
+            # Prefix matches form a contiguous run of the sorted keys
+            start = bisect.bisect_left(keys, key)
+            end = bisect.bisect_left(keys, key + "\uffff", start)
+            prefixed = sorted(keys[start:end], key=len)
+            if not take(prefixed) and len(key) > 1:
+                take(self._contained(key))
+
+        return [{"symbol": f"{k}USDT", "categories": list(key_categories[k])} for k in matches]
+
+    def _contained(self, key: str) -> List[str]:
+        blob, offsets, keys = self._search_blob, self._search_offsets, self._search_keys
+        found: Dict[str, int] = {}
+        position = blob.find(key)
+        while position != -1:
+            index = bisect.bisect_right(offsets, position) - 1
+            depth = position - offsets[index]
+            # Depth 0 is a prefix match, already ranked above
+            if depth > 0 and keys[index] not in found:
+                found[keys[index]] = depth
+            position = blob.find(key, position + 1)
+        return sorted(found, key=lambda k: (found[k], len(k)))
+
+    async def search_symbols(self, query: str, limit: int = 20, category: Optional[str] = None) -> List[Dict]:
+        await self._ensure_fresh_cache()
+        return self.search(query, limit, category)
+
+    def get_quantization(self, symbol: str, category: Optional[str] = None) -> Optional[Quantization]:
+        """O(1) lookup in the table built at refresh time; never waits on the network,
+        but a stale table starts a background refresh when called on a loop."""
+        if self._is_stale():
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                self._ensure_fresh_cache_nowait()
+        for cat in ([category] if category else self.CATEGORIES):
+            quantization = self._quantization.get((cat, symbol))
+            if quantization is not None:
+                self.hits += 1
+                return quantization
+        self.misses += 1
+        return None
+
+    def round_qty(self, symbol: str, qty: float, category: Optional[str] = None) -> Optional[str]:
+        """Order quantity as Bybit accepts it ("0" if below the minimum), or None if unknown."""
+        quantization = self.get_quantization(symbol, category)
+        if quantization is None:
+            return None
+        return format_decimal(quantization.quantity(qty))
+
+    def split_qty(self, symbol: str, qty: float, category: Optional[str] = None) -> Optional[List[str]]:
+        """Market order quantities for closing ``qty``, each within maxMktOrderQty, or None if unknown."""
+        quantization = self.get_quantization(symbol, category)
+        if quantization is None:
+            return None
+        return [format_decimal(chunk) for chunk in quantization.split(qty)]
+
+    def round_price(self, symbol: str, price: float, category: Optional[str] = None) -> Optional[str]:
+        """Price rounded to the instrument's tick size, or None if unknown."""
+        quantization = self.get_quantization(symbol, category)
+        if quantization is None:
+            return None
+        return format_decimal(quantization.price(price))
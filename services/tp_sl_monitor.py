@@ -1,20 +1,72 @@
 import asyncio
-import json
-import math
 import os
-from typing import Dict, List, Optional
+import time
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 
+from services.monitor_engine import MonitorEngine
+from services.trigger_index import TriggerIndex, TriggerEntry
+from services.rule_store import RuleStore
+from services.quantization import format_decimal, to_decimal
+from services.order_executor import OrderExecutor
+from services.execution_latency import ExecutionLatency
+from services.metrics import Histogram
+
 
 class TPSLMonitor:
 
-    def __init__(self, bybit_client, position_monitor, symbol_validator, config_dir=None):
+    TASK_PREFIX = "btc-rule:"
+    TICK_TASK = "btc-rule:tick"
+
+    def __init__(self, bybit_client, position_monitor, symbol_validator, config_dir=None, engine=None,
+                 tick_interval: float = 2.0, feed=None, min_tick_interval: float = 0.1, account_stream=None,
+                 order_executor=None, execution_latency=None):
         self.bybit_client = bybit_client
+        # Closes from monitors triggered by the same tick go out as one batch
+        self.order_executor = order_executor or OrderExecutor(bybit_client)
+        # Per-stage timing of every order a rule sends, from price seen to fill
+        self.latency = execution_latency or ExecutionLatency()
         self.position_monitor = position_monitor
+        self.market_data = position_monitor.market_data
         self.symbol_validator = symbol_validator
         self.monitors: Dict[str, Dict] = {}
 
-        self.monitoring_tasks: Dict[str, asyncio.Task] = {}
+        # One tick task on the shared engine loop evaluates every active symbol
+        self.engine = engine or MonitorEngine()
+        self.tick_interval = tick_interval
+        self.active_symbols: Set[str] = set()
+        self.tick_duration = Histogram("btc_monitor_tick_duration_seconds",
+                                       "Time to fetch prices and evaluate every active monitor in one tick")
+        self.tick_lag = Histogram("btc_monitor_tick_lag_seconds", "How late each tick started against its schedule")
+        self.last_tick_lag = 0.0
+        # Paused while the app swaps Bybit environments; _in_tick shows a tick still finishing
+        self._ticks_paused = False
+        self._in_tick = False
+
+        # With a live WebSocket feed every BTC print wakes the tick early,
+        # but ticks never run closer together than min_tick_interval
+        self.feed = feed
+        self.min_tick_interval = min_tick_interval
+        self._wake: Optional[asyncio.Event] = None
+        if self.feed:
+            self.feed.add_listener(self._on_feed_price)
+
+        # Position pushes from the private stream keep remaining_size in line with real fills
+        self.account_stream = account_stream
+        if self.account_stream:
+            self.account_stream.add_listener("position", self._on_position_update)
+            self.account_stream.add_listener("execution", self.latency.on_execution)
+
+        # Untriggered BTC thresholds across all symbols, sorted by price
+        self.trigger_index = TriggerIndex()
+        self._last_tick_btc: Optional[float] = None
+        # Monitors whose previous_btc_price is not the last tick's BTC price yet
+        self._unsynced: Set[str] = set()
+        # Symbols with a close order in flight; their remaining_size is settled by the ack
+        self._closing: Dict[str, int] = {}
+        # When the current tick's BTC price was received and its crossings found
+        self._tick_observed_at: Optional[float] = None
+        self._tick_detected_at: Optional[float] = None
 
         # Use config_dir if provided, otherwise use current directory
         if config_dir:
@@ -23,28 +75,43 @@ class TPSLMonitor:
             self.storage_file = "btc_rules.json"
 
         print(f"[CONFIG] BTC rules storage: {self.storage_file}")
+        self.store = RuleStore(self.storage_file)
         self.load_monitors()
 
     def load_monitors(self):
-        if os.path.exists(self.storage_file):
-            try:
-                with open(self.storage_file, 'r') as f:
-                    self.monitors = json.load(f)
-                if self.monitors:
-                    print(f"\n✓ Loaded {len(self.monitors)} saved BTC rule monitor(s)")
-                    for symbol, mon in self.monitors.items():
-                        print(f"  - {symbol}: {len(mon.get('rules', []))} rule(s)")
-            except Exception as e:
-                print(f"Error loading monitors: {e}")
-                self.monitors = {}
+        try:
+            self.monitors = self.store.load()
+            if self.monitors:
+                print(f"\n✓ Loaded {len(self.monitors)} saved BTC rule monitor(s)")
+                for symbol, mon in self.monitors.items():
+                    print(f"  - {symbol}: {len(mon.get('rules', []))} rule(s)")
+            for symbol in self.monitors:
+                self._index_monitor(symbol)
+        except Exception as e:
+            print(f"Error loading monitors: {e}")
+            self.monitors = {}
 
     def save_monitors(self):
         try:
-            with open(self.storage_file, 'w') as f:
-                json.dump(self.monitors, f, indent=2)
+            self.store.compact(self.monitors)
         except Exception as e:
             print(f"Error saving monitors: {e}")
 
+    def _journal(self, op: str, symbol: str, **payload):
+        try:
+            self.store.append(op, symbol, **payload)
+            if self.store.needs_compaction():
+                self.store.compact(self.monitors)
+        except Exception as e:
+            print(f"Error saving monitors: {e}")
+
+    def _record_update(self, symbol: str, *fields: str):
+        monitor = self.monitors.get(symbol)
+        if monitor:
+            # previous_btc_price rides along, as it did with full-file saves
+            fields = fields + ("previous_btc_price",)
+            self._journal("update", symbol, fields={field: monitor.get(field) for field in fields})
+
     async def set_monitor(self, symbol: str, category: str, side: str, original_size: float, rules: List[Dict]):
         current_btc_price = await self.position_monitor.get_current_price("BTCUSDT", "linear")
         if not current_btc_price:
@@ -64,7 +131,8 @@ class TPSLMonitor:
             "previous_btc_price": current_btc_price
         }
 
-        self.save_monitors()
+        self._journal("set", symbol, monitor=self.monitors[symbol])
+        self._index_monitor(symbol)
         self.start_monitoring(symbol)
 
         return self.monitors[symbol]
@@ -72,10 +140,46 @@ class TPSLMonitor:
     def remove_monitor(self, symbol: str):
         if symbol in self.monitors:
             del self.monitors[symbol]
-            self.save_monitors()
+            self._journal("remove", symbol)
 
+        self.trigger_index.remove_symbol(symbol)
         self.stop_monitoring(symbol)
 
+    @staticmethod
+    def _rule_id(rule: Dict) -> str:
+        if rule['type'] == 'partial_close':
+            return f"{rule['type']}_{rule['btc_price']}_{rule['close_percent']}"
+        elif rule['type'] == 'set_tp':
+            return f"{rule['type']}_{rule['btc_price']}_{rule['tp_price']}_{rule['close_percent']}"
+        elif rule['type'] == 'set_sl':
+            return f"{rule['type']}_{rule['btc_price']}_{rule['sl_price']}"
+        return f"{rule['type']}_{rule['btc_price']}"
+
+    def _index_monitor(self, symbol: str):
+        self.trigger_index.remove_symbol(symbol)
+        monitor = self.monitors.get(symbol)
+        if not monitor:
+            return
+
+        triggered = set(monitor.get("triggered_rules", []))
+        for rule_index, rule in enumerate(monitor["rules"]):
+            rule_id = self._rule_id(rule)
+            if rule_id not in triggered:
+                self.trigger_index.add(symbol, rule_index, rule_id, rule["btc_price"])
+        self._unsynced.add(symbol)
+
+    def _replaced(self, symbol: str, monitor: Dict) -> bool:
+        """True once ``monitor`` is no longer the one stored, e.g. set_monitor ran during an await."""
+        if self.monitors.get(symbol) is monitor:
+            return False
+        print(f"[BTC MONITOR] {symbol} monitor was replaced or removed while its order was in flight")
+        return True
+
+    def _mark_triggered(self, monitor: Dict, rule_id: str):
+        monitor.setdefault("triggered_rules", []).append(rule_id)
+        self.trigger_index.discard(monitor["symbol"], rule_id)
+        self._journal("trigger", monitor["symbol"], rule_id=rule_id)
+
     def get_monitor(self, symbol: str) -> Optional[Dict]:
         return self.monitors.get(symbol)
 
@@ -83,33 +187,58 @@ class TPSLMonitor:
         return self.monitors
 
     def start_monitoring(self, symbol: str):
-        self.stop_monitoring(symbol)
-
-        import threading
-        def run_monitor():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.create_task(self._monitor_symbol(symbol))
-            loop.run_forever()
+        monitor = self.monitors.get(symbol)
+        if not monitor:
+            return
 
-        thread = threading.Thread(target=run_monitor, daemon=True)
-        thread.start()
-        self.monitoring_tasks[symbol] = thread
+        self._log_monitor_start(monitor)
+        # A restarted monitor compares against its own stored price first, as a new one does
+        self._unsynced.add(symbol)
+        self.active_symbols.add(symbol)
+        if self.feed:
+            self.feed.subscribe(monitor["category"], [symbol])
+        self.engine.ensure(self.TICK_TASK, self._tick_loop)
 
     def stop_monitoring(self, symbol: str):
-        if symbol in self.monitoring_tasks:
-            task_or_thread = self.monitoring_tasks[symbol]
-            if hasattr(task_or_thread, 'cancel'):
-                task_or_thread.cancel()
-            del self.monitoring_tasks[symbol]
+        self.active_symbols.discard(symbol)
+        if self.feed:
+            self.feed.unsubscribe_symbol(symbol)
 
-    async def _monitor_symbol(self, symbol: str):
+    def _on_position_update(self, position: Dict):
+        symbol = position.get("symbol")
         monitor = self.monitors.get(symbol)
-        if not monitor:
+        if not monitor or monitor["category"] != position.get("category", "linear"):
+            return
+
+        # An emptied position reports no side; otherwise only track our own side
+        side = position.get("side")
+        if side and side != monitor["side"]:
             return
 
+        if self._closing.get(symbol):
+            # Our own close is filling; the ack path subtracts it, so counting the push too would close twice
+            return
+
+        size = float(position.get("size", 0) or 0)
+        # The exchange's size wins either way, e.g. after a rejected close or a manual add
+        if size != monitor["remaining_size"]:
+            print(f"[BTC MONITOR] {symbol} position is {size}, tracking it instead of {monitor['remaining_size']}")
+            monitor["remaining_size"] = size
+            self._record_update(symbol, "remaining_size")
+
+    def _on_feed_price(self, category: str, symbol: str, price: float):
+        if symbol == "BTCUSDT" and category == "linear" and self._wake is not None:
+            self._wake.set()
+
+    def is_monitoring(self, symbol: str) -> bool:
+        return symbol in self.active_symbols and self.engine.has_task(self.TICK_TASK)
+
+    def get_task_count(self) -> int:
+        return len([name for name in self.engine.task_names() if name.startswith(self.TASK_PREFIX)])
+
+    def _log_monitor_start(self, monitor: Dict):
         print(f"\n{'='*60}")
-        print(f"✓ Started BTC rules monitoring for {symbol}")
+        print(f"✓ Started BTC rules monitoring for {monitor['symbol']}")
         print(f"  Category: {monitor['category']} | Side: {monitor['side']}")
         print(f"  Rules configured: {len(monitor['rules'])}")
         for i, rule in enumerate(monitor['rules'], 1):
@@ -123,129 +252,182 @@ class TPSLMonitor:
                 print(f"    Rule {i}: Set SL at ${rule['sl_price']} when BTC hits ${rule['btc_price']:,.0f}")
         print(f"{'='*60}\n")
 
-        loop_count = 0  # Track iterations for periodic status updates
+    async def _fetch_tick_prices(self, symbols: List[str]):
+        by_category: Dict[str, List[str]] = {"linear": ["BTCUSDT"]}
+        for symbol in symbols:
+            monitor = self.monitors.get(symbol)
+            if monitor:
+                by_category.setdefault(monitor["category"], []).append(symbol)
+
+        categories = list(by_category.keys())
+        results = await asyncio.gather(
+            *[self.market_data.get_prices(by_category[category], category) for category in categories]
+        )
+        return dict(zip(categories, results))
+
+    async def _tick_loop(self):
+        print(f"[BTC MONITOR] Tick driver started (interval {self.tick_interval}s)")
+        tick_count = 0
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        self._wake = asyncio.Event()
 
         while True:
+            started = loop.time()
+            self.last_tick_lag = max(started - next_tick, 0.0)
+            self.tick_lag.observe(self.last_tick_lag)
             try:
-                monitor = self.monitors.get(symbol)
-                if not monitor:
-                    print(f"Monitor for {symbol} was removed, stopping monitoring")
-                    break
+                symbols = [symbol for symbol in list(self.active_symbols) if symbol in self.monitors]
+
+                if symbols and not self._ticks_paused:
+                    self._in_tick = True
+                    try:
+                        prices = await asyncio.wait_for(self._fetch_tick_prices(symbols), timeout=5.0)
+                    except asyncio.TimeoutError:
+                        print(f"[BTC MONITOR] Timeout getting prices, retrying...")
+                        prices = {}
+
+                    btc_price = prices.get("linear", {}).get("BTCUSDT")
+                    if btc_price:
+                        tick_count += 1
+                        if tick_count % 15 == 0:
+                            print(f"[MONITOR] BTC: ${btc_price:,.0f} | {len(symbols)} symbol(s) | {len(self.trigger_index)} rules pending")
+
+                        self._tick_observed_at = self.market_data.observed_at("BTCUSDT", "linear")
+                        crossed = self._crossed_rules(symbols, btc_price)
+                        self._tick_detected_at = time.time()
+                        self._last_tick_btc = btc_price
+
+                        # Every monitor sees the same BTC print within a tick
+                        await asyncio.gather(*[
+                            self._evaluate_monitor(symbol, btc_price,
+                                                   prices.get(self.monitors[symbol]["category"], {}).get(symbol),
+                                                   crossed.get(symbol, []))
+                            for symbol in symbols if symbol in self.monitors
+                        ])
+                    self.tick_duration.observe(loop.time() - started)
 
+            except asyncio.CancelledError:
+                print(f"[BTC MONITOR] Tick driver stopped")
+                raise
+            except Exception as e:
+                print(f"[BTC MONITOR] Error in tick: {e}")
+            finally:
+                self._in_tick = False
+
+            # Fixed cadence; ticks missed while a slow tick ran are skipped, not queued
+            next_tick = max(next_tick + self.tick_interval, loop.time())
+
+            if self.feed and self.feed.is_live("linear"):
+                await asyncio.sleep(self.min_tick_interval)
                 try:
-                    btc_price = await asyncio.wait_for(
-                        self.position_monitor.get_current_price("BTCUSDT", "linear"),
-                        timeout=5.0
-                    )
+                    await asyncio.wait_for(self._wake.wait(), max(next_tick - loop.time(), 0))
+                    next_tick = loop.time()
                 except asyncio.TimeoutError:
-                    print(f"[BTC MONITOR] Timeout getting BTC price, retrying...")
-                    await asyncio.sleep(2)
-                    continue
-                except Exception as e:
-                    print(f"[BTC MONITOR] Error getting BTC price: {e}")
-                    await asyncio.sleep(2)
-                    continue
+                    pass
+                self._wake.clear()
+            else:
+                await asyncio.sleep(max(next_tick - loop.time(), 0))
 
-                if not btc_price:
-                    await asyncio.sleep(2)
-                    continue
+    def _crossed_rules(self, symbols: List[str], btc_price: float) -> Dict[str, List[TriggerEntry]]:
+        crossed: Dict[str, List[TriggerEntry]] = {}
+        if self._last_tick_btc is not None:
+            crossed = self.trigger_index.group_by_symbol(
+                self.trigger_index.crossed(self._last_tick_btc, btc_price)
+            )
 
-                try:
-                    coin_price = await asyncio.wait_for(
-                        self.position_monitor.get_current_price(symbol, monitor["category"]),
-                        timeout=5.0
-                    )
-                except:
-                    await asyncio.sleep(2)
-                    continue
+        # New or reloaded monitors still compare against their own previous price
+        for symbol in symbols:
+            if symbol in self._unsynced or self._last_tick_btc is None:
+                monitor = self.monitors.get(symbol)
+                if monitor:
+                    previous_btc = monitor.get("previous_btc_price")
+                    if previous_btc is None:
+                        previous_btc = btc_price
+                    crossed[symbol] = self.trigger_index.crossed(previous_btc, btc_price, symbol)
+                    crossed[symbol].sort(key=lambda entry: entry.rule_index)
+
+        return crossed
 
-                if not coin_price:
-                    await asyncio.sleep(2)
+    async def _evaluate_monitor(self, symbol: str, btc_price: float, coin_price: Optional[float],
+                                crossed: List[TriggerEntry]):
+        try:
+            monitor = self.monitors.get(symbol)
+            if not monitor or symbol not in self.active_symbols:
+                return
+
+            if not coin_price:
+                # Keep this monitor's own previous price so the crossing is seen next tick
+                self._unsynced.add(symbol)
+                return
+
+            # The entries index this rules list; set_monitor may swap in another during the awaits below
+            rules = monitor["rules"]
+            for entry in crossed:
+                if entry.rule_id in monitor.get("triggered_rules", []):
+                    continue
+                if entry.rule_index >= len(rules) or self._rule_id(rules[entry.rule_index]) != entry.rule_id:
                     continue
 
-                loop_count += 1
-                if loop_count % 15 == 0:
-                    print(f"[MONITOR {symbol}] BTC: ${btc_price:,.0f} | {symbol}: ${coin_price:.4f} | {len(monitor['rules'])} rules active")
-
-                previous_btc = monitor.get("previous_btc_price", btc_price)
-
-                for rule in monitor["rules"]:
-                    if rule['type'] == 'partial_close':
-                        rule_id = f"{rule['type']}_{rule['btc_price']}_{rule['close_percent']}"
-                    elif rule['type'] == 'set_tp':
-                        rule_id = f"{rule['type']}_{rule['btc_price']}_{rule['tp_price']}_{rule['close_percent']}"
-                    elif rule['type'] == 'set_sl':
-                        rule_id = f"{rule['type']}_{rule['btc_price']}_{rule['sl_price']}"
-                    else:
-                        rule_id = f"{rule['type']}_{rule['btc_price']}"
-
-                    if rule_id in monitor.get("triggered_rules", []):
-                        continue
-
-                    trigger_price = rule["btc_price"]
-
-                    crossed_up = previous_btc < trigger_price and btc_price >= trigger_price
-                    crossed_down = previous_btc > trigger_price and btc_price <= trigger_price
-
-                    if crossed_up or crossed_down:
-                        await self._execute_rule(monitor, rule, rule_id, coin_price, btc_price)
-                        monitor = self.monitors.get(symbol)
-                        if not monitor:
-                            break
-
-                monitor["previous_btc_price"] = btc_price
-                self.monitors[symbol] = monitor
-
-                if monitor and monitor.get("active_tp"):
-                    tp_data = monitor["active_tp"]
-                    if self._should_trigger_tp(monitor, coin_price, tp_data["price"]):
-                        close_size = (monitor["original_size"] * tp_data["close_percent"]) / 100
-                        if close_size > monitor["remaining_size"]:
-                            close_size = monitor["remaining_size"]
-
-                        await self._close_position(symbol, close_size, f"TP hit at ${tp_data['price']}", coin_price)
-                        monitor["remaining_size"] -= close_size
-                        monitor["active_tp"] = None
-                        self.monitors[symbol] = monitor
-                        self.save_monitors()
-
-                        if monitor["remaining_size"] <= 0:
-                            self.remove_monitor(symbol)
-                            return
-
-                        monitor = self.monitors.get(symbol)
-                        if not monitor:
-                            break
-
-                if monitor and monitor.get("active_sl"):
-                    sl_data = monitor["active_sl"]
-                    if self._should_trigger_sl(monitor, coin_price, sl_data["price"]):
-                        close_size = (monitor["original_size"] * sl_data["close_percent"]) / 100
-                        if close_size > monitor["remaining_size"]:
-                            close_size = monitor["remaining_size"]
-
-                        await self._close_position(symbol, close_size, f"SL hit at ${sl_data['price']}", coin_price)
-                        monitor["remaining_size"] -= close_size
-                        monitor["active_sl"] = None
-                        self.monitors[symbol] = monitor
-                        self.save_monitors()
-
-                        if monitor["remaining_size"] <= 0:
-                            self.remove_monitor(symbol)
-                            return
-
-                        monitor = self.monitors.get(symbol)
-                        if not monitor:
-                            break
-
-                await asyncio.sleep(2)
+                await self._execute_rule(monitor, rules[entry.rule_index], entry.rule_id, coin_price, btc_price)
+                if self.monitors.get(symbol) is not monitor:
+                    # Removed, or replaced by set_monitor; new rules are evaluated from the next tick
+                    return
 
-            except asyncio.CancelledError:
-                print(f"Stopped monitoring {symbol}")
-                break
-            except Exception as e:
-                print(f"Error monitoring {symbol}: {e}")
-                await asyncio.sleep(2)
+            monitor["previous_btc_price"] = btc_price
+            self.monitors[symbol] = monitor
+            self._unsynced.discard(symbol)
+
+            if monitor.get("active_tp"):
+                tp_data = monitor["active_tp"]
+                if self._should_trigger_tp(monitor, coin_price, tp_data["price"]):
+                    close_size = (monitor["original_size"] * tp_data["close_percent"]) / 100
+                    if close_size > monitor["remaining_size"]:
+                        close_size = monitor["remaining_size"]
+
+                    trace = self.latency.start(symbol, monitor["category"], "tp", coin_price, btc_price,
+                                               self.market_data.observed_at(symbol, monitor["category"]))
+                    closed = await self._close_position(symbol, close_size, f"TP hit at ${tp_data['price']}",
+                                                        coin_price, trace)
+                    if self._replaced(symbol, monitor):
+                        return
+                    monitor["remaining_size"] -= closed
+                    monitor["active_tp"] = None
+                    self.monitors[symbol] = monitor
+                    self._record_update(symbol, "remaining_size", "active_tp")
+
+                    if monitor["remaining_size"] <= 0:
+                        self.remove_monitor(symbol)
+                        return
+
+                    monitor = self.monitors.get(symbol)
+                    if not monitor:
+                        return
+
+            if monitor.get("active_sl"):
+                sl_data = monitor["active_sl"]
+                if self._should_trigger_sl(monitor, coin_price, sl_data["price"]):
+                    close_size = (monitor["original_size"] * sl_data["close_percent"]) / 100
+                    if close_size > monitor["remaining_size"]:
+                        close_size = monitor["remaining_size"]
+
+                    trace = self.latency.start(symbol, monitor["category"], "sl", coin_price, btc_price,
+                                               self.market_data.observed_at(symbol, monitor["category"]))
+                    closed = await self._close_position(symbol, close_size, f"SL hit at ${sl_data['price']}",
+                                                        coin_price, trace)
+                    if self._replaced(symbol, monitor):
+                        return
+                    monitor["remaining_size"] -= closed
+                    monitor["active_sl"] = None
+                    self.monitors[symbol] = monitor
+                    self._record_update(symbol, "remaining_size", "active_sl")
+
+                    if monitor["remaining_size"] <= 0:
+                        self.remove_monitor(symbol)
+
+        except Exception as e:
+            self._unsynced.add(symbol)
+            print(f"Error monitoring {symbol}: {e}")
 
     async def _execute_rule(self, monitor: Dict, rule: Dict, rule_id: str, coin_price: float, btc_price: float):
         symbol = monitor["symbol"]
@@ -259,10 +441,23 @@ class TPSLMonitor:
         print(f"   {symbol} Price: ${coin_price:.4f}")
         print(f"{'!'*60}\n")
 
+        trace = self.latency.start(symbol, monitor["category"], rule_type, coin_price, btc_price,
+                                   self._tick_observed_at, self._tick_detected_at)
+
         if rule_type == "full_close":
-            await self._close_position(symbol, monitor["remaining_size"],
-                                      f"Full close (BTC @ ${btc_price})", coin_price)
-            self.remove_monitor(symbol)
+            closed = await self._close_position(symbol, monitor["remaining_size"],
+                                                f"Full close (BTC @ ${btc_price})", coin_price, trace)
+            if self._replaced(symbol, monitor):
+                return
+            if closed >= monitor["remaining_size"]:
+                self.remove_monitor(symbol)
+                return
+
+            # Keep the monitor, untriggered, for what is still open
+            print(f"[BTC RULE] Full close of {symbol} incomplete; {monitor['remaining_size'] - closed} still open")
+            monitor["remaining_size"] -= closed
+            self.monitors[symbol] = monitor
+            self._record_update(symbol, "remaining_size")
             return
 
         elif rule_type == "partial_close":
@@ -270,19 +465,24 @@ class TPSLMonitor:
             if close_size > monitor["remaining_size"]:
                 close_size = monitor["remaining_size"]
 
-            await self._close_position(symbol, close_size,
-                                      f"Partial close {rule['close_percent']}% (BTC @ ${btc_price})", coin_price)
-            monitor["remaining_size"] -= close_size
-            monitor.setdefault("triggered_rules", []).append(rule_id)
+            closed = await self._close_position(symbol, close_size,
+                                                f"Partial close {rule['close_percent']}% (BTC @ ${btc_price})",
+                                                coin_price, trace)
+            if self._replaced(symbol, monitor):
+                return
+            monitor["remaining_size"] -= closed
+            self._mark_triggered(monitor, rule_id)
             self.monitors[symbol] = monitor
-            self.save_monitors()
+            self._record_update(symbol, "remaining_size")
 
             if monitor["remaining_size"] <= 0:
                 self.remove_monitor(symbol)
 
         elif rule_type == "set_tp":
             if rule.get("close_percent") == 100:
-                await self._set_bybit_tp_sl(symbol, monitor, tp_price=rule["tp_price"], sl_price=None)
+                await self._set_bybit_tp_sl(symbol, monitor, tp_price=rule["tp_price"], sl_price=None, trace=trace)
+                if self._replaced(symbol, monitor):
+                    return
                 print(f"[BTC RULE] TP set on Bybit exchange at ${rule['tp_price']} (100% full close)")
             else:
                 monitor["active_tp"] = {
@@ -291,13 +491,15 @@ class TPSLMonitor:
                 }
                 print(f"[BTC RULE] TP monitoring set to ${rule['tp_price']} (will close {rule['close_percent']}% when hit)")
 
-            monitor.setdefault("triggered_rules", []).append(rule_id)
+            self._mark_triggered(monitor, rule_id)
             self.monitors[symbol] = monitor
-            self.save_monitors()
+            self._record_update(symbol, "active_tp")
 
         elif rule_type == "set_sl":
             if rule.get("close_percent") == 100:
-                await self._set_bybit_tp_sl(symbol, monitor, tp_price=None, sl_price=rule["sl_price"])
+                await self._set_bybit_tp_sl(symbol, monitor, tp_price=None, sl_price=rule["sl_price"], trace=trace)
+                if self._replaced(symbol, monitor):
+                    return
                 print(f"[BTC RULE] SL set on Bybit exchange at ${rule['sl_price']} (100% full close)")
             else:
                 monitor["active_sl"] = {
@@ -306,11 +508,12 @@ class TPSLMonitor:
                 }
                 print(f"[BTC RULE] SL monitoring set to ${rule['sl_price']} (will close {rule['close_percent']}% when hit)")
 
-            monitor.setdefault("triggered_rules", []).append(rule_id)
+            self._mark_triggered(monitor, rule_id)
             self.monitors[symbol] = monitor
-            self.save_monitors()
+            self._record_update(symbol, "active_sl")
 
-    async def _set_bybit_tp_sl(self, symbol: str, monitor: Dict, tp_price: Optional[float], sl_price: Optional[float]):
+    async def _set_bybit_tp_sl(self, symbol: str, monitor: Dict, tp_price: Optional[float], sl_price: Optional[float],
+                               trace=None):
         try:
             category = monitor["category"]
 
@@ -324,15 +527,22 @@ class TPSLMonitor:
             }
 
             if tp_price is not None:
-                data["takeProfit"] = str(tp_price)
+                data["takeProfit"] = self._round_price(symbol, tp_price, category)
 
             if sl_price is not None:
-                data["stopLoss"] = str(sl_price)
+                data["stopLoss"] = self._round_price(symbol, sl_price, category)
 
+            trace = trace or self.latency.start(symbol, category, "trading_stop")
+            trace.rounded_at = time.time()
+            timings = {"dispatched_at": trace.rounded_at}
             result = await self.bybit_client.post_private(
                 "/v5/position/trading-stop",
-                data=data
+                data=data,
+                timings=timings
             )
+            trace.mark_sent(timings, self.bybit_client.time_offset)
+            trace.mark_ack(result)
+            self.latency.finish(trace)
 
             if result.get("retCode") == 0:
                 tp_msg = f"TP=${tp_price}" if tp_price else ""
@@ -362,91 +572,114 @@ class TPSLMonitor:
         else:
             return current_price >= tp_price
 
-    async def _round_quantity(self, symbol: str, size: float) -> str:
-        print(f"[QTY ROUND START] {symbol}: size={size}")
-        try:
-            qty_step_str = await self.symbol_validator.get_qty_step(symbol)
-            print(f"[QTY ROUND] Got qtyStep: {qty_step_str}")
-            qty_step = float(qty_step_str)
-
-            rounded = math.floor(size / qty_step) * qty_step
-
-            if '.' in qty_step_str:
-                decimals = len(qty_step_str.rstrip('0').split('.')[-1])
-                if decimals == 0:
-                    result = str(int(rounded))
-                else:
-                    result = f"{rounded:.{decimals}f}".rstrip('0').rstrip('.')
-            else:
-                result = str(int(rounded))
-
-            print(f"[QTY ROUND] {symbol}: size={size}, qtyStep={qty_step_str}, rounded={result}")
-            return result
-        except Exception as e:
-            print(f"[QTY ROUND ERROR] {symbol}: {e}, using fallback")
-            if "BTC" in symbol:
-                result = f"{math.floor(size * 100) / 100:.2f}".rstrip('0').rstrip('.')
-            elif "ETH" in symbol:
-                result = f"{math.floor(size * 100) / 100:.2f}".rstrip('0').rstrip('.')
-            else:
-                result = str(int(math.floor(size)))
-            print(f"[QTY ROUND] {symbol}: size={size}, fallback rounded={result}")
-            return result
-
-    async def _close_position(self, symbol: str, size: float, reason: str, price: float):
+    def split_quantity(self, symbol: str, size: float, category: Optional[str] = None) -> Optional[List[str]]:
+        """Order quantities that close ``size``, several when it exceeds the market order cap;
+        empty below the minimum, None without instrument data to round to."""
+        chunks = self.symbol_validator.split_qty(symbol, size, category)
+        if chunks is None:
+            # An unrounded size would only be rejected for its precision
+            print(f"[QTY ROUND] {symbol}: no instrument data, not sending size={size}")
+        return chunks
+
+    def _round_price(self, symbol: str, price: float, category: str) -> str:
+        rounded = self.symbol_validator.round_price(symbol, price, category)
+        return rounded if rounded is not None else str(price)
+
+    async def _close_position(self, symbol: str, size: float, reason: str, price: float, trace=None) -> float:
+        """Send the close and return how much of ``size`` the exchange accepted.
+
+        All orders accepted counts as ``size``, including dust below the qty step
+        that cannot be traded; otherwise only the accepted orders count.
+        """
+        self._closing[symbol] = self._closing.get(symbol, 0) + 1
         try:
             monitor = self.monitors.get(symbol)
             if not monitor:
-                return
+                return 0.0
 
             category = monitor["category"]
             side = monitor["side"]
 
-            rounded_qty = await self._round_quantity(symbol, size)
-
-            print(f"Closing {rounded_qty} of {symbol} - {reason} @ ${price}")
+            trace = trace or self.latency.start(symbol, category, reason, price)
+            quantities = self.split_quantity(symbol, size, category)
+            trace.rounded_at = time.time()
+            if quantities is None:
+                print(f"Not closing {symbol} - {reason}: no instrument data to round size {size} to")
+                return 0.0
+            if not quantities:
+                print(f"Not closing {symbol} - {reason}: size {size} is below the minimum order quantity")
+                return 0.0
+
+            total = format_decimal(sum(to_decimal(qty) for qty in quantities))
+            if len(quantities) > 1:
+                print(f"Closing {total} of {symbol} - {reason} @ ${price} in {len(quantities)} orders "
+                      f"(market order cap {quantities[0]})")
+            else:
+                print(f"Closing {total} of {symbol} - {reason} @ ${price}")
 
             if category == "linear":
                 close_side = "Sell" if side == "Buy" else "Buy"
+                order = {"category": category, "symbol": symbol, "side": close_side, "orderType": "Market",
+                         "reduceOnly": True, "closeOnTrigger": False}
+            elif category == "spot":
+                close_side = "Sell"
+                order = {"category": category, "symbol": symbol, "side": close_side, "orderType": "Market"}
+            else:
+                return 0.0
+            trace.side = close_side
 
-                result = await self.bybit_client.post_private(
-                    "/v5/order/create",
-                    data={
-                        "category": category,
-                        "symbol": symbol,
-                        "side": close_side,
-                        "orderType": "Market",
-                        "qty": rounded_qty,
-                        "reduceOnly": True,
-                        "closeOnTrigger": False
-                    }
-                )
+            # The trace follows the first order; the rest are sent in the same batch window
+            results = await asyncio.gather(
+                self.order_executor.place(dict(order, qty=quantities[0]), trace),
+                *[self.order_executor.place(dict(order, qty=qty)) for qty in quantities[1:]]
+            )
+            self.latency.finish(trace)
 
+            verb = "Closed" if category == "linear" else "Sold"
+            accepted = []
+            for qty, result in zip(quantities, results):
                 if result.get("retCode") == 0:
-                    print(f"Closed {rounded_qty} {symbol} via {reason}")
+                    accepted.append(qty)
+                    print(f"{verb} {qty} {symbol} via {reason}")
                 else:
-                    print(f"Failed to close {symbol}: {result.get('retMsg')}")
-
-            elif category == "spot":
-                result = await self.bybit_client.post_private(
-                    "/v5/order/create",
-                    data={
-                        "category": category,
-                        "symbol": symbol,
-                        "side": "Sell",
-                        "orderType": "Market",
-                        "qty": rounded_qty
-                    }
-                )
+                    print(f"Failed to close {qty} {symbol}: {result.get('retMsg')}")
 
-                if result.get("retCode") == 0:
-                    print(f"Sold {rounded_qty} {symbol} via {reason}")
-                else:
-                    print(f"Failed to sell {symbol}: {result.get('retMsg')}")
+            if len(accepted) == len(quantities):
+                return size
+            return float(sum(to_decimal(qty) for qty in accepted))
 
         except Exception as e:
             print(f"Error closing position {symbol}: {e}")
+            return 0.0
+        finally:
+            self._closing[symbol] -= 1
+            if not self._closing[symbol]:
+                del self._closing[symbol]
 
     def start_all_monitors(self):
         for symbol in list(self.monitors.keys()):
             self.start_monitoring(symbol)
+
+    async def pause_ticks(self, poll_interval: float = 0.01):
+        """Stop starting ticks and wait for one in progress to finish, so no
+        price fetched before an environment swap is evaluated after it."""
+        self._ticks_paused = True
+        while self._in_tick:
+            await asyncio.sleep(poll_interval)
+
+    def resume_ticks(self):
+        self._ticks_paused = False
+
+    async def reset_price_baseline(self):
+        """Forget the BTC prices seen so far so the first price from a new
+        environment (e.g. mainnet -> testnet) is not taken as a crossing."""
+        self._last_tick_btc = None
+        for symbol, monitor in self.monitors.items():
+            monitor.pop("previous_btc_price", None)
+            self._unsynced.add(symbol)
+
+    def stop_all_monitors(self):
+        self.active_symbols.clear()
+        self._last_tick_btc = None
+        self.engine.cancel_prefix(self.TASK_PREFIX).result()
+
@@ -0,0 +1,76 @@
+import bisect
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+
+class TriggerEntry(NamedTuple):
+    price: float
+    symbol: str
+    rule_index: int
+    rule_id: str
+
+
+class TriggerIndex:
+
+    def __init__(self):
+        # Parallel lists kept sorted by price so a tick can bisect straight
+        # to the thresholds between the previous and current BTC price
+        self._prices: List[float] = []
+        self._entries: List[TriggerEntry] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, symbol: str, rule_index: int, rule_id: str, price: float):
+        entry = TriggerEntry(float(price), symbol, rule_index, rule_id)
+        with self._lock:
+            position = bisect.bisect_right(self._prices, entry.price)
+            self._prices.insert(position, entry.price)
+            self._entries.insert(position, entry)
+
+    def _remove_where(self, predicate):
+        with self._lock:
+            keep = [i for i, entry in enumerate(self._entries) if not predicate(entry)]
+            self._prices = [self._prices[i] for i in keep]
+            self._entries = [self._entries[i] for i in keep]
+
+    def remove_symbol(self, symbol: str):
+        self._remove_where(lambda entry: entry.symbol == symbol)
+
+    def discard(self, symbol: str, rule_id: str):
+        self._remove_where(lambda entry: entry.symbol == symbol and entry.rule_id == rule_id)
+
+    def clear(self):
+        with self._lock:
+            self._prices = []
+            self._entries = []
+
+    def crossed(self, previous_price: float, current_price: float, symbol: Optional[str] = None) -> List[TriggerEntry]:
+        """Entries crossed moving from ``previous_price`` to ``current_price``.
+
+        Going up matches previous < trigger <= current, going down matches
+        current <= trigger < previous, the same bounds the monitors always used.
+        """
+        with self._lock:
+            if current_price > previous_price:
+                start = bisect.bisect_right(self._prices, previous_price)
+                end = bisect.bisect_right(self._prices, current_price)
+            elif current_price < previous_price:
+                start = bisect.bisect_left(self._prices, current_price)
+                end = bisect.bisect_left(self._prices, previous_price)
+            else:
+                return []
+            entries = self._entries[start:end]
+
+        if symbol is not None:
+            entries = [entry for entry in entries if entry.symbol == symbol]
+        return entries
+
+    def group_by_symbol(self, entries: List[TriggerEntry]) -> Dict[str, List[TriggerEntry]]:
+        grouped: Dict[str, List[TriggerEntry]] = {}
+        for entry in entries:
+            grouped.setdefault(entry.symbol, []).append(entry)
+        for symbol_entries in grouped.values():
+            symbol_entries.sort(key=lambda entry: entry.rule_index)
+        return grouped
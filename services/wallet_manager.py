@@ -2,54 +2,63 @@ from typing import Dict, List, Optional
 
 from datetime import datetime
 
+from services.market_data import MarketDataCache
+
 
 class WalletManager:
 
-    def __init__(self, bybit_client):
+    def __init__(self, bybit_client, market_data=None, account_stream=None):
         self.bybit_client = bybit_client
+        self.market_data = market_data or MarketDataCache(bybit_client)
+        self.account_stream = account_stream
         self.spot_entry_prices = {}
 
-    async def get_wallet_balances(self) -> List[Dict]:
-        try:
-            response = await self.bybit_client.get_private(
-                "/v5/account/wallet-balance",
-                params={"accountType": "UNIFIED"}
-            )
+    async def get_wallet_coins(self) -> Optional[List[Dict]]:
+        """Coin balances of the UNIFIED account, or None if they could not be fetched."""
+        if self.account_stream and self.account_stream.is_live():
+            return self.account_stream.get_wallet_coins()
 
-            if response.get("retCode") == 0:
-                result = response.get("result", {})
-                accounts = result.get("list", [])
+        response = await self.bybit_client.get_private(
+            "/v5/account/wallet-balance",
+            params={"accountType": "UNIFIED"}
+        )
 
-                if not accounts:
-                    return []
+        if response.get("retCode") != 0:
+            print(f"Error fetching wallet balance: {response.get('retMsg')}")
+            return None
 
-                account = accounts[0]
-                coins = account.get("coin", [])
+        accounts = response.get("result", {}).get("list", [])
+        if not accounts:
+            return []
 
-                assets = []
-                for coin in coins:
-                    coin_name = coin.get("coin")
-                    wallet_balance = float(coin.get("walletBalance", 0))
+        return accounts[0].get("coin", [])
 
-                    if coin_name == "USDT" or wallet_balance <= 0:
-                        continue
+    async def get_wallet_balances(self) -> List[Dict]:
+        try:
+            coins = await self.get_wallet_coins()
+            if not coins:
+                return []
 
-                    equity = float(coin.get("equity", 0))
-                    usd_value = float(coin.get("usdValue", 0))
+            assets = []
+            for coin in coins:
+                coin_name = coin.get("coin")
+                wallet_balance = float(coin.get("walletBalance", 0) or 0)
 
-                    assets.append({
-                        "coin": coin_name,
-                        "balance": wallet_balance,
-                        "equity": equity,
-                        "usd_value": usd_value,
-                        "updated_at": datetime.now().isoformat()
-                    })
+                if coin_name == "USDT" or wallet_balance <= 0:
+                    continue
 
-                return assets
+                equity = float(coin.get("equity", 0) or 0)
+                usd_value = float(coin.get("usdValue", 0) or 0)
 
-            else:
-                print(f"Error fetching wallet balance: {response.get('retMsg')}")
-                return []
+                assets.append({
+                    "coin": coin_name,
+                    "balance": wallet_balance,
+                    "equity": equity,
+                    "usd_value": usd_value,
+                    "updated_at": datetime.now().isoformat()
+                })
+
+            return assets
 
         except Exception as e:
             print(f"Error in get_wallet_balances: {e}")
@@ -64,11 +73,13 @@ class WalletManager:
         if not assets:
             return []
 
+        prices = await self.market_data.get_prices([f"{asset['coin']}USDT" for asset in assets], "spot")
+
         async def enrich_asset(asset):
             coin = asset["coin"]
             symbol = f"{coin}USDT"
 
-            current_price = await self.get_current_price(symbol)
+            current_price = prices.get(symbol)
 
             if not current_price:
                 return None
@@ -109,17 +120,7 @@ class WalletManager:
 
     async def get_current_price(self, symbol: str) -> Optional[float]:
         try:
-            response = await self.bybit_client.get_public(
-                "/v5/market/tickers",
-                params={"category": "spot", "symbol": symbol}
-            )
-
-            if response.get("retCode") == 0:
-                result = response.get("result", {}).get("list", [])
-                if result:
-                    return float(result[0].get("lastPrice", 0))
-
-            return None
+            return await self.market_data.get_price(symbol, "spot")
 
         except Exception as e:
             print(f"Error fetching price for {symbol}: {e}")
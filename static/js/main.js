@@ -2,6 +2,8 @@ let currentCategory = 'all';
 let positions = [];
 let priceUpdateInterval = null;
 let btcPriceInterval = null;
+let eventSource = null;
+let positionsVersion = null;
 let currentBtcPrice = 0;
 
 let currentOpenModalSymbol = null;
@@ -31,40 +33,54 @@ function showToast(message, type = 'info') {
 }
 
 
+function renderBtcPrice(price) {
+    currentBtcPrice = price;
+    const formatted = `$${price.toLocaleString('en-US', {minimumFractionDigits: 0, maximumFractionDigits: 0})}`;
+
+    ['btcPrice', 'modalBtcPrice', 'applyRulesBtcPrice'].forEach(id => {
+        const element = document.getElementById(id);
+        if (element) {
+            element.textContent = formatted;
+        }
+    });
+}
+
+
 async function updateBtcPrice() {
     try {
         const response = await fetch('https://api.bybit.com/v5/market/tickers?category=spot&symbol=BTCUSDT');
         const data = await response.json();
 
         if (data.retCode === 0 && data.result && data.result.list && data.result.list.length > 0) {
-            const price = parseFloat(data.result.list[0].lastPrice);
-            currentBtcPrice = price;
-            const btcPriceElement = document.getElementById('btcPrice');
-            if (btcPriceElement) {
-                btcPriceElement.textContent = `$${price.toLocaleString('en-US', {minimumFractionDigits: 0, maximumFractionDigits: 0})}`;
-            }
-
-            const modalBtcPrice = document.getElementById('modalBtcPrice');
-            if (modalBtcPrice) {
-                modalBtcPrice.textContent = `$${price.toLocaleString('en-US', {minimumFractionDigits: 0, maximumFractionDigits: 0})}`;
-            }
-
-            const applyRulesBtcPrice = document.getElementById('applyRulesBtcPrice');
-            if (applyRulesBtcPrice) {
-                applyRulesBtcPrice.textContent = `$${price.toLocaleString('en-US', {minimumFractionDigits: 0, maximumFractionDigits: 0})}`;
-            }
+            renderBtcPrice(parseFloat(data.result.list[0].lastPrice));
         }
     } catch (error) {
         console.error('Failed to fetch BTC price:', error);
     }
 }
 
+
+// BTC price normally arrives on the live stream; poll Bybit directly only while it is down
+function startBtcPolling() {
+    if (btcPriceInterval) return;
+    updateBtcPrice();
+    btcPriceInterval = setInterval(updateBtcPrice, 2000);
+}
+
+
+function stopBtcPolling() {
+    if (btcPriceInterval) {
+        clearInterval(btcPriceInterval);
+        btcPriceInterval = null;
+    }
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     console.log('BTC Rules Script initialized');
     setupEventListeners();
     loadPositions();
-    updateBtcPrice();
-    btcPriceInterval = setInterval(updateBtcPrice, 2000);
+    // BTC price must not depend on positions loading; the stream stops this once it is open
+    startBtcPolling();
 });
 
 
@@ -111,6 +127,7 @@ async function loadPositions() {
         let allPositions = data.positions || [];
 
         positions = allPositions;
+        positionsVersion = data.version;
 
         updateHeaderStats(positions);
 
@@ -118,14 +135,15 @@ async function loadPositions() {
             grid.style.display = 'none';
             emptyState.style.display = 'block';
             updateStatus('connected', 'No Coins');
-            stopPriceUpdates();
         } else {
             grid.style.display = 'grid';
             renderPositions(positions);
             updateStatus('connected', 'Active');
-            startPriceUpdates();
         }
 
+        // Keep the stream open with no coins too, so new positions and BTC ticks still arrive
+        startPriceUpdates();
+
     } catch (error) {
         console.error('Error loading positions:', error);
         showError(error.message);
@@ -226,9 +244,35 @@ function renderPositions(positions) {
 function startPriceUpdates() {
     stopPriceUpdates();
 
-    priceUpdateInterval = setInterval(async () => {
-        await updatePricesOnly();
-    }, 2000);
+    if (!window.EventSource) {
+        priceUpdateInterval = setInterval(async () => {
+            await updatePricesOnly();
+        }, 2000);
+        startBtcPolling();
+        return;
+    }
+
+    eventSource = new EventSource(`http://127.0.0.1:5000/api/stream?category=${currentCategory}`);
+
+    eventSource.onopen = () => stopBtcPolling();
+    eventSource.onerror = () => startBtcPolling();
+
+    eventSource.addEventListener('btc', event => {
+        stopBtcPolling();
+        renderBtcPrice(JSON.parse(event.data).price);
+    });
+
+    // The stream itself is fine; only the positions fetch behind it failed
+    eventSource.addEventListener('positions_error', event => {
+        updateStatus('error', JSON.parse(event.data).error);
+    });
+
+    eventSource.addEventListener('positions', event => {
+        applyPositionsEvent(JSON.parse(event.data));
+    });
+
+    // The server dropped queued events for this tab; start over from a full load
+    eventSource.addEventListener('resync', () => loadPositions());
 }
 
 
@@ -237,64 +281,108 @@ function stopPriceUpdates() {
         clearInterval(priceUpdateInterval);
         priceUpdateInterval = null;
     }
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
 }
 
 
-async function updatePricesOnly() {
-    if (positions.length === 0) return;
+function applyPositionsEvent(data) {
+    if (data.category !== currentCategory) return;
+
+    if (data.full) {
+        applyPositionUpdate(data.positions);
+        return;
+    }
+
+    const removed = new Set(data.removed);
+    const changed = new Map(data.changed.map(pos => [pos.symbol, pos]));
+
+    const newPositions = positions
+        .filter(pos => !removed.has(pos.symbol))
+        .map(pos => {
+            const update = changed.get(pos.symbol);
+            changed.delete(pos.symbol);
+            return update || pos;
+        });
+    changed.forEach(pos => newPositions.push(pos));
 
+    applyPositionUpdate(newPositions);
+}
+
+
+async function updatePricesOnly() {
     try {
-        const response = await fetch(`http://127.0.0.1:5000/api/positions?category=${currentCategory}`);
+        const since = positionsVersion !== null ? `&since=${positionsVersion}` : '';
+        const response = await fetch(`http://127.0.0.1:5000/api/positions?category=${currentCategory}${since}`);
+        if (response.status === 304) return;
+
         const data = await response.json();
+        if (data.error) return;
 
-        if (data.error || !data.positions) return;
+        positionsVersion = data.version;
+        applyPositionsEvent(data);
 
-        let newPositions = data.positions;
-        let needsFullRerender = false;
+    } catch (error) {
+        console.error('Error updating prices:', error);
+    }
+}
 
-        newPositions.forEach(newPos => {
-            const oldPos = positions.find(p => p.symbol === newPos.symbol);
-            if (!oldPos) {
-                needsFullRerender = true;
-                return;
-            }
 
-            const card = document.querySelector(`.position-card[data-symbol="${newPos.symbol}"]`);
-            if (!card) return;
+function applyPositionUpdate(newPositions) {
+    let needsFullRerender = false;
 
-            const hadMonitor = oldPos.monitor !== null && oldPos.monitor !== undefined;
-            const hasMonitor = newPos.monitor !== null && newPos.monitor !== undefined;
-            const monitorChanged = hadMonitor !== hasMonitor;
+    newPositions.forEach(newPos => {
+        const oldPos = positions.find(p => p.symbol === newPos.symbol);
+        if (!oldPos) {
+            needsFullRerender = true;
+            return;
+        }
 
-            const rulesChanged = hasMonitor && hadMonitor &&
-                JSON.stringify(oldPos.monitor) !== JSON.stringify(newPos.monitor);
+        const card = document.querySelector(`.position-card[data-symbol="${newPos.symbol}"]`);
+        if (!card) return;
 
-            if (monitorChanged || rulesChanged) {
-                needsFullRerender = true;
-            } else {
-                updateValueWithAnimation(card, 'current_price', oldPos.current_price, newPos.current_price, true);
-                updateValueWithAnimation(card, 'position_value', oldPos.position_value, newPos.position_value, true);
-                updateValueWithAnimation(card, 'unrealized_pnl', oldPos.unrealized_pnl, newPos.unrealized_pnl, true, newPos.unrealized_pnl >= 0);
-                updateValueWithAnimation(card, 'pnl_percentage', oldPos.pnl_percentage, newPos.pnl_percentage, false, newPos.pnl_percentage >= 0);
-            }
+        const hadMonitor = oldPos.monitor !== null && oldPos.monitor !== undefined;
+        const hasMonitor = newPos.monitor !== null && newPos.monitor !== undefined;
+        const monitorChanged = hadMonitor !== hasMonitor;
 
-            Object.assign(oldPos, newPos);
-        });
+        const rulesChanged = hasMonitor && hadMonitor &&
+            JSON.stringify(oldPos.monitor) !== JSON.stringify(newPos.monitor);
 
-        if (positions.length !== newPositions.length) {
+        if (monitorChanged || rulesChanged) {
             needsFullRerender = true;
+        } else {
+            updateValueWithAnimation(card, 'current_price', oldPos.current_price, newPos.current_price, true);
+            updateValueWithAnimation(card, 'position_value', oldPos.position_value, newPos.position_value, true);
+            updateValueWithAnimation(card, 'unrealized_pnl', oldPos.unrealized_pnl, newPos.unrealized_pnl, true, newPos.unrealized_pnl >= 0);
+            updateValueWithAnimation(card, 'pnl_percentage', oldPos.pnl_percentage, newPos.pnl_percentage, false, newPos.pnl_percentage >= 0);
         }
 
-        updateHeaderStats(newPositions);
-        positions = newPositions;
+        Object.assign(oldPos, newPos);
+    });
 
-        if (needsFullRerender) {
-            console.log('[UI UPDATE] Monitor status changed - re-rendering positions');
+    if (positions.length !== newPositions.length) {
+        needsFullRerender = true;
+    }
+
+    updateHeaderStats(newPositions);
+    positions = newPositions;
+
+    if (needsFullRerender) {
+        console.log('[UI UPDATE] Monitor status changed - re-rendering positions');
+        const grid = document.getElementById('positionsGrid');
+        const emptyState = document.getElementById('emptyState');
+        if (positions.length === 0) {
+            grid.style.display = 'none';
+            emptyState.style.display = 'block';
+            updateStatus('connected', 'No Coins');
+        } else {
+            grid.style.display = 'grid';
+            emptyState.style.display = 'none';
             renderPositions(positions);
+            updateStatus('connected', 'Active');
         }
-
-    } catch (error) {
-        console.error('Error updating prices:', error);
     }
 }
 
@@ -368,6 +456,8 @@ function showError(message) {
     document.getElementById('errorMessage').textContent = message;
     updateStatus('error', 'Connection Error');
     stopPriceUpdates();
+    // Closing the stream does not fire its onerror, so fall back explicitly
+    startBtcPolling();
 }
 
 
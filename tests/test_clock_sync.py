@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import time
+
+from services.clock_sync import ClockSync
+from services.monitor_engine import MonitorEngine
+
+
+class HeldTimeClient:
+    """Answers /v5/market/time with the local clock; the first round waits for ``release``."""
+
+    time_offset = 0
+
+    def __init__(self):
+        self.requests = 0
+        self.release = threading.Event()
+
+    async def get_public(self, endpoint, params=None, timeout=None):
+        self.requests += 1
+        while not self.release.is_set():
+            await asyncio.sleep(0.005)
+        return {"retCode": 0, "result": {"timeNano": str(time.time_ns())}}
+
+
+def test_resync_during_a_round_runs_another_round():
+    engine = MonitorEngine("test-clock-engine")
+    client = HeldTimeClient()
+    clock = ClockSync(client, engine, interval=60.0, samples=1, sample_spacing=0)
+    try:
+        clock.start()
+        deadline = time.time() + 2
+        while not client.requests and time.time() < deadline:
+            time.sleep(0.005)
+
+        # e.g. a 10002 timestamp error while the first round is still waiting on Bybit
+        clock.resync()
+        client.release.set()
+
+        deadline = time.time() + 2
+        while client.requests < 2 and time.time() < deadline:
+            time.sleep(0.005)
+    finally:
+        clock.stop()
+        engine.stop()
+
+    assert client.requests >= 2
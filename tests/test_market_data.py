@@ -0,0 +1,51 @@
+import asyncio
+
+from services.market_data import MarketDataCache
+
+
+class HeldClient:
+
+    def __init__(self, price):
+        self.price = price
+        self.release = asyncio.Event()
+        self.requests = 0
+
+    async def get_public(self, endpoint, params=None):
+        self.requests += 1
+        await self.release.wait()
+        symbols = [params["symbol"]] if "symbol" in params else ["BTCUSDT", "ETHUSDT"]
+        return {"retCode": 0, "result": {"list": [{"symbol": s, "lastPrice": str(self.price)} for s in symbols]}}
+
+
+def test_fetch_answered_after_clear_is_dropped():
+    async def scenario():
+        client = HeldClient(60000)
+        cache = MarketDataCache(client)
+        fetch = asyncio.ensure_future(cache.get_price("BTCUSDT"))
+        while not client.requests:
+            await asyncio.sleep(0)
+
+        # e.g. the environment changed while the request was in flight
+        cache.clear()
+        client.release.set()
+        return await fetch, cache._get_cached("BTCUSDT", "linear", 60)
+
+    price, cached = asyncio.run(scenario())
+    assert price is None
+    assert cached is None
+
+
+def test_snapshot_answered_after_clear_is_dropped():
+    async def scenario():
+        client = HeldClient(60000)
+        cache = MarketDataCache(client)
+        fetch = asyncio.ensure_future(cache.get_snapshot("linear"))
+        while not client.requests:
+            await asyncio.sleep(0)
+        cache.clear()
+        client.release.set()
+        return await fetch, cache._get_cached("ETHUSDT", "linear", 60)
+
+    snapshot, cached = asyncio.run(scenario())
+    assert snapshot == {}
+    assert cached is None
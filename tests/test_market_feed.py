@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from services.bybit_client import BybitClient
+from services.bybit_standin import BybitStandin
+from services.market_data import MarketDataCache
+from services.market_feed import PublicMarketFeed
+from services.monitor_engine import MonitorEngine
+
+pytest.importorskip("websockets")
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def feed():
+    standin = BybitStandin(ws=True, ws_interval=0.01).start()
+    engine = MonitorEngine("test-feed-engine")
+    client = BybitClient(standin.api_key, standin.api_secret, base_url=standin.url, ws_url=standin.ws_url)
+    market_data = MarketDataCache(client)
+    feed = PublicMarketFeed(client, market_data, engine, ping_interval=0.2, max_backoff=0.2, stale_timeout=0.5)
+    feed.standin = standin
+    feed.start()
+    yield feed
+    feed.stop()
+    engine.stop()
+    standin.stop()
+
+
+def cached_price(feed, symbol):
+    ticker = feed.market_data._get_cached(symbol, "linear", 0)
+    return float(ticker["lastPrice"]) if ticker else None
+
+
+def test_subscribe_streams_snapshot_and_updates(feed):
+    feed.subscribe("linear", ["ETHUSDT"])
+    assert wait_for(lambda: feed.market_data.is_streaming("ETHUSDT"))
+    assert cached_price(feed, "ETHUSDT") == 3000.0
+
+    feed.standin.set_price("ETHUSDT", 3100)
+    assert wait_for(lambda: cached_price(feed, "ETHUSDT") == 3100.0)
+
+
+def test_disconnect_falls_back_to_rest_and_resubscribes(feed):
+    feed.subscribe("linear", ["ETHUSDT"])
+    assert wait_for(lambda: feed.market_data.is_streaming("ETHUSDT"))
+
+    feed.standin.stream.drop()
+    assert wait_for(lambda: not feed.market_data.is_streaming("ETHUSDT"), 1.0)
+
+    # Reconnects after the backoff and streams again
+    assert wait_for(lambda: feed.market_data.is_streaming("ETHUSDT"))
+    assert feed.reconnects >= 1
+
+
+def test_half_open_socket_goes_stale_and_falls_back(feed):
+    feed.subscribe("linear", ["ETHUSDT"])
+    assert wait_for(lambda: feed.market_data.is_streaming("ETHUSDT"))
+
+    # Connection stays up but nothing arrives, not even pongs
+    feed.standin.stream.frozen = True
+    started = time.time()
+    assert wait_for(lambda: not feed.market_data.is_streaming("ETHUSDT"), 3.0)
+    assert time.time() - started < 2.0
+    assert not feed.is_live("linear")
+
+    feed.standin.stream.frozen = False
+    assert wait_for(lambda: feed.market_data.is_streaming("ETHUSDT"), 10.0)
@@ -0,0 +1,65 @@
+import asyncio
+
+from services.order_executor import OrderExecutor
+
+
+class BlockingClient:
+    """Answers each order request only once ``release`` is set."""
+
+    time_offset = 0
+
+    def __init__(self):
+        self.requests = []
+        self.release = asyncio.Event()
+
+    async def post_private(self, endpoint, data=None, timings=None):
+        self.requests.append((endpoint, data))
+        await self.release.wait()
+        if endpoint == "/v5/order/create-batch":
+            count = len(data["request"])
+            return {
+                "retCode": 0,
+                "result": {"list": [{"orderId": f"o{i}"} for i in range(count)]},
+                "retExtInfo": {"list": [{"code": 0, "msg": "OK"}] * count}
+            }
+        return {"retCode": 0, "result": {"orderId": data["symbol"]}}
+
+
+def order(symbol):
+    return {"category": "linear", "symbol": symbol, "side": "Sell", "orderType": "Market", "qty": "1"}
+
+
+def test_order_placed_during_in_flight_batch_is_sent():
+    async def scenario():
+        client = BlockingClient()
+        executor = OrderExecutor(client, batch_window=0.001)
+
+        first = asyncio.ensure_future(executor.place(order("AUSDT")))
+        while not client.requests:
+            await asyncio.sleep(0.001)
+
+        # The first batch is still waiting on the exchange
+        second = asyncio.ensure_future(executor.place(order("BUSDT")))
+        while len(client.requests) < 2:
+            await asyncio.sleep(0.001)
+
+        client.release.set()
+        return await asyncio.gather(first, second), client.requests
+
+    # Before the fix the second order was never sent and this timed out
+    results, requests = asyncio.run(asyncio.wait_for(scenario(), 2.0))
+    assert [result["result"]["orderId"] for result in results] == ["AUSDT", "BUSDT"]
+    assert [data["symbol"] for _, data in requests] == ["AUSDT", "BUSDT"]
+
+
+def test_orders_in_one_window_share_a_batch():
+    async def scenario():
+        client = BlockingClient()
+        client.release.set()
+        executor = OrderExecutor(client, batch_window=0.01)
+        results = await executor.place_many([order(f"S{i}USDT") for i in range(3)])
+        return results, client.requests
+
+    results, requests = asyncio.run(scenario())
+    assert [endpoint for endpoint, _ in requests] == ["/v5/order/create-batch"]
+    assert [result["result"]["orderId"] for result in results] == ["o0", "o1", "o2"]
@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from services.quantization import Quantization
+
+
+def capped(max_qty="100", min_qty="1", qty_step="0.1"):
+    return Quantization(qty_step=Decimal(qty_step), min_qty=Decimal(min_qty), max_qty=Decimal(max_qty),
+                        tick_size=Decimal("0.01"))
+
+
+def test_quantity_is_not_capped_at_the_market_order_maximum():
+    assert capped().quantity(250.37) == Decimal("250.3")
+
+
+def test_split_keeps_every_order_within_the_maximum():
+    chunks = capped().split(250.37)
+    assert chunks == [Decimal("100"), Decimal("100"), Decimal("50.3")]
+    assert sum(chunks) == capped().quantity(250.37)
+
+
+def test_split_moves_part_of_the_last_order_into_a_small_remainder():
+    # 200.5 would leave 0.5, below the minimum of 1
+    chunks = capped().split(200.5)
+    assert chunks == [Decimal("100"), Decimal("99.5"), Decimal("1")]
+    assert all(chunk <= 100 for chunk in chunks)
+
+
+def test_split_without_a_maximum_is_one_order():
+    uncapped = Quantization(qty_step=Decimal("0.1"), min_qty=Decimal("1"), max_qty=None, tick_size=None)
+    assert uncapped.split(250.37) == [Decimal("250.3")]
+
+
+def test_split_below_the_minimum_is_empty():
+    assert capped().split(0.5) == []
@@ -0,0 +1,73 @@
+import asyncio
+from decimal import Decimal
+
+from services.symbol_validator import SymbolValidator
+
+
+class InstrumentsClient:
+    """Serves one ETHUSDT instrument whose qtyStep is ``step``; ``gate`` holds the answers."""
+
+    base_url = "https://api.bybit.com"
+
+    def __init__(self, step):
+        self.step = step
+        self.gate = None
+        self.requests = 0
+
+    async def get_public(self, endpoint, params=None):
+        self.requests += 1
+        step = self.step
+        if self.gate is not None:
+            await self.gate.wait()
+        instrument = {"symbol": "ETHUSDT", "lotSizeFilter": {"qtyStep": step, "minOrderQty": step}}
+        return {"retCode": 0, "result": {"list": [instrument]}}
+
+
+async def settle(validator):
+    while validator._refresh_task is not None and not validator._refresh_task.done():
+        await asyncio.sleep(0)
+
+
+def test_lookup_after_invalidate_refreshes_the_table():
+    async def scenario():
+        client = InstrumentsClient("0.01")
+        validator = SymbolValidator(client)
+        await validator.initialize()
+
+        # e.g. mainnet -> testnet with different lot sizes
+        client.step = "0.1"
+        validator.invalidate()
+        before = validator.get_quantization("ETHUSDT", "linear")
+        await settle(validator)
+        return before, validator.get_quantization("ETHUSDT", "linear")
+
+    before, after = asyncio.run(asyncio.wait_for(scenario(), 2.0))
+    # Served stale while the refresh runs, then replaced
+    assert before.qty_step == Decimal("0.01")
+    assert after.qty_step == Decimal("0.1")
+
+
+def test_refresh_in_flight_when_invalidated_is_discarded():
+    async def scenario():
+        client = InstrumentsClient("0.01")
+        validator = SymbolValidator(client)
+        await validator.initialize()
+
+        client.gate = asyncio.Event()
+        validator.invalidate()
+        validator.get_quantization("ETHUSDT", "linear")
+        while not client.requests > 2:
+            await asyncio.sleep(0)
+
+        # The environment changes again while the old servers are still answering
+        client.step = "0.1"
+        validator.invalidate()
+        validator.get_quantization("ETHUSDT", "linear")
+        client.gate.set()
+        await asyncio.sleep(0)
+        await settle(validator)
+        return validator.get_quantization("ETHUSDT", "linear"), validator._is_stale()
+
+    quantization, stale = asyncio.run(asyncio.wait_for(scenario(), 2.0))
+    assert quantization.qty_step == Decimal("0.1")
+    assert not stale
@@ -0,0 +1,375 @@
+import asyncio
+import threading
+import time
+from decimal import Decimal
+
+from services.bybit_client import BybitClient
+from services.market_data import MarketDataCache
+from services.monitor_engine import MonitorEngine
+from services.quantization import Quantization
+from services.rate_limiter import PRIORITY_POLL, PRIORITY_UI, request_priority
+from services.tp_sl_monitor import TPSLMonitor
+
+
+class FakeEngine:
+
+    def ensure(self, name, factory):
+        pass
+
+    def cancel(self, name):
+        pass
+
+    def cancel_prefix(self, prefix):
+        pass
+
+    def has_task(self, name):
+        return False
+
+
+class FakePositionMonitor:
+
+    def __init__(self):
+        self.market_data = MarketDataCache(None)
+
+    async def get_current_price(self, symbol, category="linear"):
+        return 60000.0
+
+
+class FakeValidator:
+
+    def split_qty(self, symbol, qty, category=None):
+        return [str(qty)] if qty > 0 else []
+
+    def round_price(self, symbol, price, category=None):
+        return str(price)
+
+
+class PushBeforeAckExecutor:
+    """Delivers the private stream's position push before the order ack, as Bybit may."""
+
+    def __init__(self):
+        self.monitor = None
+        self.orders = []
+
+    async def place(self, order, trace=None):
+        self.orders.append(order)
+        symbol = order["symbol"]
+        remaining = self.monitor.monitors[symbol]["remaining_size"] - float(order["qty"])
+        self.monitor._on_position_update({"symbol": symbol, "category": "linear", "side": "Buy", "size": str(remaining)})
+        return {"retCode": 0, "result": {"orderId": "1"}}
+
+
+class RecordingExecutor:
+
+    def __init__(self):
+        self.orders = []
+
+    async def place(self, order, trace=None):
+        self.orders.append(order)
+        return {"retCode": 0, "result": {"orderId": str(len(self.orders))}}
+
+
+def make_monitor(tmp_path, executor):
+    monitor = TPSLMonitor(None, FakePositionMonitor(), FakeValidator(), config_dir=str(tmp_path),
+                          engine=FakeEngine(), order_executor=executor)
+    executor.monitor = monitor
+    return monitor
+
+
+def test_position_push_before_ack_is_not_subtracted_twice(tmp_path):
+    executor = PushBeforeAckExecutor()
+    monitor = make_monitor(tmp_path, executor)
+    rules = [
+        {"type": "partial_close", "btc_price": 59000, "close_percent": 50},
+        {"type": "full_close", "btc_price": 58000},
+    ]
+
+    async def scenario():
+        await monitor.set_monitor("ETHUSDT", "linear", "Buy", 100.0, rules)
+        state = monitor.monitors["ETHUSDT"]
+        await monitor._execute_rule(state, rules[0], monitor._rule_id(rules[0]), 3000.0, 58900.0)
+
+    asyncio.run(scenario())
+    monitor.store.close()
+
+    assert [order["qty"] for order in executor.orders] == ["50.0"]
+    # Half closed; the full-close rule is still armed for the rest
+    assert monitor.monitors["ETHUSDT"]["remaining_size"] == 50.0
+    assert monitor.trigger_index.crossed(58500, 57500, "ETHUSDT")
+
+
+def test_position_push_outside_a_close_still_tracks_size(tmp_path):
+    monitor = make_monitor(tmp_path, PushBeforeAckExecutor())
+
+    asyncio.run(monitor.set_monitor("ETHUSDT", "linear", "Buy", 100.0, [{"type": "full_close", "btc_price": 58000}]))
+    monitor._on_position_update({"symbol": "ETHUSDT", "category": "linear", "side": "Buy", "size": "40"})
+    monitor.store.close()
+
+    assert monitor.monitors["ETHUSDT"]["remaining_size"] == 40.0
+
+
+class CappedValidator(FakeValidator):
+    """Instrument whose market orders are capped at 100."""
+
+    quantization = Quantization(qty_step=Decimal("0.1"), min_qty=Decimal("1"), max_qty=Decimal("100"),
+                                tick_size=Decimal("0.01"))
+
+    def split_qty(self, symbol, qty, category=None):
+        return [str(chunk) for chunk in self.quantization.split(qty)]
+
+
+def test_full_close_above_market_order_cap_sends_every_chunk(tmp_path):
+    executor = RecordingExecutor()
+    monitor = TPSLMonitor(None, FakePositionMonitor(), CappedValidator(), config_dir=str(tmp_path),
+                          engine=FakeEngine(), order_executor=executor)
+    rule = {"type": "full_close", "btc_price": 59000}
+
+    async def scenario():
+        await monitor.set_monitor("ETHUSDT", "linear", "Buy", 250.0, [rule])
+        state = monitor.monitors["ETHUSDT"]
+        await monitor._execute_rule(state, rule, monitor._rule_id(rule), 3000.0, 58900.0)
+
+    asyncio.run(scenario())
+    monitor.store.close()
+
+    assert [order["qty"] for order in executor.orders] == ["100", "100", "50.0"]
+    assert all(order["reduceOnly"] for order in executor.orders)
+
+
+def test_restarted_monitor_is_resynced(tmp_path):
+    monitor = make_monitor(tmp_path, PushBeforeAckExecutor())
+
+    asyncio.run(monitor.set_monitor("ETHUSDT", "linear", "Buy", 100.0, [{"type": "full_close", "btc_price": 58000}]))
+    monitor._unsynced.clear()
+    monitor.stop_monitoring("ETHUSDT")
+    monitor.start_monitoring("ETHUSDT")
+    monitor.store.close()
+
+    assert "ETHUSDT" in monitor._unsynced
+
+
+class RejectingExecutor:
+
+    def __init__(self):
+        self.orders = []
+
+    async def place(self, order, trace=None):
+        self.orders.append(order)
+        return {"retCode": 110017, "retMsg": "reduce-only order rejected"}
+
+
+def test_rejected_partial_close_leaves_remaining_size(tmp_path):
+    executor = RejectingExecutor()
+    monitor = TPSLMonitor(None, FakePositionMonitor(), FakeValidator(), config_dir=str(tmp_path),
+                          engine=FakeEngine(), order_executor=executor)
+    rule = {"type": "partial_close", "btc_price": 59000, "close_percent": 50}
+
+    async def scenario():
+        await monitor.set_monitor("ETHUSDT", "linear", "Buy", 100.0, [rule])
+        state = monitor.monitors["ETHUSDT"]
+        await monitor._execute_rule(state, rule, monitor._rule_id(rule), 3000.0, 58900.0)
+
+    asyncio.run(scenario())
+    monitor.store.close()
+
+    assert len(executor.orders) == 1
+    assert monitor.monitors["ETHUSDT"]["remaining_size"] == 100.0
+
+
+def test_rejected_full_close_keeps_the_monitor(tmp_path):
+    monitor = TPSLMonitor(None, FakePositionMonitor(), FakeValidator(), config_dir=str(tmp_path),
+                          engine=FakeEngine(), order_executor=RejectingExecutor())
+    rule = {"type": "full_close", "btc_price": 59000}
+
+    async def scenario():
+        await monitor.set_monitor("ETHUSDT", "linear", "Buy", 100.0, [rule])
+        state = monitor.monitors["ETHUSDT"]
+        await monitor._execute_rule(state, rule, monitor._rule_id(rule), 3000.0, 58900.0)
+
+    asyncio.run(scenario())
+    monitor.store.close()
+
+    assert monitor.monitors["ETHUSDT"]["remaining_size"] == 100.0
+    assert monitor.trigger_index.crossed(59500, 58500, "ETHUSDT")
+
+
+def test_position_push_can_raise_remaining_size(tmp_path):
+    monitor = make_monitor(tmp_path, PushBeforeAckExecutor())
+
+    asyncio.run(monitor.set_monitor("ETHUSDT", "linear", "Buy", 100.0, [{"type": "full_close", "btc_price": 58000}]))
+    monitor.monitors["ETHUSDT"]["remaining_size"] = 40.0
+    monitor._on_position_update({"symbol": "ETHUSDT", "category": "linear", "side": "Buy", "size": "90"})
+    monitor.store.close()
+
+    assert monitor.monitors["ETHUSDT"]["remaining_size"] == 90.0
+
+
+class ReplacingExecutor(RecordingExecutor):
+    """Replaces the monitor's rules, as /api/tp-sl/set might, while the first close is in flight."""
+
+    def __init__(self, rules):
+        super().__init__()
+        self.monitor = None
+        self.rules = rules
+
+    async def place(self, order, trace=None):
+        if not self.orders:
+            await self.monitor.set_monitor(order["symbol"], "linear", "Buy", 100.0, self.rules)
+        return await super().place(order, trace)
+
+
+def test_rules_replaced_mid_evaluation_are_not_run_from_stale_entries(tmp_path):
+    new_rules = [{"type": "partial_close", "btc_price": 1000, "close_percent": 10},
+                 {"type": "full_close", "btc_price": 500}]
+    executor = ReplacingExecutor(new_rules)
+    monitor = TPSLMonitor(None, FakePositionMonitor(), FakeValidator(), config_dir=str(tmp_path),
+                          engine=FakeEngine(), order_executor=executor)
+    executor.monitor = monitor
+    rules = [{"type": "partial_close", "btc_price": 59000, "close_percent": 50},
+             {"type": "full_close", "btc_price": 58500}]
+
+    async def scenario():
+        await monitor.set_monitor("ETHUSDT", "linear", "Buy", 100.0, rules)
+        monitor.active_symbols.add("ETHUSDT")
+        crossed = monitor.trigger_index.crossed(60000, 58000, "ETHUSDT")
+        await monitor._evaluate_monitor("ETHUSDT", 58000.0, 3000.0, sorted(crossed, key=lambda e: e.rule_index))
+
+    asyncio.run(scenario())
+    monitor.store.close()
+
+    # Index 1 now holds the new full close at 500; it must not run off the old crossing
+    assert [order["qty"] for order in executor.orders] == ["50.0"]
+    assert monitor.monitors["ETHUSDT"]["rules"] == new_rules
+    assert monitor.monitors["ETHUSDT"]["remaining_size"] == 100.0
+
+
+class NoInstrumentValidator(FakeValidator):
+
+    def split_qty(self, symbol, qty, category=None):
+        return None
+
+
+def test_close_without_instrument_data_sends_nothing(tmp_path):
+    executor = RecordingExecutor()
+    monitor = TPSLMonitor(None, FakePositionMonitor(), NoInstrumentValidator(), config_dir=str(tmp_path),
+                          engine=FakeEngine(), order_executor=executor)
+    rule = {"type": "partial_close", "btc_price": 59000, "close_percent": 33}
+
+    async def scenario():
+        await monitor.set_monitor("ETHUSDT", "linear", "Buy", 1.0, [rule])
+        state = monitor.monitors["ETHUSDT"]
+        await monitor._execute_rule(state, rule, monitor._rule_id(rule), 3000.0, 58900.0)
+
+    asyncio.run(scenario())
+    monitor.store.close()
+
+    # 0.33 unrounded would be rejected for precision; nothing is sent or counted
+    assert executor.orders == []
+    assert monitor.monitors["ETHUSDT"]["remaining_size"] == 1.0
+
+
+class PriorityRecordingMarketData(MarketDataCache):
+    """Records the priority BybitClient would give a ticker request made here."""
+
+    def __init__(self):
+        super().__init__(BybitClient())
+        self.priorities = []
+
+    async def get_prices(self, symbols, category="linear"):
+        self.priorities.append(self.bybit_client._default_priority("/v5/market/tickers"))
+        return {symbol: 60000.0 for symbol in symbols}
+
+
+def test_tick_started_from_a_ui_request_fetches_at_poll_priority(tmp_path):
+    engine = MonitorEngine("test-engine")
+    position_monitor = FakePositionMonitor()
+    position_monitor.market_data = market_data = PriorityRecordingMarketData()
+    monitor = TPSLMonitor(None, position_monitor, FakeValidator(), config_dir=str(tmp_path), engine=engine,
+                          tick_interval=0.01, order_executor=PushBeforeAckExecutor())
+
+    async def set_from_request():
+        await monitor.set_monitor("ETHUSDT", "linear", "Buy", 1.0, [{"type": "full_close", "btc_price": 1}])
+
+    try:
+        # As async_route runs the /api/tp-sl/set view
+        with request_priority(PRIORITY_UI):
+            engine.run(set_from_request())
+        deadline = time.time() + 2
+        while not market_data.priorities and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        monitor.stop_all_monitors()
+        engine.stop()
+        monitor.store.close()
+
+    assert market_data.priorities
+    assert set(market_data.priorities) == {PRIORITY_POLL}
+
+
+class HeldMarketData(MarketDataCache):
+    """Serves ``btc``; while ``hold`` is set, fetches wait with the price they started with."""
+
+    def __init__(self):
+        super().__init__(None)
+        self.btc = 60000.0
+        self.hold = False
+        self.holding = False
+
+    async def get_prices(self, symbols, category="linear"):
+        btc = self.btc
+        while self.hold:
+            self.holding = True
+            await asyncio.sleep(0.005)
+        self.holding = False
+        return {symbol: (btc if symbol == "BTCUSDT" else 3000.0) for symbol in symbols}
+
+
+def test_tick_in_flight_during_environment_swap_does_not_set_the_baseline(tmp_path):
+    engine = MonitorEngine("test-engine")
+    position_monitor = FakePositionMonitor()
+    position_monitor.market_data = market_data = HeldMarketData()
+    executor = RecordingExecutor()
+    monitor = TPSLMonitor(None, position_monitor, FakeValidator(), config_dir=str(tmp_path), engine=engine,
+                          tick_interval=0.01, order_executor=executor)
+
+    async def set_monitor():
+        await monitor.set_monitor("ETHUSDT", "linear", "Buy", 1.0, [{"type": "full_close", "btc_price": 59000}])
+
+    def swap_environment():
+        # What reinitialize_services does when the environment changes
+        engine.run(monitor.pause_ticks())
+        try:
+            market_data.btc = 58000.0
+            engine.run(monitor.reset_price_baseline())
+        finally:
+            monitor.resume_ticks()
+
+    try:
+        engine.run(set_monitor())
+        market_data.hold = True
+        assert wait_for(lambda: market_data.holding)
+
+        swap = threading.Thread(target=swap_environment)
+        swap.start()
+        time.sleep(0.05)
+        # The old environment's 60000 arrives while the swap is waiting
+        market_data.hold = False
+        swap.join(2)
+
+        # Several ticks at the new environment's price
+        time.sleep(0.2)
+    finally:
+        monitor.stop_all_monitors()
+        engine.stop()
+        monitor.store.close()
+
+    assert not swap.is_alive()
+    assert executor.orders == []
+    assert monitor.monitors["ETHUSDT"]["previous_btc_price"] == 58000.0
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()